@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -9,35 +10,58 @@ from .config import config
 from .firebase import initialize_firebase
 from .utils.logger import logger
 from .utils.error_handler import register_error_handlers
+from .utils.metrics import TimedJSONProvider, init_request_metrics
+from .utils.rtdb_trace import init_rtdb_trace
+from .utils.ratelimit import init_rate_limiting
+from .utils.deadline import init_deadlines
+from .warmup import startup_timer, warm_up
 
 def create_app(config_name="default"):
     app = Flask(__name__)
     app.secret_key = "supersecretkey" # Required for session
     app.config.from_object(config[config_name])
+    app.json = TimedJSONProvider(app)
     
     # Initialize CORS
     CORS(app)
     
     # Initialize Logger
-    logger.info(f"Starting app in {config_name} mode")
+    logger.info("Starting app in %s mode", config_name)
     
     # Initialize Firebase
-    with app.app_context():
+    with app.app_context(), startup_timer.phase("firebase_init"):
         initialize_firebase()
 
     # Register Error Handlers
     register_error_handlers(app)
 
+    # Per-route/per-stage timings, exposed at /metrics
+    init_request_metrics(app)
+
+    # Optional per-request RTDB tracing (RTDB_TRACE=1 or a sample rate)
+    init_rtdb_trace(app)
+
+    # Token-bucket limits and load shedding for /auth routes
+    init_rate_limiting(app)
+
+    # Per-route deadline budget consulted by every upstream call
+    init_deadlines(app)
+
     # Register Blueprints
-    from .routes.auth_routes import auth_bp
-    app.register_blueprint(auth_bp, url_prefix="/auth")
+    with startup_timer.phase("blueprints"):
+        from .routes.auth_routes import auth_bp
+        app.register_blueprint(auth_bp, url_prefix="/auth")
 
-    from .routes.admin_routes import admin_bp
-    app.register_blueprint(admin_bp, url_prefix="/admin")
+        from .routes.admin_routes import admin_bp
+        app.register_blueprint(admin_bp, url_prefix="/admin")
     
     # Health check
     @app.route("/health")
     def health():
         return {"status": "ok"}, 200
 
+    # Under gunicorn preload_app connections are opened per worker in post_fork instead
+    if app.config.get("WARMUP"):
+        warm_up(open_connections=os.getenv("GUNICORN_PRELOAD") != "1")
+
     return app
@@ -0,0 +1,363 @@
+import os
+import time
+import asyncio
+import contextvars
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+from .config import config
+from . import firebase
+from .services import rtdb
+from .services.auth_service import AuthService
+from .utils.error_handler import AppError, deadline_cause
+from .utils.logger import logger
+from .utils.metrics import metrics, scrape_allowed, set_route, stage
+from .utils.ratelimit import client_ip, rate_limiter, rejection
+from .utils import idempotency, deadline
+from .utils.idempotency import idempotency_store
+from .warmup import startup_timer, warm_up
+
+# Async serving mode: the same /auth routes and response shapes as
+# routes/auth_routes.py, served by an ASGI server (uvicorn asgi:app).
+# firebase_admin and AuthService are blocking, so each upstream call runs on a
+# bounded thread pool; a slow upstream holds a pool thread, not a worker, and
+# independent calls (e.g. the two reads in voice_command) run concurrently.
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ASGI_THREADS", "64")), thread_name_prefix="asgi-io"
+)
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run a blocking call on the I/O pool, keeping contextvars (route, deadline)."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, partial(ctx.run, fn, *args, **kwargs))
+
+
+async def _json_body(request):
+    body = await request.body()
+    if not body:
+        return {}
+    try:
+        data = await request.json()
+    except ValueError:
+        raise AppError("Invalid JSON body", 400)
+    return data if isinstance(data, dict) else {}
+
+
+class _Limited(Exception):
+    """Carries a 429/503 (body, status, headers) out of the rate-limit checks."""
+
+
+async def _idempotent(request, route, uid, call):
+    """Async counterpart of utils.idempotency.idempotent: duplicates wait without holding a thread."""
+    key = request.headers[idempotency.HEADER]
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        return JSONResponse({"error": f"{idempotency.HEADER} must be at most "
+                                      f"{idempotency.MAX_KEY_LENGTH} characters"}, status_code=400)
+    key = idempotency.scoped_key(uid, route, key)
+    fp = idempotency.fingerprint(await request.body())
+    wait_end, by_deadline = idempotency.wait_until()
+    waited = False
+    try:
+        while True:
+            state, stored = await run_sync(idempotency_store.begin, key, fp)
+            if state != idempotency.WAIT:
+                break
+            if time.monotonic() >= wait_end:
+                idempotency.record(route, "timeout")
+                if by_deadline:
+                    raise deadline.exceeded("idempotency_wait")
+                return JSONResponse({"error": f"A request with this {idempotency.HEADER} is still in progress"},
+                                    status_code=409, headers={"Retry-After": "1"})
+            waited = True
+            await asyncio.sleep(idempotency.POLL_INTERVAL)
+    except sqlite3.Error as e:
+        logger.warning("Idempotency store unavailable, executing request: %s", e)
+        body, status = await call()
+        return JSONResponse(body, status_code=status)
+
+    if state == idempotency.MISMATCH:
+        idempotency.record(route, "mismatch")
+        return JSONResponse({"error": f"{idempotency.HEADER} was already used with a different request body"},
+                            status_code=422)
+    if state == idempotency.REPLAY:
+        idempotency.record(route, "waited" if waited else "replay")
+        status, mimetype, body = stored
+        return Response(body, status_code=status, media_type=mimetype, headers={"Idempotent-Replayed": "true"})
+
+    idempotency.record(route, "executed")
+    try:
+        body, status = await call()
+    except BaseException:
+        await run_sync(idempotency.finish, key)
+        raise
+    response = JSONResponse(body, status_code=status)
+    await run_sync(idempotency.finish, key, status, "application/json", response.body)
+    return response
+
+
+def _endpoint(route, needs_auth, idempotent=False):
+    """Wrap a handler with Flask-compatible auth, error shapes and request metrics."""
+
+    def decorator(handler):
+        @wraps(handler)
+        async def endpoint(request: Request):
+            set_route(route)
+            deadline.start(route)
+            start = time.perf_counter()
+            headers, slot, response = None, None, None
+            try:
+                ip = client_ip(request.client.host if request.client else None,
+                               request.headers.get("X-Forwarded-For"))
+                retry_after = await run_sync(rate_limiter.check, route, ip=ip)
+                if retry_after:
+                    raise _Limited(*rejection(retry_after))
+                slot, shed = await run_sync(rate_limiter.acquire, route)
+                if shed:
+                    raise _Limited(*rejection(1, shed=True))
+                data = await _json_body(request) if request.method in ("POST", "PUT", "DELETE") else {}
+                if needs_auth:
+                    token = request.headers.get("Authorization", "")
+                    with stage("token_verify"):
+                        uid = await run_sync(AuthService.verify_token, token)
+                    retry_after = await run_sync(rate_limiter.check, route, uid=uid)
+                    if retry_after:
+                        raise _Limited(*rejection(retry_after))
+                    with stage("entitlement"):
+                        profile = await run_sync(AuthService.get_profile, uid)
+                    if not profile.get("verifiedAccess"):
+                        body, status = {"error": "Access Denied: No License Token"}, 403
+                    elif idempotent and request.headers.get(idempotency.HEADER):
+                        response = await _idempotent(request, route, uid, partial(handler, uid, data))
+                        status = response.status_code
+                    else:
+                        body, status = await handler(uid, data)
+                else:
+                    body, status = await handler(data)
+            except _Limited as e:
+                body, status, headers = e.args
+            except Exception as e:
+                cause = deadline_cause(e) or e
+                if isinstance(cause, AppError):
+                    body, status = {"error": cause.message}, cause.status_code
+                elif needs_auth:
+                    body, status = {"error": "Unauthorized"}, 401
+                else:
+                    logger.exception("Unhandled Exception: %s", e)
+                    body, status = {"status": "error", "message": "An unexpected error occurred",
+                                    "error": str(e)}, 500
+            finally:
+                if slot is not None:
+                    await run_sync(rate_limiter.release, slot)
+            if response is None:
+                with stage("serialize"):
+                    response = JSONResponse(body, status_code=status, headers=headers)
+            labels = {"route": route, "method": request.method, "status": str(status)}
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start, labels)
+            metrics.inc("http_requests_total", labels)
+            metrics.maybe_flush()
+            return response
+
+        endpoint.route = route
+        return endpoint
+
+    return decorator
+
+
+# ---------- Public ----------
+@_endpoint("/auth/signup", needs_auth=False)
+async def signup(data):
+    result = await run_sync(AuthService.signup, data.get("email"), data.get("password"),
+                            data.get("name", ""), data.get("accessToken"))
+    return result, 200
+
+
+@_endpoint("/auth/login", needs_auth=False)
+async def login(data):
+    return await run_sync(AuthService.login, data.get("email"), data.get("password")), 200
+
+
+@_endpoint("/auth/refresh", needs_auth=False)
+async def refresh(data):
+    return await run_sync(AuthService.refresh_token, data.get("refreshToken")), 200
+
+
+# ---------- Authenticated ----------
+@_endpoint("/auth/profile", needs_auth=True)
+async def profile(uid, data):
+    return await run_sync(AuthService.get_profile, uid), 200
+
+
+@_endpoint("/auth/save_fcm_token", needs_auth=True)
+async def save_fcm_token(uid, data):
+    token = data.get("token")
+    if not token:
+        return {"error": "FCM token required"}, 400
+    return await run_sync(AuthService.save_fcm_token, uid, token), 200
+
+
+@_endpoint("/auth/add_venue", needs_auth=True)
+async def add_venue(uid, data):
+    result = await run_sync(AuthService.add_venue, uid, data.get("venue"))
+    return {"message": "Venue added", **result}, 200
+
+
+@_endpoint("/auth/add_device", needs_auth=True)
+async def add_device(uid, data):
+    result = await run_sync(AuthService.add_device, uid, data.get("venue"), data.get("device"),
+                            data.get("state", "off"))
+    return {"message": "Device added", **result}, 200
+
+
+@_endpoint("/auth/device_state", needs_auth=True, idempotent=True)
+async def device_state(uid, data):
+    result = await run_sync(AuthService.update_device_state, uid, data.get("venue"), data.get("device"),
+                            data.get("value"))
+    return {"message": "Updated", **result}, 200
+
+
+@_endpoint("/auth/delete_venue", needs_auth=True)
+async def delete_venue(uid, data):
+    result = await run_sync(AuthService.delete_venue, uid, data.get("venue"))
+    return {"message": "Venue deleted", **result}, 200
+
+
+@_endpoint("/auth/delete_device", needs_auth=True)
+async def delete_device(uid, data):
+    result = await run_sync(AuthService.delete_device, uid, data.get("venue"), data.get("device"))
+    return {"message": "Device deleted", **result}, 200
+
+
+@_endpoint("/auth/set_schedule", needs_auth=True, idempotent=True)
+async def set_schedule(uid, data):
+    result = await run_sync(AuthService.set_schedule, uid, data.get("venue"), data.get("device"),
+                            data.get("time"), data.get("action"))
+    return result, 200
+
+
+@_endpoint("/auth/get_schedules", needs_auth=True)
+async def get_schedules(uid, data):
+    return {"schedules": await run_sync(AuthService.get_schedules, uid)}, 200
+
+
+@_endpoint("/auth/delete_schedule", needs_auth=True)
+async def delete_schedule(uid, data):
+    return await run_sync(AuthService.delete_schedule, uid, data.get("venue"), data.get("device")), 200
+
+
+@_endpoint("/auth/set_voice_key", needs_auth=True)
+async def set_voice_key(uid, data):
+    return await run_sync(AuthService.set_voice_key, uid, data.get("apiKey")), 200
+
+
+@_endpoint("/auth/voice_key_exists", needs_auth=True)
+async def voice_key_exists(uid, data):
+    return {"exists": await run_sync(AuthService.voice_key_exists, uid)}, 200
+
+
+@_endpoint("/auth/voice_command", needs_auth=True, idempotent=True)
+async def voice_command(uid, data):
+    text = data.get("text")
+    if not text:
+        raise AppError("No text provided", 400)
+    # The API key and the venue catalog are independent reads
+    try:
+        secure, venues = await asyncio.gather(
+            run_sync(rtdb.get, f"users/{uid}/secure"),
+            run_sync(rtdb.get, f"users/{uid}/venues"),
+        )
+    except Exception as e:
+        logger.error("Voice command error: %s", e)
+        raise AppError("Voice command processing failed", 500)
+    result = await run_sync(AuthService.voice_command, uid, text, secure or {}, venues or {})
+    return result, 200
+
+
+@_endpoint("/auth/add_monitoring_venue", needs_auth=True)
+async def add_monitoring_venue(uid, data):
+    venue = data.get("venue")
+    sensors = data.get("sensors", [])
+    if not venue:
+        return {"error": "Venue required"}, 400
+    if not isinstance(sensors, list) or not sensors:
+        return {"error": "Sensor list required"}, 400
+    return await run_sync(AuthService.add_mon_venue, uid, venue, sensors), 200
+
+
+@_endpoint("/auth/get_monitoring_data", needs_auth=True)
+async def get_monitoring_data(uid, data):
+    return {"monitoring": await run_sync(AuthService.get_mon, uid)}, 200
+
+
+@_endpoint("/auth/delete_monitoring_venue", needs_auth=True)
+async def delete_monitoring_venue(uid, data):
+    venue = data.get("venue")
+    if not venue:
+        return {"error": "Venue required"}, 400
+    return await run_sync(AuthService.delete_monitoring_venue, uid, venue), 200
+
+
+@_endpoint("/auth/update_schedule_status", needs_auth=True)
+async def update_schedule_status(uid, data):
+    venue = data.get("venue")
+    device = data.get("device")
+    status = data.get("status")  # "enable" or "disable"
+    if not venue or not device or status not in ["enable", "disable"]:
+        return {"error": "venue, device and valid status required"}, 400
+    result = await run_sync(AuthService.update_schedule_status, uid, venue, device, status)
+    return {"message": "Schedule status updated", **result}, 200
+
+
+# Same methods as the Flask blueprint
+ROUTES = [
+    (signup, ["POST"]), (login, ["POST"]), (refresh, ["POST"]),
+    (profile, ["GET"]), (save_fcm_token, ["POST"]),
+    (add_venue, ["POST"]), (add_device, ["POST"]), (device_state, ["POST"]),
+    (delete_venue, ["DELETE"]), (delete_device, ["DELETE"]),
+    (set_schedule, ["POST"]), (get_schedules, ["GET"]), (delete_schedule, ["DELETE"]),
+    (set_voice_key, ["POST"]), (voice_key_exists, ["GET"]), (voice_command, ["POST"]),
+    (add_monitoring_venue, ["POST"]), (get_monitoring_data, ["GET"]),
+    (delete_monitoring_venue, ["DELETE"]), (update_schedule_status, ["POST"]),
+]
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics_endpoint(request):
+    if not scrape_allowed(request.headers.get("Authorization"), request.client.host if request.client else None,
+                          request.headers.get("X-Forwarded-For")):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def not_found(request, exc):
+    return JSONResponse({"status": "error", "message": "Resource not found", "error": "Not Found"},
+                        status_code=404)
+
+
+def create_asgi_app(config_name="default"):
+    logger.info("Starting ASGI app in %s mode", config_name)
+    with startup_timer.phase("firebase_init"):
+        firebase.initialize_firebase()
+
+    routes = [Route(endpoint.route, endpoint, methods=methods) for endpoint, methods in ROUTES]
+    routes += [Route("/health", health), Route("/metrics", metrics_endpoint)]
+    app = Starlette(routes=routes, exception_handlers={404: not_found})
+    rate_limiter.enabled = getattr(config[config_name], "RATE_LIMIT", True)
+
+    if getattr(config[config_name], "WARMUP", False):
+        warm_up()
+    return app
@@ -7,6 +7,12 @@ class Config:
     FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
     DATABASE_URL = os.getenv("DATABASE_URL")
     GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+
+    # Prefetch token certs and open upstream connections in create_app
+    WARMUP = os.getenv("WARMUP", "0") == "1"
+
+    # Per-IP/uid/route rate limits and concurrency limits (app/utils/ratelimit.py)
+    RATE_LIMIT = os.getenv("RATE_LIMIT", "1") == "1"
     
     # Caching Config
     CACHE_TYPE = "SimpleCache"  # Use 'RedisCache' for production
@@ -19,6 +25,7 @@ class ProductionConfig(Config):
     # Security headers, etc.
     SESSION_COOKIE_SECURE = True
     REMEMBER_COOKIE_SECURE = True
+    WARMUP = os.getenv("WARMUP", "1") == "1"
     
     # Example Redis Config (commented out)
     # CACHE_TYPE = "RedisCache"
@@ -27,6 +34,7 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     DEBUG = True
+    RATE_LIMIT = os.getenv("RATE_LIMIT", "0") == "1"
 
 config = {
     "development": DevelopmentConfig,
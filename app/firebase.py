@@ -18,5 +18,5 @@ def initialize_firebase():
             firebase_admin.initialize_app(cred, {"databaseURL": db_url})
             logger.info("Firebase initialized successfully.")
         except Exception as e:
-            logger.critical(f"Failed to initialize Firebase: {e}")
+            logger.critical("Failed to initialize Firebase: %s", e)
             raise e
@@ -1,5 +1,11 @@
-from flask import Blueprint, request, render_template, redirect, url_for, session
+import json
+from flask import Blueprint, Response, request, render_template, redirect, url_for, session, jsonify, stream_with_context
 from ..services.auth_service import AuthService
+from ..services import rtdb, provisioning, fleet_stats
+from ..utils.singleflight import token_verifications
+from ..utils import rtdb_trace
+from ..utils.ratelimit import rate_limiter
+from ..utils.idempotency import idempotency_store
 
 admin_bp = Blueprint("admin", __name__)
 ADMIN_PASSWORD = "dober@03"
@@ -10,7 +16,11 @@ def index():
         return render_template("admin.html", authenticated=False)
     
     tokens = AuthService.get_valid_keys()
-    return render_template("admin.html", authenticated=True, tokens=tokens)
+    try:
+        stats = fleet_stats.read()
+    except Exception:
+        stats = None
+    return render_template("admin.html", authenticated=True, tokens=tokens, stats=stats)
 
 @admin_bp.route("/login", methods=["POST"])
 def login():
@@ -45,3 +55,99 @@ def delete_token():
             tokens.remove(token)
             AuthService.update_valid_keys(tokens)
     return redirect(url_for("admin.index"))
+
+@admin_bp.route("/bulk_provision", methods=["POST"])
+def bulk_provision():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    users = data.get("users")
+    if not isinstance(users, list) or not users:
+        return jsonify({"error": "users list required"}), 400
+    if len(users) > provisioning.MAX_ROWS:
+        return jsonify({"error": f"At most {provisioning.MAX_ROWS} users per request"}), 400
+
+    # One JSON line per row as each import batch completes, then a summary line
+    def generate():
+        for result in provisioning.bulk_provision(users):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@admin_bp.route("/fleet_stats", methods=["GET"])
+def fleet_stats_view():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(fleet_stats.read()), 200
+
+@admin_bp.route("/fleet_stats/reconcile", methods=["POST"])
+def fleet_stats_reconcile():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+    started = fleet_stats.reconcile_in_background()
+    return jsonify({"message": "Reconcile started" if started else "Reconcile already running"}), 202
+
+@admin_bp.route("/export_users", methods=["GET"])
+def export_users():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    # ?fields=email,name limits each record; API keys under "secure" are never exported
+    fields = [f for f in request.args.get("fields", "").split(",") if f and f != "secure"]
+    page_size = request.args.get("page_size", type=int)
+    if "page_size" in request.args and not (page_size and 1 <= page_size <= rtdb.MAX_PAGE_SIZE):
+        return jsonify({"error": f"page_size must be an integer from 1 to {rtdb.MAX_PAGE_SIZE}"}), 400
+
+    def generate():
+        for uid, user in rtdb.iter_children("users", page_size=page_size):
+            user = user if isinstance(user, dict) else {}
+            if fields:
+                record = {f: user[f] for f in fields if f in user}
+            else:
+                record = {k: v for k, v in user.items() if k != "secure"}
+            yield json.dumps({"uid": uid, **record}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@admin_bp.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify(rtdb.cache_stats()), 200
+
+@admin_bp.route("/ratelimit_stats", methods=["GET"])
+def ratelimit_stats():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify({
+        "enabled": rate_limiter.enabled,
+        "limits": rate_limiter.limits,
+        "concurrency": rate_limiter.stats()
+    }), 200
+
+@admin_bp.route("/idempotency_stats", methods=["GET"])
+def idempotency_stats():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify(idempotency_store.stats()), 200
+
+@admin_bp.route("/singleflight_stats", methods=["GET"])
+def singleflight_stats():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify({
+        "rtdb_read": rtdb.singleflight_stats(),
+        "verify_id_token": token_verifications.stats()
+    }), 200
+
+@admin_bp.route("/rtdb_trace", methods=["GET"])
+def rtdb_trace_report():
+    if not session.get("admin_authenticated"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify(rtdb_trace.report()), 200
@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from ..services.auth_service import AuthService
 from ..utils.response import success_response, error_response
-from ..utils.error_handler import AppError
+from ..utils.error_handler import AppError, deadline_cause
+from ..utils.metrics import stage
+from ..utils.ratelimit import check_user
+from ..utils.idempotency import idempotent
+from ..utils.capture import init_capture
 from functools import wraps
 
 auth_bp = Blueprint("auth", __name__)
 
+# Opt-in (TRAFFIC_CAPTURE) sanitized request log for benchmarks/replay.py
+init_capture(auth_bp)
+
 def get_uid():
     token = request.headers.get("Authorization", "")
     return AuthService.verify_token(token)
@@ -14,17 +21,28 @@ def require_auth(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
-            uid = get_uid()
-            
+            with stage("token_verify"):
+                uid = get_uid()
+            g.uid = uid
+
+            limited = check_user(uid)
+            if limited:
+                return limited
+
             # Enforce verifiedAccess
-            profile = AuthService.get_profile(uid)
+            with stage("entitlement"):
+                profile = AuthService.get_profile(uid)
             if not profile.get("verifiedAccess"):
                 return jsonify({"error": "Access Denied: No License Token"}), 403
 
             return f(uid, *args, **kwargs)
         except AppError as e:
+            e = deadline_cause(e) or e
             return jsonify({"error": e.message}), e.status_code
         except Exception as e:
+            cause = deadline_cause(e)
+            if cause:
+                return jsonify({"error": cause.message}), cause.status_code
             return jsonify({"error": "Unauthorized"}), 401
     return decorated_function
 
@@ -93,6 +111,7 @@ def add_device(uid):
 
 @auth_bp.route("/device_state", methods=["POST"])
 @require_auth
+@idempotent
 def device_state(uid):
     data = request.json or {}
     result = AuthService.update_device_state(uid, data.get("venue"), data.get("device"), data.get("value"))
@@ -114,6 +133,7 @@ def delete_device(uid):
 
 @auth_bp.route("/set_schedule", methods=["POST"])
 @require_auth
+@idempotent
 def set_schedule(uid):
     data = request.json or {}
     result = AuthService.set_schedule(
@@ -153,6 +173,7 @@ def voice_key_exists(uid):
 
 @auth_bp.route("/voice_command", methods=["POST"])
 @require_auth
+@idempotent
 def voice_command(uid):
     data = request.json or {}
     result = AuthService.voice_command(uid, data.get("text"))
@@ -3,19 +3,31 @@ import re
 import json
 import time
 import requests
+from urllib.parse import urlparse
 from http.client import RemoteDisconnected
 from requests.exceptions import SSLError
-from firebase_admin import auth, db
+from firebase_admin import auth
+from . import rtdb, fleet_stats
+from .voice_prompt import build_prompt, device_catalog, in_catalog, select_relevant
 from ..utils.logger import logger
 from ..utils.error_handler import AppError
+from ..utils import deadline
+from ..utils.singleflight import token_verifications
+from ..utils.metrics import metrics, stage, count_retry
 
 class AuthService:
     
     _INVALID_DB_CHARS = {'.', '#', '$', '[', ']', '/'}
     API_KEY = os.getenv("FIREBASE_API_KEY")
 
+    # Keep-alive connection pool for the Google REST APIs (pre-opened by app.warmup)
+    _session = requests.Session()
+
     TOKEN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'access_tokens.json')
 
+    # (mtime_ns, frozenset of keys); reloaded when access_tokens.json changes
+    _valid_key_cache = (None, frozenset())
+
     @staticmethod
     def _load_tokens():
         try:
@@ -24,7 +36,7 @@ class AuthService:
                     return json.load(f)
             return []
         except Exception as e:
-            logger.error(f"Error loading tokens: {e}")
+            logger.error("Error loading tokens: %s", e)
             return []
 
     @staticmethod
@@ -34,13 +46,26 @@ class AuthService:
                 json.dump(tokens, f, indent=2)
             return True
         except Exception as e:
-            logger.error(f"Error saving tokens: {e}")
+            logger.error("Error saving tokens: %s", e)
             return False
 
     @staticmethod
     def get_valid_keys():
         return AuthService._load_tokens()
 
+    @staticmethod
+    def valid_key_set():
+        """License keys as a set, re-read only when the token file's mtime changes."""
+        try:
+            mtime = os.stat(AuthService.TOKEN_FILE).st_mtime_ns
+        except OSError:
+            mtime = None
+        cached_mtime, keys = AuthService._valid_key_cache
+        if mtime != cached_mtime:
+            keys = frozenset(AuthService._load_tokens())
+            AuthService._valid_key_cache = (mtime, keys)
+        return keys
+
     @staticmethod
     def update_valid_keys(keys):
         if AuthService._save_tokens(keys):
@@ -75,8 +100,10 @@ class AuthService:
         token = token.replace("Bearer ", "")
         last_exc = None
         for attempt in range(1, 4):
+            deadline.check("verify_id_token")
             try:
-                decoded = auth.verify_id_token(token)
+                # Devices of one household launching together share one verification
+                decoded = token_verifications.do(token, lambda: auth.verify_id_token(token))
                 return decoded.get("uid")
             except Exception as e:
                 last_exc = e
@@ -94,40 +121,43 @@ class AuthService:
                     # If final attempt and it's a transient/network issue, return 503 so clients
                     # can differentiate from an auth error; otherwise return 401.
                     if transient:
-                        logger.error(f"Token verification failed (network): {e}")
+                        logger.error("Token verification failed (network): %s", e)
                         raise AppError("Token verification failed due to network/SSL", 503)
                     else:
-                        logger.error(f"Token verification failed: {e}")
+                        logger.error("Token verification failed: %s", e)
                         raise AppError("Invalid or expired token", 401)
 
                 if not transient:
-                    logger.error(f"Token verification failed: {e}")
+                    logger.error("Token verification failed: %s", e)
                     raise AppError("Invalid or expired token", 401)
 
-                # Log and back off a little before retrying
-                logger.info(f"Transient error verifying token (attempt {attempt}/3): {e} — retrying...")
+                # Log and back off a little before retrying, if the request's budget still allows it
+                if not deadline.allows_retry("verify_id_token", 2 ** (attempt - 1)):
+                    logger.error("Token verification failed (network), no budget left to retry: %s", e)
+                    raise deadline.exceeded("verify_id_token")
+                logger.info("Transient error verifying token (attempt %s/3): %s — retrying...", attempt, e)
+                count_retry("verify_id_token")
                 time.sleep(2 ** (attempt - 1))
 
     @staticmethod
     def signup(email, password, name, access_token):
-        valid_keys = AuthService.get_valid_keys()
-        if access_token not in valid_keys:
+        if not isinstance(access_token, str) or access_token not in AuthService.valid_key_set():
             raise AppError("Invalid Access Token", 403)
 
         try:
             user = auth.create_user(email=email, password=password, display_name=name)
-            ref = db.reference(f"users/{user.uid}")
-            ref.update({
+            rtdb.update(f"users/{user.uid}", {
                 "email": email, 
                 "name": name, 
                 "verifiedAccess": True,
                 "accessKey": access_token,
                 "venues": {}
             })
-            logger.info(f"User signed up: {user.uid}")
+            fleet_stats.bump({"users": 1, f"tiers/{fleet_stats.tier(access_token)}": 1})
+            logger.info("User signed up: %s", user.uid)
             return {"uid": user.uid}
         except Exception as e:
-            logger.error(f"Signup error: {e}")
+            logger.error("Signup error: %s", e)
             raise AppError(str(e), 400)
 
     @staticmethod
@@ -161,8 +191,7 @@ class AuthService:
     @staticmethod
     def get_profile(uid):
         try:
-            ref = db.reference(f"users/{uid}")
-            data = ref.get() or {}
+            data = rtdb.get(f"users/{uid}") or {}
             
             # Extract faults
             faults_value = ""
@@ -181,7 +210,7 @@ class AuthService:
                 "verifiedAccess": data.get("verifiedAccess", False)
             }
         except Exception as e:
-            logger.error(f"Get profile error: {e}")
+            logger.error("Get profile error: %s", e)
             raise AppError("Unable to fetch profile", 500)
 
     @staticmethod
@@ -190,20 +219,22 @@ class AuthService:
             raise AppError("Invalid venue name", 400)
         
         try:
-            parent_ref = db.reference(f"users/{uid}/venues")
-            parent_ref.update({venue_name.strip(): {"__created": True}})
+            # Re-adding a venue replaces it, dropping its devices
+            previous = rtdb.get(f"users/{uid}/venues/{venue_name.strip()}")
+            rtdb.update(f"users/{uid}/venues", {venue_name.strip(): {"__created": True}})
+            fleet_stats.bump({"venues": int(previous is None), "devices": -fleet_stats.device_count(previous or {})})
             
             # Verify write
-            parent_val = parent_ref.get() or {}
+            parent_val = rtdb.get(f"users/{uid}/venues") or {}
             if venue_name.strip() not in parent_val:
                 raise AppError("Venue creation failed (persistence check)", 500)
                 
-            logger.info(f"Venue added: {venue_name} for user {uid}")
+            logger.info("Venue added: %s for user %s", venue_name, uid)
             return {"venue": venue_name.strip()}
         except AppError:
             raise
         except Exception as e:
-            logger.error(f"Add venue error: {e}")
+            logger.error("Add venue error: %s", e)
             raise AppError("Unable to create venue", 500)
 
     @staticmethod
@@ -214,18 +245,21 @@ class AuthService:
             raise AppError("Invalid venue or device name", 400)
 
         try:
-            ref = db.reference(f"users/{uid}/venues/{venue.strip()}")
+            path = f"users/{uid}/venues/{venue.strip()}"
             # Check if venue exists
-            if ref.get() is None:
+            venue_data = rtdb.get(path)
+            if venue_data is None:
                  raise AppError("Venue does not exist", 404)
 
-            ref.update({device.strip(): state})
-            logger.info(f"Device added: {device} to {venue} for user {uid}")
+            rtdb.update(path, {device.strip(): state})
+            if not isinstance(venue_data, dict) or device.strip() not in venue_data:
+                fleet_stats.bump({"devices": 1})
+            logger.info("Device added: %s to %s for user %s", device, venue, uid)
             return {"device": device.strip()}
         except AppError:
             raise
         except Exception as e:
-            logger.error(f"Add device error: {e}")
+            logger.error("Add device error: %s", e)
             raise AppError("Unable to add device", 500)
 
     @staticmethod
@@ -238,12 +272,11 @@ class AuthService:
             raise AppError("Invalid venue or device name", 400)
 
         try:
-            ref = db.reference(f"users/{uid}/venues/{venue.strip()}")
-            ref.update({device.strip(): new_state})
-            logger.info(f"Device state updated: {device} -> {new_state}")
+            rtdb.update(f"users/{uid}/venues/{venue.strip()}", {device.strip(): new_state})
+            logger.info("Device state updated: %s -> %s", device, new_state)
             return {"value": new_state}
         except Exception as e:
-            logger.error(f"Update device state error: {e}")
+            logger.error("Update device state error: %s", e)
             raise AppError("Unable to update state", 500)
 
     @staticmethod
@@ -252,12 +285,14 @@ class AuthService:
             raise AppError("Invalid venue name", 400)
             
         try:
-            ref = db.reference(f"users/{uid}/venues/{venue.strip()}")
-            ref.delete()
-            logger.info(f"Venue deleted: {venue} for user {uid}")
+            previous = rtdb.get(f"users/{uid}/venues/{venue.strip()}")
+            rtdb.delete(f"users/{uid}/venues/{venue.strip()}")
+            if previous is not None:
+                fleet_stats.bump({"venues": -1, "devices": -fleet_stats.device_count(previous)})
+            logger.info("Venue deleted: %s for user %s", venue, uid)
             return {"venue": venue.strip()}
         except Exception as e:
-            logger.error(f"Delete venue error: {e}")
+            logger.error("Delete venue error: %s", e)
             raise AppError("Unable to delete venue", 500)
 
     @staticmethod
@@ -266,12 +301,14 @@ class AuthService:
             raise AppError("Invalid venue or device name", 400)
             
         try:
-            ref = db.reference(f"users/{uid}/venues/{venue.strip()}/{device.strip()}")
-            ref.delete()
-            logger.info(f"Device deleted: {device} from {venue} for user {uid}")
+            previous = rtdb.get(f"users/{uid}/venues/{venue.strip()}/{device.strip()}")
+            rtdb.delete(f"users/{uid}/venues/{venue.strip()}/{device.strip()}")
+            if previous is not None:
+                fleet_stats.bump({"devices": -1})
+            logger.info("Device deleted: %s from %s for user %s", device, venue, uid)
             return {"device": device.strip()}
         except Exception as e:
-            logger.error(f"Delete device error: {e}")
+            logger.error("Delete device error: %s", e)
             raise AppError("Unable to delete device", 500)
 
     @staticmethod
@@ -280,27 +317,27 @@ class AuthService:
         time_string = str(time).strip()  # preserve exactly what frontend sends
 
         try:
-            ref = db.reference(f"users/{uid}/schedules/{venue}/{device}")
-            ref.update({
+            previous = rtdb.get(f"users/{uid}/schedules/{venue}/{device}")
+            rtdb.update(f"users/{uid}/schedules/{venue}/{device}", {
                 "time": time_string,
                 "action": action,
                 "status": "enable" if enabled else "disable"
             })
-            logger.info(f"Schedule set: {venue}/{device} at {time_string}")
+            fleet_stats.bump({"activeSchedules": bool(enabled) - fleet_stats.is_active(previous)})
+            logger.info("Schedule set: %s/%s at %s", venue, device, time_string)
             return {"venue": venue, "device": device, "time": time_string, "action": action, "status": enabled}
         except Exception as e:
-            logger.error(f"Set schedule error: {e}")
+            logger.error("Set schedule error: %s", e)
             raise AppError("Unable to set schedule", 500)
 
 
     @staticmethod
     def get_schedules(uid):
         try:
-            ref = db.reference(f"users/{uid}/schedules")
-            data = ref.get() or {}
+            data = rtdb.get(f"users/{uid}/schedules") or {}
             return data
         except Exception as e:
-            logger.error(f"Get schedules error: {e}")
+            logger.error("Get schedules error: %s", e)
             raise AppError("Unable to fetch schedules", 500)
 
     @staticmethod
@@ -309,12 +346,13 @@ class AuthService:
             raise AppError("Invalid venue or device name", 400)
             
         try:
-            ref = db.reference(f"users/{uid}/schedules/{venue}/{device}")
-            ref.delete()
-            logger.info(f"Schedule deleted: {venue}/{device}")
+            previous = rtdb.get(f"users/{uid}/schedules/{venue}/{device}")
+            rtdb.delete(f"users/{uid}/schedules/{venue}/{device}")
+            fleet_stats.bump({"activeSchedules": -fleet_stats.is_active(previous)})
+            logger.info("Schedule deleted: %s/%s", venue, device)
             return {"message": "Schedule deleted"}
         except Exception as e:
-            logger.error(f"Delete schedule error: {e}")
+            logger.error("Delete schedule error: %s", e)
             raise AppError("Unable to delete schedule", 500)
 
     @staticmethod
@@ -322,100 +360,97 @@ class AuthService:
         if not key:
             raise AppError("API key required", 400)
         try:
-            ref = db.reference(f"users/{uid}/secure")
-            ref.update({"gemini_key": key})
-            logger.info(f"Voice key set for user {uid}")
+            rtdb.update(f"users/{uid}/secure", {"gemini_key": key})
+            logger.info("Voice key set for user %s", uid)
             return {"message": "Key saved securely"}
         except Exception as e:
-            logger.error(f"Set voice key error: {e}")
+            logger.error("Set voice key error: %s", e)
             raise AppError("Failed to save voice key", 500)
 
     @staticmethod
     def voice_key_exists(uid):
         try:
-            secure = db.reference(f"users/{uid}/secure").get() or {}
+            secure = rtdb.get(f"users/{uid}/secure") or {}
             return bool(secure.get("gemini_key"))
         except Exception as e:
-            logger.error(f"Check voice key error: {e}")
+            logger.error("Check voice key error: %s", e)
             raise AppError("Failed to check voice key", 500)
 
     @staticmethod
-    def voice_command(uid, text):
+    def voice_command(uid, text, secure=None, profile=None):
+        # secure/profile (users/{uid}/secure and /venues) may be prefetched by the caller
         if not text:
             raise AppError("No text provided", 400)
 
         try:
             # Get API key
-            secure = db.reference(f"users/{uid}/secure").get() or {}
+            if secure is None:
+                secure = rtdb.get(f"users/{uid}/secure") or {}
             api_key = secure.get("gemini_key")
             if not api_key:
                 raise AppError("No API key stored", 400)
 
             # Get context
-            profile = db.reference(f"users/{uid}/venues").get() or {}
-            venues = list(profile.keys())
-            devices_map = {
-                v: [d for d in profile[v].keys() if d not in ("__created", "faults")]
-                for v in venues
-            }
+            if profile is None:
+                profile = rtdb.get(f"users/{uid}/venues") or {}
+            catalog = device_catalog(profile)
+            selected, trimmed = select_relevant(catalog, text)
+            prompt = build_prompt(selected, text)
 
             payload = {
                 "model": "gemini-2.0-flash",
-                "contents": [{
-                    "role": "user",
-                    "parts": [{
-                        "text": f"""
-Allowed Venues: {json.dumps(venues)}
-Allowed Devices: {json.dumps(devices_map)}
-
-Convert this command into JSON:
-{{"venue":"...", "device":"...", "value":"..."}}
-
-Rules:
-- Only use existing venue and device names
-- Value must be "on", "off", or 1-5
-- Support Tamil/English natural language
-- Support ALL venue and ALL device handling
-- If unknown, return null JSON
-User command: "{text}"
-Return STRICT JSON only.
-"""
-                    }]
-                }]
+                "contents": [{"role": "user", "parts": [{"text": prompt}]}]
             }
 
+            start = time.perf_counter()
             res_json = AuthService._post_with_retries(
                 f"https://generativelanguage.googleapis.com/v1/models/gemini-2.0-flash:generateContent?key={api_key}",
                 payload,
                 timeout=10
             )
-            
+            AuthService._record_gemini_usage(prompt, res_json, time.perf_counter() - start, trimmed)
+
             try:
                 raw = res_json["candidates"][0]["content"]["parts"][0]["text"].strip()
                 raw = raw.replace("```json", "").replace("```", "")
                 command_data = json.loads(raw)
             except (KeyError, IndexError, json.JSONDecodeError):
-                logger.error(f"Gemini response parsing failed: {res_json}")
+                logger.error("Gemini response parsing failed: %s", res_json)
                 raise AppError("Unable to parse Gemini response", 500)
 
             if not command_data.get("venue") or not command_data.get("device") or not command_data.get("value"):
                 raise AppError("Not available in system", 400)
+            # The model only saw (part of) the catalog; never write a device that doesn't exist
+            if not in_catalog(catalog, command_data["venue"], command_data["device"]):
+                raise AppError("Not available in system", 400)
 
             # Execute
-            db.reference(f"users/{uid}/venues/{command_data['venue']}").update({
+            rtdb.update(f"users/{uid}/venues/{command_data['venue']}", {
                 command_data["device"]: command_data["value"]
             })
             
-            logger.info(f"Voice command executed: {command_data}")
+            logger.info("Voice command executed: %s", command_data)
             return {"message": "Action applied", **command_data}
 
         except AppError:
             raise
         except Exception as e:
-            logger.error(f"Voice command error: {e}")
+            logger.error("Voice command error: %s", e)
             raise AppError("Voice command processing failed", 500)
              
 
+    @staticmethod
+    def _record_gemini_usage(prompt, res_json, elapsed, trimmed):
+        usage = res_json.get("usageMetadata") or {}
+        metrics.inc("gemini_calls_total", {"catalog": "selected" if trimmed else "full"})
+        metrics.inc("gemini_prompt_bytes_total", value=len(prompt.encode("utf-8")))
+        metrics.inc("gemini_response_bytes_total", value=len(json.dumps(res_json).encode("utf-8")))
+        metrics.observe("gemini_request_duration_seconds", elapsed)
+        for kind, field in (("prompt", "promptTokenCount"), ("response", "candidatesTokenCount")):
+            if usage.get(field):
+                metrics.inc("gemini_tokens_total", {"kind": kind}, usage[field])
+        logger.debug("Gemini call: %s prompt bytes, %.3fs, usage %s", len(prompt), elapsed, usage)
+
     @staticmethod
     def add_mon_venue(uid, venue, sensors):
         if not venue:
@@ -424,12 +459,12 @@ Return STRICT JSON only.
             raise AppError("Sensor list required", 400)
             
         try:
-            ref = db.reference(f"users/{uid}/monitoring_venues/{venue}")
-            ref.update({s: "0" for s in sensors})
-            logger.info(f"Monitoring venue added: {venue} for user {uid}")
-            return {"message": "Monitoring venue created", "monitoring": ref.get()}
+            path = f"users/{uid}/monitoring_venues/{venue}"
+            rtdb.update(path, {s: "0" for s in sensors})
+            logger.info("Monitoring venue added: %s for user %s", venue, uid)
+            return {"message": "Monitoring venue created", "monitoring": rtdb.get(path)}
         except Exception as e:
-            logger.error(f"Add monitoring venue error: {e}")
+            logger.error("Add monitoring venue error: %s", e)
             raise AppError("Unable to add monitoring venue", 500)
 
     @staticmethod
@@ -439,9 +474,13 @@ Return STRICT JSON only.
         Returns parsed JSON on success or raises AppError.
         """
         last_exc = None
+        call = urlparse(url).netloc
         for attempt in range(1, retries + 1):
+            # Never wait past the request's deadline
+            call_timeout = deadline.timeout(call, timeout)
             try:
-                res = requests.post(url, json=payload, timeout=timeout)
+                with stage("external_post"):
+                    res = AuthService._session.post(url, json=payload, timeout=call_timeout)
 
                 # Attempt to parse JSON even if an HTTP error code was returned
                 data = res.json() if res.text else {}
@@ -455,28 +494,34 @@ Return STRICT JSON only.
 
             except SSLError as e:
                 last_exc = e
-                logger.error(f"SSL/network error contacting {url}: {e}")
+                logger.error("SSL/network error contacting %s: %s", url, e)
             except requests.RequestException as e:
                 last_exc = e
-                logger.error(f"Network error contacting {url}: {e}")
+                logger.error("Network error contacting %s: %s", url, e)
 
             # Backoff before retrying
             if attempt < retries:
                 sleep_for = 2 ** (attempt - 1)
-                logger.info(f"Retrying request to {url} (attempt {attempt + 1}/{retries}) after {sleep_for}s")
+                if not deadline.allows_retry(call, sleep_for):
+                    logger.error("No deadline budget left to retry POST %s: %s", call, last_exc)
+                    raise deadline.exceeded(call)
+                logger.info("Retrying request to %s (attempt %s/%s) after %ss", url, attempt + 1, retries, sleep_for)
+                count_retry(call)
                 time.sleep(sleep_for)
 
         # If we fall through, rethrow a friendly AppError
-        logger.error(f"All retries failed for POST {url}: {last_exc}")
+        logger.error("All retries failed for POST %s: %s", url, last_exc)
+        if deadline.exhausted():
+            # The last attempt was cut short by the request's deadline
+            raise deadline.exceeded(call)
         raise AppError("External service unreachable (network/SSL)", 503)
 
     @staticmethod
     def get_mon(uid):
         try:
-            ref = db.reference(f"users/{uid}/monitoring_venues")
-            return ref.get() or {}
+            return rtdb.get(f"users/{uid}/monitoring_venues") or {}
         except Exception as e:
-            logger.error(f"Get monitoring error: {e}")
+            logger.error("Get monitoring error: %s", e)
             raise AppError("Unable to fetch monitoring data", 500)
 
     @staticmethod
@@ -485,12 +530,11 @@ Return STRICT JSON only.
             raise AppError("Venue required", 400)
             
         try:
-            ref = db.reference(f"users/{uid}/monitoring_venues/{venue}")
-            ref.delete()
-            logger.info(f"Monitoring venue deleted: {venue} for user {uid}")
+            rtdb.delete(f"users/{uid}/monitoring_venues/{venue}")
+            logger.info("Monitoring venue deleted: %s for user %s", venue, uid)
             return {"message": "Monitoring venue deleted"}
         except Exception as e:
-            logger.error(f"Delete monitoring venue error: {e}")
+            logger.error("Delete monitoring venue error: %s", e)
             raise AppError("Unable to delete monitoring venue", 500)
 
     @staticmethod
@@ -499,12 +543,13 @@ Return STRICT JSON only.
             raise AppError("venue, device and valid status required", 400)
             
         try:
-            ref = db.reference(f"users/{uid}/schedules/{venue}/{device}")
-            ref.update({"status": status})
-            logger.info(f"Schedule status updated: {venue}/{device} -> {status}")
+            previous = rtdb.get(f"users/{uid}/schedules/{venue}/{device}")
+            rtdb.update(f"users/{uid}/schedules/{venue}/{device}", {"status": status})
+            fleet_stats.bump({"activeSchedules": (status == "enable") - fleet_stats.is_active(previous)})
+            logger.info("Schedule status updated: %s/%s -> %s", venue, device, status)
             return {"venue": venue, "device": device, "status": status}
         except Exception as e:
-            logger.error(f"Update schedule status error: {e}")
+            logger.error("Update schedule status error: %s", e)
             raise AppError("Unable to update schedule status", 500)
     @staticmethod
     def save_fcm_token(uid, token):
@@ -512,10 +557,9 @@ Return STRICT JSON only.
         raise AppError("FCM token required", 400)
 
       try:
-        ref = db.reference(f"users/{uid}")
-        ref.update({"fcmToken": token})
-        logger.info(f"FCM token saved for user {uid}")
+        rtdb.update(f"users/{uid}", {"fcmToken": token})
+        logger.info("FCM token saved for user %s", uid)
         return {"message": "FCM token stored"}
       except Exception as e:
-        logger.error(f"Save FCM token error: {e}")
+        logger.error("Save FCM token error: %s", e)
         raise AppError("Unable to save FCM token", 500)
@@ -0,0 +1,160 @@
+import os
+import threading
+from ..utils.metrics import metrics
+
+# Minimum seconds between two fault digests to the same user
+DIGEST_COOLDOWN = int(os.getenv("FAULT_DIGEST_COOLDOWN", "3600"))
+
+# Device key used when a venue's ``faults`` is a plain string rather than {device: message}
+VENUE_FAULT = "_venue"
+
+
+def venue_faults(venues):
+    """``{(venue, device): message}`` for every fault in a user's venues."""
+    found = {}
+    for vname, vdata in (venues or {}).items():
+        if not isinstance(vdata, dict):
+            continue
+        faults = vdata.get("faults")
+        if isinstance(faults, dict):
+            for device, message in faults.items():
+                if message:
+                    found[(vname, device)] = str(message)
+        elif faults:
+            found[(vname, VENUE_FAULT)] = str(faults)
+    return found
+
+
+def _from_tree(tree):
+    return {(v, d): m for v, devices in (tree or {}).items() if isinstance(devices, dict)
+            for d, m in devices.items()}
+
+
+def _to_tree(faults):
+    tree = {}
+    for (venue, device), message in faults.items():
+        tree.setdefault(venue, {})[device] = message
+    return tree
+
+
+def _describe(venue, device, message):
+    return f"{venue}: {message}" if device == VENUE_FAULT else f"{venue}/{device}: {message}"
+
+
+class FaultAggregator:
+    """Tracks fault state per user/venue/device across scheduler ticks.
+
+    observe() diffs each user's faults against what was already notified;
+    digests() then yields at most one notification per user per cooldown,
+    listing every new fault and merging in clearances. A fault that clears
+    before its digest goes out is never sent. Notified faults and the last
+    digest time are persisted on the user (``notifiedFaults``,
+    ``lastFaultNotification``) so a restart does not re-announce them.
+    """
+
+    def __init__(self, cooldown=DIGEST_COOLDOWN):
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._notified = {}  # uid -> {(venue, device): message} already sent
+        self._last_sent = {}  # uid -> ts
+        self._new = {}  # uid -> {(venue, device): message} waiting for a digest
+        self._cleared = {}  # uid -> {(venue, device): message} cleared since the last digest
+        self._dirty = set()  # uids whose notifiedFaults changed without a digest
+
+    def observe(self, uid, user_data):
+        """Record the user's current faults and return how many there are; cheap when nothing changed."""
+        current = venue_faults(user_data.get("venues"))
+        with self._lock:
+            notified = self._notified.get(uid)
+            if notified is None:
+                # Users who never had a fault keep no state
+                if not current and not user_data.get("notifiedFaults"):
+                    return 0
+                notified = self._notified[uid] = _from_tree(user_data.get("notifiedFaults"))
+                self._last_sent[uid] = user_data.get("lastFaultNotification") or 0
+            pending = self._new.get(uid, {})
+            if not current and not notified and not pending:
+                return 0
+
+            for key, message in current.items():
+                if notified.get(key) != message and pending.get(key) != message:
+                    self._new.setdefault(uid, {})[key] = message
+                    metrics.inc("fault_events_total", {"kind": "raised"})
+
+            for key in [k for k in pending if k not in current]:
+                # Raised and cleared between digests: nothing to tell the user
+                del self._new[uid][key]
+                metrics.inc("fault_events_total", {"kind": "suppressed"})
+            for key in [k for k in notified if k not in current]:
+                self._cleared.setdefault(uid, {})[key] = notified.pop(key)
+                self._dirty.add(uid)
+                metrics.inc("fault_events_total", {"kind": "cleared"})
+            if uid in self._new and not self._new[uid]:
+                del self._new[uid]
+        return len(current)
+
+    def forget(self, uids):
+        """Drop state for users no longer in the tree."""
+        with self._lock:
+            for uid in uids:
+                for state in (self._notified, self._last_sent, self._new, self._cleared):
+                    state.pop(uid, None)
+                self._dirty.discard(uid)
+
+    def known_users(self):
+        with self._lock:
+            return set(self._notified)
+
+    def digests(self, now):
+        """Yield ``(uid, title, body, updates)`` for users whose digest is due.
+
+        ``updates`` is the RTDB update for ``users/{uid}``; users whose only
+        change is a clearance get an update with no notification (title None).
+        """
+        with self._lock:
+            due = []
+            for uid, new in list(self._new.items()):
+                if now - self._last_sent.get(uid, 0) < self.cooldown:
+                    continue
+                cleared = self._cleared.pop(uid, {})
+                del self._new[uid]
+                self._notified[uid].update(new)
+                self._last_sent[uid] = now
+                self._dirty.discard(uid)
+                due.append((uid, new, cleared))
+            quiet = [uid for uid in self._dirty]
+            self._dirty.clear()
+            notified = {uid: _to_tree(self._notified.get(uid, {})) or None for uid in quiet + [d[0] for d in due]}
+
+        for uid, new, cleared in due:
+            lines = [_describe(v, d, m) for (v, d), m in sorted(new.items())]
+            if len(lines) == 1:
+                title, body = "Fault Detected ⚠️", lines[0]
+            else:
+                title, body = f"{len(lines)} Faults Detected ⚠️", "; ".join(lines)
+            if cleared:
+                body += " | Cleared: " + ", ".join(
+                    v if d == VENUE_FAULT else f"{v}/{d}" for v, d in sorted(cleared))
+            metrics.inc("fault_digests_total")
+            yield uid, title, body, {"lastFaultNotification": now, "notifiedFaults": notified[uid]}
+        for uid in quiet:
+            yield uid, None, None, {"notifiedFaults": notified[uid]}
+
+    def reset(self):
+        with self._lock:
+            for state in (self._notified, self._last_sent, self._new, self._cleared):
+                state.clear()
+            self._dirty.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked_users": len(self._notified),
+                "pending_digests": len(self._new),
+                "active_faults": sum(len(v) for v in self._notified.values()),
+            }
+
+
+fault_aggregator = FaultAggregator()
+metrics.describe("fault_events_total", "Fault state changes seen by the scheduler (raised, cleared, suppressed).")
+metrics.describe("fault_digests_total", "Fault digest notifications sent.")
@@ -0,0 +1,185 @@
+import os
+import time
+import threading
+from . import rtdb
+from .faults import venue_faults
+from .voice_prompt import device_catalog
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+
+# Fleet-wide counters, kept current by increments from the write paths so the
+# admin dashboard reads one small node instead of scanning ``users``.
+# Writes that only set a device's state (device_state, voice commands, scheduled
+# actions) are not counted: they can create a device that was never added, and
+# that drift is left for reconcile() to correct rather than adding a read to
+# the hottest paths.
+STATS_PATH = "stats/fleet"
+COUNTERS = ("users", "venues", "devices", "activeSchedules", "faults")
+
+# Seconds between background recounts of the whole tree (0 disables)
+RECONCILE_INTERVAL = int(os.getenv("FLEET_STATS_RECONCILE_INTERVAL", "3600"))
+
+_reconcile_lock = threading.Lock()
+_last_faults = None
+
+
+def tier(access_key):
+    """License tier from an access token (``PRO-001-INX`` -> ``PRO``)."""
+    prefix = str(access_key or "").split("-", 1)[0].strip()
+    return prefix if prefix and not any(c in prefix for c in ".#$[]/") else "other"
+
+
+def increment(n):
+    """RTDB server-side increment, applied atomically however many workers write.
+
+    RTDB rejects the whole update for a non-numeric increment (``true`` included).
+    """
+    if isinstance(n, bool) or not isinstance(n, (int, float)):
+        raise TypeError(f"increment must be a number, not {n!r}")
+    return {".sv": {"increment": n}}
+
+
+def bump(deltas):
+    """Apply ``{counter: delta}`` (``tiers/PRO`` style keys for tiers) in one update.
+
+    Never fails the caller's write: a lost increment is corrected by the next
+    reconcile(). Deltas may be bools (``previous is None``); they are sent as ints.
+    """
+    deltas = {k: int(v) for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    try:
+        rtdb.update(STATS_PATH, {k: increment(v) for k, v in deltas.items()})
+    except Exception as e:
+        logger.warning("Fleet stats update failed %s: %s", deltas, e)
+        metrics.inc("fleet_stats_write_errors_total")
+
+
+def device_count(venue_data):
+    return len(device_catalog({"_": venue_data}).get("_", ()))
+
+
+def is_active(schedule):
+    return isinstance(schedule, dict) and schedule.get("status") == "enable"
+
+
+def user_counts(user_data):
+    """Counter contributions of one ``users/{uid}`` record."""
+    venues = user_data.get("venues") or {}
+    schedules = user_data.get("schedules") or {}
+    return {
+        "users": 1,
+        f"tiers/{tier(user_data.get('accessKey'))}": 1,
+        "venues": len(venues) if isinstance(venues, dict) else 0,
+        "devices": sum(len(d) for d in device_catalog(venues).values()) if isinstance(venues, dict) else 0,
+        "activeSchedules": sum(
+            is_active(s) for devices in schedules.values() if isinstance(devices, dict) for s in devices.values()
+        ) if isinstance(schedules, dict) else 0,
+        "faults": len(venue_faults(venues)) if isinstance(venues, dict) else 0,
+    }
+
+
+def record_faults(total):
+    """Set the fault count seen by a full scheduler pass; written only when it changes.
+
+    The scheduler is the only writer that observes faults (devices report them
+    directly to RTDB), so this counter is set rather than incremented.
+    """
+    global _last_faults
+    if total == _last_faults:
+        return
+    try:
+        rtdb.update(STATS_PATH, {"faults": total})
+        _last_faults = total
+    except Exception as e:
+        logger.warning("Fleet fault count update failed: %s", e)
+        metrics.inc("fleet_stats_write_errors_total")
+
+
+def read():
+    """Current counters; one read of a small node."""
+    data = rtdb.get(STATS_PATH, cached=False) or {}
+    stats = {name: data.get(name, 0) for name in COUNTERS}
+    stats["tiers"] = data.get("tiers") or {}
+    stats["reconciledAt"] = data.get("reconciledAt")
+    return stats
+
+
+def reconcile():
+    """Recount every counter from the users tree (paged) and overwrite the stats node.
+
+    Increments landing while the walk runs may be lost or counted twice; the
+    drift is bounded by writes during one walk and fixed by the next run.
+    """
+    if not _reconcile_lock.acquire(blocking=False):
+        return None
+    try:
+        start = time.perf_counter()
+        totals = {name: 0 for name in COUNTERS}
+        tiers = {}
+        for _, user_data in rtdb.iter_children("users"):
+            if not isinstance(user_data, dict):
+                continue
+            for key, value in user_counts(user_data).items():
+                if key.startswith("tiers/"):
+                    tiers[key[6:]] = tiers.get(key[6:], 0) + value
+                else:
+                    totals[key] += value
+
+        previous = read()
+        for name in COUNTERS:
+            drift = totals[name] - (previous.get(name) or 0)
+            if drift:
+                metrics.inc("fleet_stats_drift_total", {"counter": name}, abs(drift))
+        if any(totals[n] != (previous.get(n) or 0) for n in COUNTERS) or tiers != previous["tiers"]:
+            logger.info("Fleet stats drift corrected: %s -> %s", previous, totals)
+
+        rtdb.set(STATS_PATH, {**totals, "tiers": tiers, "reconciledAt": int(time.time())})
+        global _last_faults
+        _last_faults = totals["faults"]
+        metrics.observe("fleet_stats_reconcile_duration_seconds", time.perf_counter() - start)
+        return {**totals, "tiers": tiers}
+    finally:
+        _reconcile_lock.release()
+
+
+def reconcile_in_background():
+    """Start reconcile() on a daemon thread; False if one is already running."""
+    if _reconcile_lock.locked():
+        return False
+    threading.Thread(target=_safe_reconcile, name="fleet-stats-reconcile", daemon=True).start()
+    return True
+
+
+def _safe_reconcile():
+    try:
+        reconcile()
+    except Exception as e:
+        logger.error("Fleet stats reconcile failed: %s", e)
+
+
+def start_reconciler(interval=RECONCILE_INTERVAL):
+    """Recount every ``interval`` seconds on a daemon thread; the first run is immediate
+    when the stats node is missing or older than ``interval``."""
+    if interval <= 0:
+        return None
+
+    def loop():
+        try:
+            last = read()["reconciledAt"] or 0
+        except Exception:
+            last = 0
+        wait = max(0, last + interval - time.time())
+        while True:
+            time.sleep(wait)
+            _safe_reconcile()
+            wait = interval
+
+    thread = threading.Thread(target=loop, name="fleet-stats-reconciler", daemon=True)
+    thread.start()
+    return thread
+
+
+metrics.describe("fleet_stats_write_errors_total", "Fleet counter updates that failed (fixed by the next reconcile).")
+metrics.describe("fleet_stats_drift_total", "Absolute counter drift corrected by reconciliation.")
+metrics.describe("fleet_stats_reconcile_duration_seconds", "Time to recount fleet stats from the users tree.")
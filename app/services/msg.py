@@ -1,9 +1,15 @@
 import firebase_admin
-from firebase_admin import db, messaging
+from firebase_admin import messaging
+from . import rtdb
 from ..utils.logger import logger
+from ..utils import deadline
 
 def send_notification(uid, title, body):
-    token = db.reference(f"users/{uid}/fcmToken").get()
+    # Best effort: inside a request whose budget is spent, skip rather than fail it
+    if deadline.skip("fcm_send"):
+        logger.warning("Skipping notification to %s: request deadline exceeded", uid)
+        return
+    token = rtdb.get(f"users/{uid}/fcmToken")
     if not token:
         logger.error("No token found for user")
         return
@@ -15,6 +21,6 @@ def send_notification(uid, title, body):
 
     try:
         response = messaging.send(message)
-        logger.info(f"Notification sent: {response}")
+        logger.info("Notification sent: %s", response)
     except Exception as e:
-        logger.error(f"Error sending FCM message: {e}")
+        logger.error("Error sending FCM message: %s", e)
@@ -0,0 +1,173 @@
+import os
+import base64
+import hashlib
+import secrets
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from firebase_admin import auth
+from . import rtdb, fleet_stats
+from .auth_service import AuthService
+from ..utils.logger import logger
+from ..utils.metrics import metrics, stage
+
+# auth.import_users accepts at most 1000 accounts per call, auth.get_users 100 identifiers
+IMPORT_BATCH = 1000
+LOOKUP_BATCH = 100
+MAX_ROWS = int(os.getenv("BULK_PROVISION_MAX_ROWS", "10000"))
+
+# Firebase re-hashes imported passwords with its own scrypt on first sign-in
+HASH_ROUNDS = int(os.getenv("BULK_HASH_ROUNDS", "10000"))
+
+_hash_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pbkdf2")
+
+
+def _hash_password(password):
+    salt = secrets.token_bytes(16)
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, HASH_ROUNDS), salt
+
+
+def _new_uid():
+    return secrets.token_hex(14)
+
+
+def _validate(row, valid_keys, seen):
+    if not isinstance(row, dict):
+        return None, "Row must be an object"
+    email = row.get("email")
+    password = row.get("password")
+    token = row.get("accessToken")
+    if not isinstance(email, str) or "@" not in email:
+        return email, "Invalid email"
+    email = email.strip().lower()
+    if email in seen:
+        return email, "Duplicate email in request"
+    if not isinstance(password, str) or len(password) < 6:
+        return email, "Password must be at least 6 characters"
+    if not isinstance(token, str) or token not in valid_keys:
+        return email, "Invalid Access Token"
+    try:
+        # Firebase's own email/display name rules, so a bad row can't fail its whole batch later
+        auth.EmailIdentifier(email)
+        auth.ImportUserRecord(uid="validate", email=email, display_name=row.get("name") or None)
+    except ValueError as e:
+        return email, str(e)
+    seen.add(email)
+    return email, None
+
+
+def _existing_emails(emails):
+    existing = set()
+    for i in range(0, len(emails), LOOKUP_BATCH):
+        identifiers = [auth.EmailIdentifier(e) for e in emails[i:i + LOOKUP_BATCH]]
+        existing.update(user.email.lower() for user in auth.get_users(identifiers).users if user.email)
+    return existing
+
+
+def _provision_batch(batch):
+    """Import one batch of validated ``(row_no, email, row)``; yields per-row results."""
+    with stage("bulk_lookup"):
+        existing = _existing_emails([email for _, email, _ in batch])
+    accepted = []
+    for row_no, email, row in batch:
+        if email in existing:
+            yield {"row": row_no, "email": email, "status": "error", "error": "Email already exists"}
+        else:
+            accepted.append((row_no, email, row, _new_uid()))
+    if not accepted:
+        return
+
+    with stage("bulk_hash"):
+        hashes = list(_hash_pool.map(_hash_password, [row["password"] for _, _, row, _ in accepted]))
+    records, importable = [], []
+    for (row_no, email, row, uid), (pw_hash, salt) in zip(accepted, hashes):
+        try:
+            records.append(auth.ImportUserRecord(uid=uid, email=email, display_name=row.get("name") or None,
+                                                 password_hash=pw_hash, password_salt=salt))
+        except ValueError as e:
+            yield {"row": row_no, "email": email, "status": "error", "error": str(e)}
+            continue
+        importable.append((row_no, email, row, uid))
+    accepted = importable
+    if not accepted:
+        return
+    try:
+        with stage("bulk_import"):
+            result = auth.import_users(records, hash_alg=auth.UserImportHash.pbkdf2_sha256(rounds=HASH_ROUNDS))
+        failed = {e.index: e.reason for e in result.errors}
+    except Exception as e:
+        logger.error("Bulk import failed: %s", e)
+        failed = {i: str(e) for i in range(len(accepted))}
+
+    created = []
+    for i, (row_no, email, row, uid) in enumerate(accepted):
+        if i in failed:
+            yield {"row": row_no, "email": email, "status": "error", "error": failed[i]}
+        else:
+            created.append((row_no, email, row, uid))
+    if not created:
+        return
+
+    # Same record signup writes, for every created account in one multi-path update
+    records = {
+        f"users/{uid}": {
+            "email": email,
+            "name": row.get("name", ""),
+            "verifiedAccess": True,
+            "accessKey": row["accessToken"],
+            "venues": {},
+        }
+        for _, email, row, uid in created
+    }
+    # Fleet counters ride along in the same update, so they move only if the records land
+    tiers = Counter(fleet_stats.tier(row["accessToken"]) for _, _, row, _ in created)
+    records[f"{fleet_stats.STATS_PATH}/users"] = fleet_stats.increment(len(created))
+    for name, count in tiers.items():
+        records[f"{fleet_stats.STATS_PATH}/tiers/{name}"] = fleet_stats.increment(count)
+    try:
+        rtdb.update("/", records)
+    except Exception as e:
+        logger.error("Bulk profile write failed, removing %s imported accounts: %s", len(created), e)
+        try:
+            auth.delete_users([uid for _, _, _, uid in created])
+        except Exception as cleanup_error:
+            logger.error("Bulk import cleanup failed: %s", cleanup_error)
+        for row_no, email, _, _ in created:
+            yield {"row": row_no, "email": email, "status": "error", "error": "Failed to write user profile"}
+        return
+
+    for row_no, email, _, uid in created:
+        yield {"row": row_no, "email": email, "status": "created", "uid": uid}
+
+
+def bulk_provision(rows):
+    """Create accounts for ``rows`` ({email, password, name, accessToken}).
+
+    Yields one result per row as each batch completes, then ``{"summary": ...}``.
+    """
+    valid_keys = AuthService.valid_key_set()
+    seen = set()
+    counts = {"created": 0, "error": 0}
+    batch = []
+
+    def flush(batch):
+        for result in _provision_batch(batch):
+            counts[result["status"]] += 1
+            yield result
+
+    for row_no, row in enumerate(rows):
+        email, error = _validate(row, valid_keys, seen)
+        if error:
+            counts["error"] += 1
+            yield {"row": row_no, "email": email, "status": "error", "error": error}
+            continue
+        batch.append((row_no, email, row))
+        if len(batch) == IMPORT_BATCH:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+    for status, count in counts.items():
+        metrics.inc("bulk_provision_rows_total", {"status": status}, count)
+    logger.info("Bulk provisioning finished: %s", counts)
+    yield {"summary": {"rows": counts["created"] + counts["error"], **counts}}
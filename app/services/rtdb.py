@@ -0,0 +1,121 @@
+import os
+import time
+from firebase_admin import db
+from ..utils.cache import rtdb_cache
+from ..utils.singleflight import rtdb_reads
+from ..utils.metrics import metrics, stage
+from ..utils import rtdb_trace, deadline
+
+# Thin wrappers around db.reference(...) so every read can go through the
+# subtree cache and every write invalidates what it touched.
+# Concurrent misses for the same path share one in-flight RTDB read; the cache
+# version is part of the key so a read never joins one that predates a write.
+# Values returned from get() may be shared with the cache: treat them as read-only.
+# Within a request, no RTDB round trip is started once its deadline budget is spent
+# (the SDK takes no per-call timeout; cache hits are still served).
+
+# Children per page when walking a large node (iter_children)
+PAGE_SIZE = int(os.getenv("RTDB_PAGE_SIZE", "500"))
+# Largest page a caller may ask for
+MAX_PAGE_SIZE = 1000
+
+
+def get(path, cached=True):
+    start = time.perf_counter()
+    if cached:
+        value = rtdb_cache.get(path)
+        if value is not rtdb_cache.MISSING:
+            if rtdb_trace.active():
+                rtdb_trace.record("get", path, value, time.perf_counter() - start, cached=True)
+            return value
+    deadline.check("rtdb_read")
+    version = rtdb_cache.version
+    with stage("rtdb_read"):
+        value = rtdb_reads.do((path, version), lambda: db.reference(path).get())
+    if cached:
+        rtdb_cache.put(path, value, version)
+    if rtdb_trace.active():
+        rtdb_trace.record("get", path, value, time.perf_counter() - start)
+    return value
+
+
+def iter_children(path, page_size=None):
+    """Yield ``(key, value)`` for each child of ``path`` in key order, one page per read.
+
+    Only one page is held at a time, so memory stays bounded by ``page_size``
+    children however large the node is. Bypasses the cache.
+    """
+    page_size = page_size or PAGE_SIZE
+    last = None
+    while True:
+        query = db.reference(path).order_by_key()
+        if last is not None:
+            # start_at is inclusive: fetch one extra and skip the key we already yielded
+            query = query.start_at(last)
+        deadline.check("rtdb_read")
+        start = time.perf_counter()
+        with stage("rtdb_read"):
+            page = query.limit_to_first(page_size + (last is not None)).get() or {}
+        if rtdb_trace.active():
+            rtdb_trace.record("query", path, page, time.perf_counter() - start)
+        items = [(k, v) for k, v in page.items() if k != last]
+        for key, value in items:
+            yield key, value
+        if len(page) < page_size + (last is not None) or not items:
+            return
+        last = items[-1][0]
+
+
+def _write(op, path, value, call):
+    deadline.check("rtdb_write")
+    start = time.perf_counter()
+    with stage("rtdb_write"):
+        call()
+    if rtdb_trace.active():
+        rtdb_trace.record(op, path, value, time.perf_counter() - start)
+
+
+def update(path, value):
+    base = path.rstrip("/")
+    try:
+        _write("update", path, value, lambda: db.reference(path).update(value))
+    finally:
+        for key in value:
+            rtdb_cache.invalidate(f"{base}/{key}" if base else key)
+
+
+def set(path, value):
+    try:
+        _write("set", path, value, lambda: db.reference(path).set(value))
+    finally:
+        rtdb_cache.invalidate(path)
+
+
+def delete(path):
+    try:
+        _write("delete", path, None, lambda: db.reference(path).delete())
+    finally:
+        rtdb_cache.invalidate(path)
+
+
+def cache_stats():
+    return rtdb_cache.stats()
+
+
+def singleflight_stats():
+    return rtdb_reads.stats()
+
+
+def _collect():
+    cache = rtdb_cache.stats()
+    flights = rtdb_reads.stats()
+    return {
+        "rtdb_cache_hits": cache["hits"],
+        "rtdb_cache_misses": cache["misses"],
+        "rtdb_cache_entries": cache["entries"],
+        "rtdb_cache_bytes": cache["approx_bytes"],
+        "rtdb_reads_collapsed": flights["collapsed"],
+    }
+
+
+metrics.register_collector(_collect)
@@ -0,0 +1,103 @@
+import os
+import re
+import json
+
+# Above this many devices only the venues/devices the utterance mentions are sent
+MAX_CATALOG_DEVICES = int(os.getenv("VOICE_CATALOG_MAX_DEVICES", "60"))
+
+# Venue children that are not devices
+_NON_DEVICES = ("__created", "faults")
+
+_WORD = re.compile(r"[^\W_]+", re.UNICODE)
+
+PROMPT = """Devices by venue (venue: device, device, ...):
+{catalog}
+
+Convert this command into JSON:
+{{"venue":"...", "device":"...", "value":"..."}}
+
+Rules:
+- Only use existing venue and device names, spelled exactly as listed
+- Value must be "on", "off", or 1-5
+- Support Tamil/English natural language
+- Support ALL venue and ALL device handling
+- If unknown, return null JSON
+User command: "{text}"
+Return STRICT JSON only."""
+
+
+def device_catalog(venues):
+    """``{venue: [device, ...]}`` from ``users/{uid}/venues``."""
+    return {
+        v: [d for d in devices if d not in _NON_DEVICES]
+        for v, devices in (venues or {}).items()
+        if isinstance(devices, dict)
+    }
+
+
+def _words(text):
+    return set(_WORD.findall(str(text).lower()))
+
+
+def _mentions(name, words, text):
+    # "Living Room" matches by word; "livingroom1" by substring of the utterance
+    name = str(name).lower()
+    parts = _words(name)
+    return (parts and parts <= words) or (len(name) > 2 and name in text)
+
+
+def select_relevant(catalog, text, limit=MAX_CATALOG_DEVICES):
+    """Trim ``catalog`` to what the utterance refers to once it exceeds ``limit`` devices.
+
+    A mentioned venue keeps all its devices; a mentioned device is kept in
+    every venue that has it. Falls back to the full catalog when nothing
+    matches (e.g. a non-English utterance), so selection never hides the
+    only candidates from the model.
+    """
+    if sum(len(d) for d in catalog.values()) <= limit:
+        return catalog, False
+    lowered = str(text).lower()
+    words = _words(lowered)
+    selected = {}
+    for venue, devices in catalog.items():
+        if _mentions(venue, words, lowered):
+            selected[venue] = devices
+            continue
+        matched = [d for d in devices if _mentions(d, words, lowered)]
+        if matched:
+            selected[venue] = matched
+    if not selected:
+        return catalog, False
+    return selected, True
+
+
+def in_catalog(catalog, venue, device):
+    """Whether the model's answer names something that exists.
+
+    "ALL" (any case) as venue or device is let through, as the prompt allows.
+    """
+    all_venues = str(venue).lower() == "all"
+    all_devices = str(device).lower() == "all"
+    if all_venues:
+        return all_devices or any(device in devices for devices in catalog.values())
+    if venue not in catalog:
+        return False
+    return all_devices or device in catalog[venue]
+
+
+def _name(name):
+    # Quote only names that would break the "venue: a, b" line format
+    name = str(name)
+    return json.dumps(name, ensure_ascii=False) if any(c in name for c in ',:"\n') or name != name.strip() else name
+
+
+def encode_catalog(catalog):
+    """One line per venue: ``Hall: fan, light``. Venue names are not repeated per device."""
+    return "\n".join(
+        f"{_name(venue)}: {', '.join(_name(d) for d in devices) or '(no devices)'}"
+        for venue, devices in catalog.items()
+    )
+
+
+def build_prompt(catalog, text):
+    return PROMPT.format(catalog=encode_catalog(catalog), text=text)
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict, deque
+from .logger import logger
+
+
+def _normalize(path):
+    return "/".join(p for p in str(path).split("/") if p)
+
+
+def _bucket(path):
+    """Index entries by their first two segments (e.g. ``users/<uid>``)."""
+    return "/".join(path.split("/")[:2])
+
+
+def _overlaps(a, b):
+    """True when one path is the other or an ancestor of it."""
+    if not a or not b or a == b:
+        return True
+    return a.startswith(b + "/") or b.startswith(a + "/")
+
+
+class SubtreeCache:
+    """Bounded LRU cache of RTDB subtrees keyed by path.
+
+    A cached node also answers reads for any of its descendants. Writes
+    invalidate by path prefix (the path, its ancestors and descendants) and
+    bump a version counter so a read that raced with a write is never stored.
+    Invalidations can be mirrored to other workers through an append-only file.
+    """
+
+    MISSING = object()
+    _CHANNEL_COMPACT_BYTES = 1_000_000
+
+    def __init__(self, max_entries=1024, ttl=5.0, channel_file=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.channel_file = channel_file
+        self._entries = OrderedDict()  # path -> (value, expires_at, size)
+        self._buckets = {}  # _bucket(path) -> set of cached paths
+        self._lock = threading.RLock()
+        self._version = 0
+        self._recent = deque(maxlen=256)  # (version, prefix)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._channel_offset = 0
+        if channel_file:
+            try:
+                self._channel_offset = os.path.getsize(channel_file)
+            except OSError:
+                self._channel_offset = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self, path):
+        """Return the cached value for ``path`` or ``SubtreeCache.MISSING``."""
+        if not self.enabled:
+            return self.MISSING
+        path = _normalize(path)
+        self._poll_channel()
+        now = time.monotonic()
+        with self._lock:
+            parts = path.split("/") if path else []
+            for depth in range(len(parts), -1, -1):
+                key = "/".join(parts[:depth])
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at, _ = entry
+                if expires_at <= now:
+                    self._drop(key)
+                    continue
+                self._entries.move_to_end(key)
+                for part in parts[depth:]:
+                    value = value.get(part) if isinstance(value, dict) else None
+                    if value is None:
+                        break
+                self._hits += 1
+                return value
+            self._misses += 1
+            return self.MISSING
+
+    def put(self, path, value, version):
+        """Store ``value`` unless ``path`` was invalidated after ``version``."""
+        if not self.enabled:
+            return
+        path = _normalize(path)
+        try:
+            size = len(json.dumps(value, separators=(",", ":")))
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            if version != self._version:
+                if not self._recent or self._recent[0][0] > version + 1:
+                    return
+                if any(v > version and _overlaps(path, p) for v, p in self._recent):
+                    return
+            self._drop(path)
+            self._entries[path] = (value, time.monotonic() + self.ttl, size)
+            self._buckets.setdefault(_bucket(path), set()).add(path)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._evictions += 1
+
+    def invalidate(self, path, broadcast=True):
+        """Drop every entry overlapping ``path`` and optionally tell other workers."""
+        path = _normalize(path)
+        with self._lock:
+            self._invalidate_local(path)
+        if broadcast and self.channel_file:
+            self._publish(path)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._recent.append((self._version, ""))
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "approx_bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+            bucket = self._buckets.get(_bucket(key))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[_bucket(key)]
+
+    def _invalidate_local(self, path):
+        self._version += 1
+        self._recent.append((self._version, path))
+        self._invalidations += 1
+        parts = path.split("/") if path else []
+        if len(parts) < 2:
+            candidates = list(self._entries)
+        else:
+            # Only entries under the same users/<uid> bucket, plus shallow ancestors, can overlap
+            candidates = list(self._buckets.get(_bucket(path), ())) + ["", parts[0]]
+        for key in candidates:
+            if key in self._entries and _overlaps(key, path):
+                self._drop(key)
+
+    def _publish(self, path):
+        try:
+            with open(self.channel_file, "a", encoding="utf-8") as f:
+                f.write(path + "\n")
+                if f.tell() > self._CHANNEL_COMPACT_BYTES:
+                    f.truncate(0)
+        except OSError as e:
+            logger.error("Cache invalidation publish failed: %s", e)
+
+    def _poll_channel(self):
+        if not self.channel_file:
+            return
+        try:
+            size = os.path.getsize(self.channel_file)
+        except OSError:
+            return
+        if size == self._channel_offset:
+            return
+        with self._lock:
+            if size < self._channel_offset:
+                # Channel was compacted by another worker; we may have missed lines
+                self._entries.clear()
+                self._buckets.clear()
+                self._bytes = 0
+                self._version += 1
+                self._recent.append((self._version, ""))
+                self._channel_offset = 0
+                return
+            try:
+                with open(self.channel_file, "rb") as f:
+                    f.seek(self._channel_offset)
+                    chunk = f.read(size - self._channel_offset)
+            except OSError:
+                return
+            # Only consume complete lines; a partial tail is picked up next time
+            consumed = chunk.rfind(b"\n") + 1
+            self._channel_offset += consumed
+            for line in chunk[:consumed].decode("utf-8", "replace").splitlines():
+                self._invalidate_local(_normalize(line))
+
+
+rtdb_cache = SubtreeCache(
+    max_entries=int(os.getenv("RTDB_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("RTDB_CACHE_TTL", "5")),
+    channel_file=os.getenv("RTDB_CACHE_CHANNEL") or None,
+)
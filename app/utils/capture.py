@@ -0,0 +1,134 @@
+import os
+import time
+import json
+import random
+import hashlib
+import logging
+import queue
+import threading
+from logging.handlers import RotatingFileHandler
+from flask import g, request
+from .logger import DroppingQueueHandler, _start_listener
+from .metrics import current_route, metrics
+from . import rtdb_trace
+
+# TRAFFIC_CAPTURE: unset/0 = off, 1 = every /auth request, 0 < x < 1 = sample that fraction
+_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE", "0") or 0)
+CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR", os.path.join("logs", "capture"))
+MAX_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(50_000_000)))
+BACKUP_COUNT = int(os.getenv("TRAFFIC_CAPTURE_BACKUPS", "5"))
+# uids and names are hashed with this salt; set it so hashes match across hosts and restarts
+SALT = os.getenv("TRAFFIC_CAPTURE_SALT") or os.urandom(16).hex()
+
+# Request fields never written, not even their length
+SECRET_FIELDS = {"password", "accessToken", "apiKey", "token", "refreshToken", "idToken"}
+# Names that are replaced by a stable hash, so replays keep "same venue again" structure
+PSEUDONYM_FIELDS = {"venue", "device", "email", "name", "sensors"}
+# Short enum-like values kept as-is
+KEPT_FIELDS = {"value", "state", "status", "action", "time"}
+MAX_KEPT_LENGTH = 16
+MAX_LIST_ITEMS = 50
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def hash_id(value):
+    return hashlib.sha256(f"{SALT}:{value}".encode("utf-8")).hexdigest()[:16]
+
+
+def sanitize(value, field=None):
+    """Body with secrets dropped, names hashed (``{"$id": h}``) and free text reduced to ``{"$str": length}``."""
+    if isinstance(value, dict):
+        return {k: sanitize(v, k) for k, v in value.items() if k not in SECRET_FIELDS}
+    if isinstance(value, list):
+        return [sanitize(v, field) for v in value[:MAX_LIST_ITEMS]]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    value = str(value)
+    if field in PSEUDONYM_FIELDS:
+        return {"$id": hash_id(value.strip())}
+    if field in KEPT_FIELDS and len(value) <= MAX_KEPT_LENGTH:
+        return value
+    return {"$str": len(value)}
+
+
+def _get_writer():
+    """Per-process rotating file (``capture-<pid>.ndjson``), written by a background thread."""
+    global _writer, _writer_pid
+    if _writer is not None and _writer_pid == os.getpid():
+        return _writer
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            return _writer
+        os.makedirs(CAPTURE_DIR, exist_ok=True)
+        handler = RotatingFileHandler(
+            os.path.join(CAPTURE_DIR, f"capture-{os.getpid()}.ndjson"), maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        writer = logging.getLogger(f"traffic_capture.{os.getpid()}")
+        writer.setLevel(logging.INFO)
+        writer.propagate = False
+        queue_handler = DroppingQueueHandler(queue.Queue(maxsize=10000))
+        writer.addHandler(queue_handler)
+        _start_listener(writer.name, queue_handler, (handler,))
+        _writer, _writer_pid = writer, os.getpid()
+        return _writer
+
+
+def set_sample_rate(rate):
+    global _SAMPLE_RATE
+    _SAMPLE_RATE = rate
+
+
+def _start():
+    if not (_SAMPLE_RATE >= 1 or (_SAMPLE_RATE > 0 and random.random() < _SAMPLE_RATE)):
+        return
+    g._capture_start = (time.time(), time.perf_counter())
+    # Borrow the RTDB tracer for this request unless RTDB_TRACE already sampled it
+    if g.get("_rtdb_trace") is None:
+        g._rtdb_trace = []
+        g._capture_owns_trace = True
+
+
+def _finish(response):
+    started = g.pop("_capture_start", None)
+    if started is None:
+        return response
+    ts, start = started
+    duration = time.perf_counter() - start
+    ops = g.pop("_rtdb_trace", None) if g.pop("_capture_owns_trace", False) else g.get("_rtdb_trace")
+    uid = g.get("uid")
+    entry = {
+        "ts": round(ts, 3),
+        "route": current_route(),
+        "method": request.method,
+        "uid": hash_id(uid) if uid else None,
+        "status": response.status_code,
+        "ms": round(duration * 1000, 3),
+        "req_bytes": request.content_length or 0,
+        "resp_bytes": response.calculate_content_length() or 0,
+        "body": sanitize(request.get_json(silent=True)) if request.content_length else None,
+        "rtdb": [
+            {"op": op["op"], "shape": rtdb_trace.path_shape(op["path"]), "bytes": op["bytes"],
+             "ms": op["ms"], "cached": op["cached"]}
+            for op in ops or ()
+        ],
+    }
+    try:
+        _get_writer().info(json.dumps(entry, separators=(",", ":")))
+        metrics.inc("traffic_captured_total")
+    except Exception:
+        metrics.inc("traffic_capture_errors_total")
+    return response
+
+
+def init_capture(blueprint):
+    """Record sampled requests of ``blueprint`` to the capture files (opt-in via TRAFFIC_CAPTURE)."""
+    blueprint.before_request(_start)
+    blueprint.after_request(_finish)
+
+
+metrics.describe("traffic_captured_total", "Requests written to the traffic capture file.")
+metrics.describe("traffic_capture_errors_total", "Requests that could not be captured.")
@@ -0,0 +1,111 @@
+import os
+import time
+from contextvars import ContextVar
+from flask import request
+from .logger import logger
+from .error_handler import DeadlineExceeded
+from .metrics import current_route, metrics
+
+# Seconds a request may spend end to end, per route; "*" covers every other /auth route.
+# Kept under typical client timeouts so the client sees a 504 rather than giving up itself.
+DEFAULT_BUDGETS = {
+    "*": 10.0,
+    "/auth/voice_command": 20.0,
+}
+
+# Upstream calls are not started with less than this left
+MIN_CALL_BUDGET = 0.05
+
+# Absolute time.monotonic() deadline of the current request; None outside requests
+_deadline = ContextVar("request_deadline", default=None)
+
+
+def _parse_budgets(spec):
+    """``"/auth/voice_command=20;*=8"`` -> ``{route: seconds}``."""
+    budgets = {}
+    for item in (spec or "").split(";"):
+        if "=" in item:
+            route, seconds = item.rsplit("=", 1)
+            try:
+                budgets[route.strip()] = float(seconds)
+            except ValueError:
+                logger.warning("Ignoring malformed deadline %r", item)
+    return budgets
+
+
+def budget_for(route):
+    return BUDGETS.get(route, BUDGETS.get("*"))
+
+
+def start(route):
+    """Start the deadline clock for ``route``; a budget of 0 (or none) disables it."""
+    budget = budget_for(route)
+    _deadline.set(time.monotonic() + budget if budget else None)
+
+
+def clear():
+    _deadline.set(None)
+
+
+def remaining():
+    """Seconds left for the current request, or None when it has no deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def exhausted():
+    left = remaining()
+    return left is not None and left <= MIN_CALL_BUDGET
+
+
+def exceeded(call):
+    """Count the request as out of budget at ``call`` and return the 504 to raise."""
+    metrics.inc("deadline_exceeded_total", {"route": current_route(), "call": call})
+    return DeadlineExceeded(call)
+
+
+def check(call):
+    """Raise DeadlineExceeded (504) instead of starting ``call`` with the budget spent."""
+    if exhausted():
+        raise exceeded(call)
+
+
+def skip(call):
+    """True (and counted) when best-effort ``call`` should be skipped for lack of budget."""
+    if not exhausted():
+        return False
+    metrics.inc("deadline_calls_skipped_total", {"call": call})
+    return True
+
+
+def timeout(call, default):
+    """``default`` shrunk to the time left, for calls that take a timeout."""
+    check(call)
+    left = remaining()
+    return default if left is None else min(default, left)
+
+
+def allows_retry(call, delay):
+    """Whether a retry of ``call`` after sleeping ``delay`` still has budget to run."""
+    left = remaining()
+    if left is None or left - delay > MIN_CALL_BUDGET:
+        return True
+    metrics.inc("deadline_calls_skipped_total", {"call": call})
+    return False
+
+
+def init_deadlines(app):
+    @app.before_request
+    def _start():
+        if request.blueprint == "auth":
+            start(current_route())
+
+    @app.teardown_request
+    def _clear(exc):
+        clear()
+
+
+BUDGETS = {**DEFAULT_BUDGETS, **_parse_budgets(os.getenv("REQUEST_DEADLINES"))}
+
+metrics.describe("deadline_exceeded_total", "Requests whose deadline budget ran out, by route and the upstream call skipped.")
+metrics.describe("deadline_calls_skipped_total", "Upstream retries and best-effort calls not attempted because the request budget was spent.")
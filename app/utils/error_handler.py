@@ -9,11 +9,28 @@ class AppError(Exception):
         self.status_code = status_code
         self.payload = payload
 
+class DeadlineExceeded(AppError):
+    """The request's deadline budget ran out before an upstream call (``call``) could be made"""
+    def __init__(self, call=None):
+        super().__init__("Request deadline exceeded", 504)
+        self.call = call
+
+def deadline_cause(error):
+    """The DeadlineExceeded behind ``error``, when a service re-raised it as a generic AppError."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, DeadlineExceeded):
+            return error
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return None
+
 def register_error_handlers(app):
     
     @app.errorhandler(AppError)
     def handle_app_error(error):
-        logger.error(f"AppError: {error.message}")
+        error = deadline_cause(error) or error
+        logger.error("AppError: %s", error.message)
         # Return error in a format that might be compatible with both or just standard
         # For global errors, we'll stick to the requested standard but include 'error' key for compat
         response = {
@@ -31,10 +48,12 @@ def register_error_handlers(app):
 
     @app.errorhandler(500)
     def internal_server_error(error):
-        logger.critical(f"Internal Server Error: {error}")
+        logger.critical("Internal Server Error: %s", error)
         return jsonify({"status": "error", "message": "Internal Server Error", "error": "Internal Server Error"}), 500
 
     @app.errorhandler(Exception)
     def handle_generic_exception(error):
-        logger.exception(f"Unhandled Exception: {error}")
+        if deadline_cause(error):
+            return handle_app_error(error)
+        logger.exception("Unhandled Exception: %s", error)
         return jsonify({"status": "error", "message": "An unexpected error occurred", "error": str(error)}), 500
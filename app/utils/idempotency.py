@@ -0,0 +1,214 @@
+import os
+import time
+import json
+import hashlib
+import sqlite3
+import tempfile
+from functools import wraps
+from flask import request, jsonify, make_response
+from .logger import logger
+from .metrics import current_route, metrics
+from .sqlite_store import SQLiteStore
+from . import deadline
+
+# Replay window for stored responses
+TTL = int(os.getenv("IDEMPOTENCY_TTL", "3600"))
+# Stored responses kept per host; oldest are evicted first
+MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+# How long a duplicate waits for the in-flight original before giving up with 409
+WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT", "30"))
+# An in-flight claim whose worker died is taken over after this many seconds
+LEASE = 60.0
+POLL_INTERVAL = 0.05
+MAX_KEY_LENGTH = 255
+
+HEADER = "Idempotency-Key"
+
+# begin() outcomes
+EXECUTE, REPLAY, WAIT, MISMATCH = "execute", "replay", "wait", "mismatch"
+
+
+def fingerprint(body):
+    """Hash of the request body, ignoring JSON key order and whitespace."""
+    try:
+        body = json.dumps(json.loads(body or b"null"), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(body or b"").hexdigest()
+
+
+class IdempotencyStore(SQLiteStore):
+    """First responses per Idempotency-Key, shared by all workers on the host."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, fingerprint TEXT, done INTEGER, "
+        "status INTEGER, mimetype TEXT, body BLOB, expires REAL)",
+        "CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)",
+    )
+
+    def __init__(self, path, ttl=TTL, max_entries=MAX_ENTRIES):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._claims = 0
+
+    def begin(self, key, fp):
+        """Claim ``key`` or report its state.
+
+        Returns ``(EXECUTE, None)`` for the first request, ``(REPLAY, (status,
+        mimetype, body))`` once the original finished, ``(WAIT, None)`` while it
+        is in flight and ``(MISMATCH, None)`` when the key was used for a
+        different body. A WAIT caller polls begin() again.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, done, status, mimetype, body, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[5] < now:
+                row = None
+            if row is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, fingerprint, done, expires) VALUES (?, ?, 0, ?)",
+                    (key, fp, now + LEASE),
+                )
+                self._claims += 1
+                if self._claims % 100 == 0:
+                    self._prune(conn, now)
+                return EXECUTE, None
+        if row[0] != fp:
+            return MISMATCH, None
+        if not row[1]:
+            return WAIT, None
+        return REPLAY, (row[2], row[3], row[4])
+
+    def complete(self, key, status, mimetype, body):
+        self._conn().execute(
+            "UPDATE responses SET done = 1, status = ?, mimetype = ?, body = ?, expires = ? WHERE key = ?",
+            (status, mimetype, body, time.time() + self.ttl, key),
+        )
+
+    def release(self, key):
+        """Drop an in-flight claim so the next retry executes again."""
+        self._conn().execute("DELETE FROM responses WHERE key = ? AND done = 0", (key,))
+
+    def _prune(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses WHERE done = 1 ORDER BY expires LIMIT ?)", (excess,)
+            )
+
+    def stats(self):
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(done = 0), 0), COALESCE(SUM(LENGTH(body)), 0) FROM responses"
+        ).fetchone()
+        return {"entries": row[0], "in_flight": row[1], "bytes": row[2],
+                "max_entries": self.max_entries, "ttl": self.ttl}
+
+    def clear(self):
+        self._conn().execute("DELETE FROM responses")
+
+
+def scoped_key(uid, route, key):
+    """Keys are per user and route, so one client can't replay another's response."""
+    return f"{uid}:{route}:{key}"
+
+
+def should_store(status):
+    # 5xx (and rate-limit) responses are transient; let the retry run again
+    return status < 500 and status != 429
+
+
+def wait_until():
+    """When a duplicate stops waiting for the original, and whether the request deadline set it.
+
+    A duplicate never waits past its own deadline budget; running out there is a 504.
+    """
+    left = deadline.remaining()
+    if left is not None and left < WAIT_TIMEOUT:
+        return time.monotonic() + left, True
+    return time.monotonic() + WAIT_TIMEOUT, False
+
+
+def record(route, result):
+    metrics.inc("idempotency_requests_total", {"route": route, "result": result})
+
+
+def idempotent(f):
+    """Replay the first response for a repeated ``Idempotency-Key``; goes under ``@require_auth``.
+
+    Requests without the header run normally. Store errors fail open.
+    """
+
+    @wraps(f)
+    def decorated_function(uid, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(uid, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        route = current_route()
+        key = scoped_key(uid, route, key)
+        fp = fingerprint(request.get_data())
+        wait_end, by_deadline = wait_until()
+        waited = False
+        try:
+            while True:
+                state, stored = idempotency_store.begin(key, fp)
+                if state != WAIT:
+                    break
+                if time.monotonic() >= wait_end:
+                    record(route, "timeout")
+                    if by_deadline:
+                        raise deadline.exceeded("idempotency_wait")
+                    return (jsonify({"error": f"A request with this {HEADER} is still in progress"}),
+                            409, {"Retry-After": "1"})
+                waited = True
+                time.sleep(POLL_INTERVAL)
+        except sqlite3.Error as e:
+            logger.warning("Idempotency store unavailable, executing request: %s", e)
+            return f(uid, *args, **kwargs)
+
+        if state == MISMATCH:
+            record(route, "mismatch")
+            return jsonify({"error": f"{HEADER} was already used with a different request body"}), 422
+        if state == REPLAY:
+            record(route, "waited" if waited else "replay")
+            status, mimetype, body = stored
+            response = make_response(body, status)
+            response.mimetype = mimetype
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        record(route, "executed")
+        try:
+            response = make_response(f(uid, *args, **kwargs))
+        except BaseException:
+            finish(key)
+            raise
+        finish(key, response.status_code, response.mimetype, response.get_data())
+        return response
+
+    return decorated_function
+
+
+def finish(key, status=None, mimetype=None, body=None):
+    """Store the response for replay, or drop the claim (no/transient response) so a retry runs again."""
+    try:
+        if status is not None and should_store(status):
+            idempotency_store.complete(key, status, mimetype, body)
+        else:
+            idempotency_store.release(key)
+    except sqlite3.Error as e:
+        # An unfinished claim expires after LEASE seconds
+        logger.warning("Idempotency store write failed: %s", e)
+
+
+idempotency_store = IdempotencyStore(
+    os.getenv("IDEMPOTENCY_DB") or os.path.join(tempfile.gettempdir(), "app-idempotency.sqlite3")
+)
+metrics.describe("idempotency_requests_total", "Requests carrying an Idempotency-Key by outcome.")
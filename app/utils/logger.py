@@ -1,18 +1,149 @@
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
+import json
 import os
+import queue
+import random
 import sys
+import threading
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, module, line, msg (+ exc)."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of chatty sub-WARNING messages.
+
+    Rates are keyed by the start of the unformatted message template, e.g.
+    ``{"Device state updated": 0.1}`` keeps one "Device state updated: %s -> %s"
+    record in ten.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        template = str(record.msg)
+        for prefix, rate in self.rates.items():
+            if template.startswith(prefix):
+                if random.random() < rate:
+                    return True
+                self.sampled_out += 1
+                return False
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to a background writer; drops (and counts) them when the queue is full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+    def prepare(self, record):
+        # Interpolate now so later mutation of args can't change the message;
+        # formatting and I/O happen on the writer thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_sample_rates(spec):
+    """``"Device state updated=0.1;Schedule set=0.5"`` -> ``{prefix: rate}``."""
+    rates = {}
+    for item in (spec or "").split(";"):
+        if "=" in item:
+            prefix, rate = item.rsplit("=", 1)
+            try:
+                rates[prefix.strip()] = float(rate)
+            except ValueError:
+                continue
+    return rates
+
+
+_listeners = {}  # name -> (QueueListener, DroppingQueueHandler feeding it)
+
+
+def _start_listener(name, queue_handler, handlers):
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = (listener, queue_handler)
+    return listener
+
+
+def _restart_listeners_after_fork():
+    # The writer thread does not survive fork (e.g. gunicorn preload_app). The
+    # inherited queue is abandoned: its lock may have been held by a parent
+    # thread at fork time, and records still in it are the parent's to write.
+    for name, (listener, queue_handler) in list(_listeners.items()):
+        queue_handler.queue = queue.Queue(maxsize=queue_handler.queue.maxsize)
+        queue_handler._drop_lock = threading.Lock()
+        _start_listener(name, queue_handler, listener.handlers)
+
+
+def _stop_listeners():
+    for listener, _ in _listeners.values():
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners_after_fork)
+atexit.register(_stop_listeners)
+
 
 def setup_logger(name="app_logger", log_file="app.log", level=logging.INFO):
-    """Function to setup a logger with rotating file handler and console handler"""
-    
+    """Function to setup a logger with rotating file handler and console handler.
+
+    Records are queued and written by a background thread (LOG_ASYNC=0 writes
+    inline). LOG_FORMAT=json switches to JSON lines, LOG_SAMPLE samples chatty
+    info messages and LOG_QUEUE_SIZE bounds the queue.
+    """
+
     # Create logs directory if it doesn't exist
     if not os.path.exists("logs"):
-        os.makedirs("logs")
+        os.makedirs("logs", exist_ok=True)
 
-    formatter = logging.Formatter(
-        "[%(asctime)s] {%(pathname)s:%(lineno)d} %(levelname)s - %(message)s"
-    )
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "[%(asctime)s] {%(module)s:%(lineno)d} %(levelname)s - %(message)s"
+        )
 
     handler = RotatingFileHandler(
         f"logs/{log_file}", maxBytes=10000000, backupCount=5
@@ -24,12 +155,33 @@ def setup_logger(name="app_logger", log_file="app.log", level=logging.INFO):
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # Avoid adding handlers multiple times
     if not logger.handlers:
-        logger.addHandler(handler)
-        logger.addHandler(console_handler)
+        sampler = SamplingFilter(_parse_sample_rates(os.getenv("LOG_SAMPLE")))
+        logger.addFilter(sampler)
+        logger.sampler = sampler
+        if os.getenv("LOG_ASYNC", "1") == "0":
+            logger.addHandler(handler)
+            logger.addHandler(console_handler)
+        else:
+            queue_handler = DroppingQueueHandler(queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+            logger.addHandler(queue_handler)
+            _start_listener(name, queue_handler, (handler, console_handler))
 
     return logger
 
+
+def log_stats(target=None):
+    """Dropped/sampled counters and queue depth for the app logger."""
+    target = target or logger
+    stats = {"log_sampled_out": getattr(getattr(target, "sampler", None), "sampled_out", 0),
+             "log_dropped": 0, "log_queue_depth": 0}
+    for h in target.handlers:
+        if isinstance(h, DroppingQueueHandler):
+            stats["log_dropped"] += h.dropped
+            stats["log_queue_depth"] += h.queue.qsize()
+    return stats
+
+
 logger = setup_logger()
@@ -0,0 +1,328 @@
+import os
+import hmac
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import has_request_context, request, g, jsonify
+from flask.json.provider import DefaultJSONProvider
+from .logger import logger, log_stats
+
+# Route of the current request when served outside Flask (ASGI mode)
+_route = ContextVar("metrics_route", default=None)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Bearer token a scraper must send to /metrics; unset = only direct requests from this host
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LOOPBACK = {"127.0.0.1", "::1"}
+
+
+def _labels_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms in Prometheus text exposition format.
+
+    With ``directory`` set, every process periodically writes its own snapshot
+    to ``<directory>/<role>-<pid>.json`` (atomic rename, single writer per file)
+    and render() merges all snapshots, so any gunicorn worker can answer a
+    scrape for the whole host. Counters and histograms are summed across
+    processes; gauges report the maximum.
+
+    A process removes its snapshot at exit. Snapshots of processes that are
+    gone (dead pid, or not rewritten for ``stale_after`` seconds) are deleted
+    while merging, so restarted workers don't count twice. Once a process has
+    flushed, a daemon thread re-flushes it well within ``stale_after`` so an
+    idle worker is never mistaken for a gone one.
+    """
+
+    def __init__(self, role="web", directory=None, flush_interval=1.0, buckets=DEFAULT_BUCKETS, stale_after=300.0):
+        self.role = role
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._help = {}
+        self._collectors = []
+        self._last_flush = 0.0
+        self._heartbeat_pid = None
+        if directory:
+            atexit.register(self.discard)
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def register_collector(self, fn):
+        """``fn()`` returns ``{gauge_name: value}``; evaluated per snapshot and labelled with the pid."""
+        self._collectors.append(fn)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[(name, _labels_key(labels))] = value
+
+    def observe(self, name, value, labels=None):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    @contextmanager
+    def timer(self, name, labels=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def snapshot(self):
+        collected = []
+        for collect in self._collectors:
+            try:
+                for name, value in collect().items():
+                    collected.append([name, [["pid", str(os.getpid())]], value])
+            except Exception as e:
+                logger.error("Metrics collector failed: %s", e)
+        with self._lock:
+            return {
+                "counters": [[n, list(l), v] for (n, l), v in self._counters.items()],
+                "gauges": [[n, list(l), v] for (n, l), v in self._gauges.items()] + collected,
+                "histograms": [[n, list(l), list(h)] for (n, l), h in self._histograms.items()],
+            }
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, f"{self.role}-{os.getpid()}.json")
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._snapshot_path()
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error("Metrics flush failed: %s", e)
+        self._start_heartbeat()
+
+    def _start_heartbeat(self):
+        # Threads don't survive fork, so each process starts its own
+        if self._heartbeat_pid == os.getpid():
+            return
+        self._heartbeat_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(max(self.flush_interval, self.stale_after / 3))
+                self.flush()
+
+        threading.Thread(target=loop, name="metrics-heartbeat", daemon=True).start()
+
+    def discard(self):
+        """Remove this process's snapshot (at exit)."""
+        if not self.directory:
+            return
+        try:
+            os.remove(self._snapshot_path())
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Metrics snapshot cleanup failed: %s", e)
+
+    def _is_stale(self, path):
+        """Whether a snapshot's writer is gone: its pid no longer exists, or it stopped flushing."""
+        try:
+            pid = int(os.path.basename(path)[:-len(".json")].rsplit("-", 1)[1])
+            os.kill(pid, 0)
+        except (IndexError, ValueError):
+            pass
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass  # exists, owned by someone else
+        try:
+            return time.time() - os.path.getmtime(path) > self.stale_after
+        except OSError:
+            return False
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _merged(self):
+        snapshots = [self.snapshot()]
+        if self.directory and os.path.isdir(self.directory):
+            own = os.path.basename(self._snapshot_path())
+            for fname in os.listdir(self.directory):
+                if not fname.endswith(".json") or fname == own:
+                    continue
+                path = os.path.join(self.directory, fname)
+                if self._is_stale(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, gauges, histograms = {}, {}, {}
+        for snap in snapshots:
+            for name, labels, value in snap.get("counters", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in snap.get("gauges", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                gauges[key] = max(gauges.get(key, value), value)
+            for name, labels, hist in snap.get("histograms", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                if len(hist) != len(self.buckets) + 2:
+                    continue
+                acc = histograms.setdefault(key, [0] * len(hist))
+                for i, v in enumerate(hist):
+                    acc[i] += v
+        return counters, gauges, histograms
+
+    def render(self):
+        counters, gauges, histograms = self._merged()
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            seen = set()
+            for (name, labels), value in sorted(series.items()):
+                if name not in seen:
+                    header(name, kind)
+                    seen.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        seen = set()
+        for (name, labels), hist in sorted(histograms.items()):
+            if name not in seen:
+                header(name, "histogram")
+                seen.add(name)
+            for bound, count in zip(self.buckets, hist):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def current_route():
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else "unmatched"
+    return _route.get() or "background"
+
+
+def set_route(route):
+    _route.set(route)
+
+
+@contextmanager
+def stage(name):
+    """Time a request stage (token_verify, rtdb_read, external_post, ...) for the current route."""
+    with metrics.timer("app_stage_duration_seconds", {"route": current_route(), "stage": name}):
+        yield
+
+
+def count_retry(upstream):
+    metrics.inc("upstream_retries_total", {"upstream": upstream})
+
+
+def scrape_allowed(authorization, remote_addr, forwarded_for=None):
+    """Whether a /metrics request may read the metrics.
+
+    With METRICS_TOKEN set the scraper must send ``Authorization: Bearer <token>``;
+    otherwise only direct (not proxied) requests from this host are served.
+    """
+    if METRICS_TOKEN:
+        scheme, _, token = (authorization or "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+    return remote_addr in LOOPBACK and not forwarded_for
+
+
+def init_request_metrics(app):
+    """Record per-route latency for every request and expose /metrics."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            labels = {"route": current_route(), "method": request.method, "status": str(response.status_code)}
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start, labels)
+            metrics.inc("http_requests_total", labels)
+        metrics.maybe_flush()
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if not scrape_allowed(request.headers.get("Authorization"), request.remote_addr,
+                              request.headers.get("X-Forwarded-For")):
+            return jsonify({"error": "Unauthorized"}), 401
+        return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that times response serialization as the ``serialize`` stage."""
+
+    def response(self, *args, **kwargs):
+        with stage("serialize"):
+            return super().response(*args, **kwargs)
+
+
+metrics = MetricsRegistry(
+    role=os.getenv("METRICS_ROLE", "web"),
+    directory=os.getenv("METRICS_DIR") or None,
+    flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "1")),
+    stale_after=float(os.getenv("METRICS_STALE_AFTER", "300")),
+)
+metrics.register_collector(log_stats)
+metrics.describe("http_request_duration_seconds", "Request latency by route, method and status.")
+metrics.describe("app_stage_duration_seconds", "Time spent per request stage by route.")
+metrics.describe("upstream_retries_total", "Retries issued to upstream services.")
+metrics.describe("scheduler_tick_duration_seconds", "Wall time of one scheduler pass.")
+metrics.describe("scheduler_tick_lag_seconds", "How late the last scheduler tick started versus its cadence.")
@@ -0,0 +1,274 @@
+import os
+import time
+import sqlite3
+import tempfile
+from flask import g, jsonify, request
+from .logger import logger
+from .metrics import current_route, metrics
+from .sqlite_store import SQLiteStore
+
+# Token buckets per route: (scope, requests, window seconds). scope is "ip",
+# "uid" or "route" (one bucket shared by every caller of the route); "*"
+# applies to every /auth route on top of its own rules.
+DEFAULT_LIMITS = {
+    "*": [("ip", 600, 60), ("uid", 300, 60)],
+    "/auth/signup": [("ip", 5, 60)],
+    "/auth/login": [("ip", 10, 60)],
+    "/auth/refresh": [("ip", 30, 60)],
+    "/auth/voice_command": [("uid", 20, 60), ("route", 600, 60)],
+    "/auth/device_state": [("uid", 120, 60)],
+}
+
+# Requests allowed in flight at once across all workers on the host; extra
+# requests are shed with 503 instead of queueing behind slow upstreams.
+DEFAULT_CONCURRENCY = {
+    "/auth/voice_command": 16,
+}
+
+# A slot whose worker died is reclaimed after this many seconds
+SLOT_LEASE = 60.0
+
+
+def _parse_limits(spec):
+    """``"/auth/login=ip:10/60;/auth/voice_command=uid:20/60,route:600/60"`` -> rules."""
+    limits = {}
+    for item in (spec or "").split(";"):
+        if "=" not in item:
+            continue
+        route, rules = item.split("=", 1)
+        parsed = []
+        for rule in rules.split(","):
+            try:
+                scope, rate = rule.strip().split(":", 1)
+                count, window = rate.split("/", 1)
+                parsed.append((scope.strip(), int(count), float(window)))
+            except ValueError:
+                logger.warning("Ignoring malformed rate limit rule %r", rule)
+        limits[route.strip()] = parsed
+    return limits
+
+
+def _parse_concurrency(spec):
+    """``"/auth/voice_command=16"`` -> ``{route: limit}``."""
+    limits = {}
+    for item in (spec or "").split(";"):
+        if "=" in item:
+            route, limit = item.rsplit("=", 1)
+            try:
+                limits[route.strip()] = int(limit)
+            except ValueError:
+                continue
+    return limits
+
+
+class SharedStore(SQLiteStore):
+    """Token buckets and concurrency slots in a local SQLite file shared by all workers on a host."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)",
+        "CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, pid INTEGER, expires REAL)",
+        "CREATE INDEX IF NOT EXISTS slots_name ON slots (name)",
+    )
+
+    def take(self, buckets, now=None):
+        """Take one token from every ``(key, capacity, window)`` bucket, or none of them.
+
+        Returns 0 when allowed, else the seconds until the emptiest bucket has a token.
+        """
+        now = time.time() if now is None else now
+        with self.transaction() as conn:
+            updates, retry_after = [], 0.0
+            for key, capacity, window in buckets:
+                rate = capacity / window
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                if tokens < 1:
+                    retry_after = max(retry_after, (1 - tokens) / rate)
+                updates.append((key, tokens - 1, now))
+            if not retry_after:
+                conn.executemany("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", updates)
+        return retry_after
+
+    def acquire_slot(self, name, limit, lease=SLOT_LEASE):
+        """Returns a slot id, or None when ``limit`` slots named ``name`` are held."""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE name = ? AND expires < ?", (name, now))
+            held = conn.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (name,)).fetchone()[0]
+            slot = None
+            if held < limit:
+                slot = conn.execute(
+                    "INSERT INTO slots (name, pid, expires) VALUES (?, ?, ?)", (name, os.getpid(), now + lease)
+                ).lastrowid
+        return slot
+
+    def release_slot(self, slot):
+        self._conn().execute("DELETE FROM slots WHERE id = ?", (slot,))
+
+    def slots_in_use(self):
+        rows = self._conn().execute(
+            "SELECT name, COUNT(*) FROM slots WHERE expires >= ? GROUP BY name", (time.time(),)
+        ).fetchall()
+        return dict(rows)
+
+    def prune(self, older_than):
+        """Drop buckets idle long enough to be full again."""
+        self._conn().execute("DELETE FROM buckets WHERE updated < ?", (time.time() - older_than,))
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM buckets")
+        conn.execute("DELETE FROM slots")
+
+
+class RateLimiter:
+    """Per-IP/uid/route token buckets and per-route concurrency limits over a SharedStore.
+
+    Store errors fail open: a request is never rejected because the limiter is broken.
+    """
+
+    def __init__(self, store, limits=None, concurrency=None, enabled=True):
+        self.store = store
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.concurrency = dict(DEFAULT_CONCURRENCY if concurrency is None else concurrency)
+        self.enabled = enabled
+        self._checks = 0
+
+    def _buckets(self, route, subjects):
+        # "*" rules share one bucket per subject across routes; route rules get their own
+        buckets = []
+        for scope_route in ("*", route):
+            for scope, count, window in self.limits.get(scope_route, []):
+                if subjects.get(scope) is not None:
+                    buckets.append((f"{scope}:{subjects[scope]}:{scope_route}", count, window))
+        return buckets
+
+    def check(self, route, ip=None, uid=None):
+        """Returns 0 when allowed, else Retry-After seconds. Pass ``ip`` before auth and ``uid`` after."""
+        if not self.enabled:
+            return 0
+        # The route-wide bucket is taken once per request, alongside the IP check
+        buckets = self._buckets(route, {"ip": ip, "uid": uid, "route": "all" if ip is not None else None})
+        if not buckets:
+            return 0
+        try:
+            retry_after = self.store.take(buckets)
+            self._checks += 1
+            if self._checks % 1000 == 0:
+                self.store.prune(2 * max(w for rules in self.limits.values() for _, _, w in rules))
+        except sqlite3.Error as e:
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            metrics.inc("ratelimit_store_errors_total")
+            return 0
+        if retry_after:
+            metrics.inc("ratelimit_rejected_total", {"route": route, "scope": "uid" if uid else "ip"})
+        return retry_after
+
+    def acquire(self, route):
+        """Returns ``(slot, shed)``; release ``slot`` when the request finishes."""
+        limit = self.concurrency.get(route)
+        if not self.enabled or not limit:
+            return None, False
+        try:
+            slot = self.store.acquire_slot(route, limit)
+        except sqlite3.Error as e:
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            metrics.inc("ratelimit_store_errors_total")
+            return None, False
+        if slot is None:
+            metrics.inc("load_shed_total", {"route": route})
+            return None, True
+        return slot, False
+
+    def release(self, slot):
+        if slot is None:
+            return
+        try:
+            self.store.release_slot(slot)
+        except sqlite3.Error as e:
+            # The lease expires on its own
+            logger.warning("Failed to release concurrency slot %s: %s", slot, e)
+
+    def stats(self):
+        try:
+            in_use = self.store.slots_in_use()
+        except sqlite3.Error:
+            in_use = {}
+        return {route: {"limit": limit, "in_use": in_use.get(route, 0)} for route, limit in self.concurrency.items()}
+
+
+def client_ip(remote_addr, forwarded_for=None, hops=None):
+    """Address the nearest of ``hops`` trusted proxies saw, like werkzeug's ProxyFix(x_for=hops).
+
+    Each proxy appends the peer it received from, so only the ``hops``-th entry
+    from the right is trustworthy; anything to its left is client-supplied.
+    """
+    hops = PROXY_HOPS if hops is None else hops
+    if forwarded_for and hops > 0:
+        entries = [e.strip() for e in forwarded_for.split(",") if e.strip()]
+        if len(entries) >= hops:
+            return entries[-hops]
+    return remote_addr or "unknown"
+
+
+def rejection(retry_after, shed=False):
+    """Body, status and headers for a limited request."""
+    seconds = max(1, int(retry_after + 0.999))
+    if shed:
+        return {"error": "Server busy, retry later"}, 503, {"Retry-After": str(seconds)}
+    return {"error": "Too many requests"}, 429, {"Retry-After": str(seconds)}
+
+
+def _limited_response(retry_after, shed=False):
+    body, status, headers = rejection(retry_after, shed)
+    return jsonify(body), status, headers
+
+
+def check_user(uid):
+    """Per-uid limits, checked by require_auth once the token is verified; None when allowed."""
+    retry_after = rate_limiter.check(current_route(), uid=uid)
+    return _limited_response(retry_after) if retry_after else None
+
+
+def init_rate_limiting(app, prefix="/auth/"):
+    """Per-IP/route buckets and concurrency slots for routes under ``prefix``."""
+    rate_limiter.enabled = app.config.get("RATE_LIMIT", True)
+
+    @app.before_request
+    def _admit():
+        route = current_route()
+        if not route.startswith(prefix):
+            return None
+        ip = client_ip(request.remote_addr, request.headers.get("X-Forwarded-For"))
+        retry_after = rate_limiter.check(route, ip=ip)
+        if retry_after:
+            return _limited_response(retry_after)
+        slot, shed = rate_limiter.acquire(route)
+        if shed:
+            return _limited_response(1, shed=True)
+        g._ratelimit_slot = slot
+        return None
+
+    @app.teardown_request
+    def _release(exc):
+        rate_limiter.release(g.pop("_ratelimit_slot", None))
+
+
+# Proxies in front of the app that append to X-Forwarded-For (Render's load balancer
+# counts as one). 0 ignores the header, so it can't be spoofed when nothing sets it.
+PROXY_HOPS = int(os.getenv("PROXY_HOPS", "0"))
+
+rate_limiter = RateLimiter(
+    SharedStore(os.getenv("RATE_LIMIT_DB") or os.path.join(tempfile.gettempdir(), "app-ratelimit.sqlite3")),
+    limits={**DEFAULT_LIMITS, **_parse_limits(os.getenv("RATE_LIMITS"))},
+    concurrency={**DEFAULT_CONCURRENCY, **_parse_concurrency(os.getenv("CONCURRENCY_LIMITS"))},
+)
+
+
+def _collect():
+    return {"concurrency_slots_in_use": sum(s["in_use"] for s in rate_limiter.stats().values())}
+
+
+metrics.register_collector(_collect)
+metrics.describe("ratelimit_rejected_total", "Requests rejected with 429 by route and limiting scope.")
+metrics.describe("load_shed_total", "Requests shed with 503 because the route's concurrency limit was reached.")
@@ -0,0 +1,149 @@
+import os
+import json
+import random
+import threading
+from flask import has_request_context, g
+from .logger import logger
+from .metrics import current_route
+
+# RTDB_TRACE: unset/0 = off, 1 = every request, 0 < x < 1 = sample that fraction
+_SAMPLE_RATE = float(os.getenv("RTDB_TRACE", "0") or 0)
+_MAX_EXAMPLES = 5
+
+_lock = threading.Lock()
+_routes = {}  # route -> aggregate summary
+
+
+def path_shape(path):
+    """``users/abc/venues/Hall/fan`` -> ``users/{uid}/venues/{key}/{key}``."""
+    parts = [p for p in str(path).split("/") if p]
+    if parts and parts[0] == "users" and len(parts) > 1:
+        parts[1] = "{uid}"
+    return "/".join(p if i < 3 else "{key}" for i, p in enumerate(parts))
+
+
+def _payload_bytes(value):
+    try:
+        return len(json.dumps(value, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _overlaps(a, b):
+    return a == b or a.startswith(b + "/") or b.startswith(a + "/") or not a or not b
+
+
+def set_sample_rate(rate):
+    global _SAMPLE_RATE
+    _SAMPLE_RATE = rate
+
+
+def start_request():
+    if _SAMPLE_RATE > 0 and (_SAMPLE_RATE >= 1 or random.random() < _SAMPLE_RATE):
+        g._rtdb_trace = []
+
+
+def active():
+    return has_request_context() and g.get("_rtdb_trace") is not None
+
+
+def record(op, path, value, duration, cached=False):
+    """Record one RTDB operation for the current traced request."""
+    ops = g.get("_rtdb_trace") if has_request_context() else None
+    if ops is None:
+        return
+    ops.append({
+        "op": op,
+        "path": "/".join(p for p in str(path).split("/") if p),
+        "bytes": _payload_bytes(value),
+        "ms": round(duration * 1000, 3),
+        "cached": cached,
+    })
+
+
+def analyze(ops):
+    """Flag reads that repeat or overlap an earlier read of the same request."""
+    findings = []
+    reads = []
+    for op in ops:
+        if op["op"] != "get":
+            continue
+        for earlier in reads:
+            if _overlaps(op["path"], earlier["path"]):
+                findings.append({
+                    "kind": "duplicate" if op["path"] == earlier["path"] else "overlap",
+                    "path": path_shape(op["path"]),
+                    "earlier": path_shape(earlier["path"]),
+                    "round_trip": not op["cached"],
+                })
+                break
+        reads.append(op)
+    return findings
+
+
+def finish_request(route):
+    ops = g.pop("_rtdb_trace", None) if has_request_context() else None
+    if ops is None:
+        return None
+    findings = analyze(ops)
+    round_trips = sum(1 for op in ops if not op["cached"])
+
+    with _lock:
+        summary = _routes.setdefault(route, {
+            "requests": 0, "ops": 0, "round_trips": 0, "bytes": 0, "rtdb_ms": 0.0,
+            "duplicate_reads": 0, "overlapping_reads": 0, "ops_by_shape": {}, "examples": [],
+        })
+        summary["requests"] += 1
+        summary["ops"] += len(ops)
+        summary["round_trips"] += round_trips
+        summary["bytes"] += sum(op["bytes"] for op in ops)
+        summary["rtdb_ms"] += sum(op["ms"] for op in ops if not op["cached"])
+        for op in ops:
+            key = f"{op['op']} {path_shape(op['path'])}"
+            summary["ops_by_shape"][key] = summary["ops_by_shape"].get(key, 0) + 1
+        for finding in findings:
+            summary["duplicate_reads" if finding["kind"] == "duplicate" else "overlapping_reads"] += 1
+            if finding not in summary["examples"] and len(summary["examples"]) < _MAX_EXAMPLES:
+                summary["examples"].append(finding)
+
+    if findings:
+        logger.warning("Redundant RTDB reads on %s: %s", route, findings)
+    return {"ops": ops, "findings": findings}
+
+
+def report():
+    """Per-route averages plus the most frequent operation shapes."""
+    with _lock:
+        result = {}
+        for route, s in sorted(_routes.items()):
+            n = s["requests"] or 1
+            result[route] = {
+                "requests": s["requests"],
+                "avg_ops": round(s["ops"] / n, 2),
+                "avg_round_trips": round(s["round_trips"] / n, 2),
+                "avg_bytes": round(s["bytes"] / n, 1),
+                "avg_rtdb_ms": round(s["rtdb_ms"] / n, 3),
+                "duplicate_reads": s["duplicate_reads"],
+                "overlapping_reads": s["overlapping_reads"],
+                "ops_by_shape": dict(sorted(s["ops_by_shape"].items(), key=lambda kv: -kv[1])),
+                "examples": list(s["examples"]),
+            }
+        return result
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+def init_rtdb_trace(app):
+    """Trace sampled requests and log redundant reads when they finish."""
+
+    @app.before_request
+    def _start_trace():
+        start_request()
+
+    @app.after_request
+    def _finish_trace(response):
+        finish_request(current_route())
+        return response
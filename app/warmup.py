@@ -0,0 +1,118 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import firebase_admin
+from firebase_admin import auth, db
+from .utils.logger import logger
+from .utils.metrics import metrics
+
+# Hosts the app talks to on the request path; a HEAD opens and pools the TLS connection
+UPSTREAM_HOSTS = (
+    "https://identitytoolkit.googleapis.com/",
+    "https://securetoken.googleapis.com/",
+    "https://generativelanguage.googleapis.com/",
+)
+
+
+class StartupTimer:
+    """Wall time per startup phase, logged and exported as startup_phase_seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = round(elapsed, 4)
+            metrics.set_gauge("startup_phase_seconds", elapsed, {"phase": name})
+
+    def report(self):
+        with self._lock:
+            return {"since_import_s": round(time.perf_counter() - self.started, 4), "phases": dict(self.phases)}
+
+
+startup_timer = StartupTimer()
+
+
+def _token_verifier():
+    # firebase_admin keeps the signing certs in a cache-control session on the
+    # token verifier; there is no public API to prime it.
+    client = auth._get_client(firebase_admin.get_app())
+    return client._token_verifier
+
+
+def _rtdb_session():
+    return db.reference("/")._client.session
+
+
+def prefetch_certs():
+    """Fetch the ID-token signing certs so the first verify_id_token skips the download."""
+    try:
+        verifier = _token_verifier()
+        url = verifier.id_token_verifier.cert_url
+    except AttributeError as e:
+        # Private firebase_admin layout changed; the first verify downloads the certs instead
+        logger.warning("Cert prefetch skipped, firebase_admin internals changed: %s", e)
+        return
+    verifier.request(url=url, method="GET")
+
+
+def open_upstream_connections():
+    """Open pooled TLS connections to RTDB and the Google REST APIs."""
+    from .services.auth_service import AuthService
+
+    def head(url):
+        try:
+            AuthService._session.head(url, timeout=3)
+        except Exception as e:
+            logger.info("Warmup connection to %s failed: %s", url, e)
+
+    # Handshakes are independent, so open them concurrently
+    with ThreadPoolExecutor(max_workers=len(UPSTREAM_HOSTS) + 1) as pool:
+        for url in UPSTREAM_HOSTS:
+            pool.submit(head, url)
+        # A shallow root read also fetches the service-account access token
+        pool.submit(db.reference("/").get, shallow=True).result()
+
+
+def reset_connections_after_fork():
+    """Drop pooled sockets inherited from the master; pools reopen lazily per worker."""
+    from .services.auth_service import AuthService
+
+    sessions = [AuthService._session]
+    # Each private firebase_admin session is looked up on its own, so one that
+    # moved in an upgrade doesn't stop the others from being reset
+    for name, get_session in (("token verifier", lambda: _token_verifier().request.session),
+                              ("rtdb", _rtdb_session)):
+        try:
+            sessions.append(get_session())
+        except Exception as e:
+            logger.warning("Cannot reset %s connections after fork: %s", name, e)
+    for session in sessions:
+        try:
+            for adapter in session.adapters.values():
+                adapter.close()
+        except Exception as e:
+            logger.warning("Closing inherited connections failed: %s", e)
+
+
+def warm_up(open_connections=True):
+    """Run warmup phases, logging (not raising) failures so startup never blocks on them."""
+    phases = [("prefetch_certs", prefetch_certs)]
+    if open_connections:
+        phases.append(("open_connections", open_upstream_connections))
+    for name, fn in phases:
+        try:
+            with startup_timer.phase(name):
+                fn()
+        except Exception as e:
+            logger.warning("Warmup phase %s failed: %s", name, e)
+    logger.info("Startup timings: %s", startup_timer.report())
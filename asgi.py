@@ -0,0 +1,5 @@
+from app.asgi import create_asgi_app
+import os
+
+env = os.getenv("FLASK_ENV", "production")
+app = create_asgi_app(env)
@@ -0,0 +1,150 @@
+"""Throughput and tail latency of gunicorn sync workers vs the ASGI mode under uvicorn.
+
+    python -m benchmarks.asgi_bench --concurrency 8 32 128 --duration 10 --http-latency-ms 300
+
+Both servers run benchmarks.serve_fake (faked Firebase with the given
+latencies) as subprocesses. A threaded keep-alive client drives a mix of
+profile, device_state and voice_command at each concurrency level. With
+upstream latency in the hundreds of ms, sync workers saturate at
+``workers`` in-flight requests; the ASGI mode is bounded by ASGI_THREADS.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .report import latency_summary, print_table, save_result
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (method, path, body) - uid is filled in per request
+MIX = (
+    ("GET", "/auth/profile", None),
+    ("POST", "/auth/device_state", {"venue": "venue0", "device": "device0", "value": "on"}),
+    ("POST", "/auth/voice_command", {"text": "turn on device1"}),
+)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port, args):
+    env = dict(os.environ, BENCH_SERVER=kind, BENCH_USERS=str(args.users),
+               BENCH_RTDB_MS=str(args.rtdb_latency_ms), BENCH_HTTP_MS=str(args.http_latency_ms),
+               WARMUP="0", LOG_ASYNC="1", ASGI_THREADS=str(args.asgi_threads))
+    if kind == "wsgi":
+        cmd = [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", f"127.0.0.1:{port}",
+               "--log-level", "warning", "benchmarks.serve_fake:wsgi_app"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.asgi_workers), "--log-level", "warning", "benchmarks.serve_fake:asgi_app"]
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=log)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            log.seek(0)
+            raise RuntimeError(f"{kind} server exited: {log.read().decode()[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def drive(port, concurrency, duration, users):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local, codes, i = [], {}, 0
+        while time.perf_counter() < stop_at:
+            method, path, body = MIX[i % len(MIX)]
+            uid = f"bench-user-{(n + i) % users}"
+            headers = {"Authorization": f"Bearer uid:{uid}", "Content-Type": "application/json"}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+                status = conn.getresponse()
+                status.read()
+                code = status.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                code = "error"
+            local.append(time.perf_counter() - start)
+            codes[code] = codes.get(code, 0) + 1
+            i += 1
+        with lock:
+            latencies.extend(local)
+            for code, count in codes.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    return {"requests": len(latencies), "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"], "p99_ms": summary["p99_ms"],
+            "statuses": {str(k): v for k, v in statuses.items()}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", default=["wsgi", "asgi"], choices=["wsgi", "asgi"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[8, 32, 128])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn sync workers")
+    parser.add_argument("--asgi-workers", type=int, default=1)
+    parser.add_argument("--asgi-threads", type=int, default=64)
+    parser.add_argument("--rtdb-latency-ms", type=float, default=20.0)
+    parser.add_argument("--http-latency-ms", type=float, default=300.0)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for kind in args.servers:
+        port = _free_port()
+        proc = start_server(kind, port, args)
+        try:
+            for concurrency in args.concurrency:
+                row = {"server": kind, "concurrency": concurrency, **drive(port, concurrency, args.duration, args.users)}
+                rows.append(row)
+                print(f"{kind} c={concurrency}: {row['rps']} req/s p95 {row['p95_ms']} ms", file=sys.stderr)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+
+    print_table(rows, ["server", "concurrency", "requests", "rps", "p50_ms", "p95_ms", "p99_ms"])
+    if not args.no_save:
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        print(f"\nSaved {save_result('asgi', {'config': config, 'runs': rows})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Time-to-first-response of a fresh process, with and without warmup.
+
+    python -m benchmarks.cold_start --runs 5 --cold-latency-ms 300
+
+Each run spawns a new interpreter that imports the app, calls
+create_app("testing") against faked Firebase (WARMUP=0 or 1) and then serves
+its first /auth/profile and /auth/login requests. ``cold_latency`` models the
+one-off costs: first RTDB connection, token-cert download and per-host TLS
+handshakes. With warmup those move into startup, which under gunicorn
+preload_app happens before the worker accepts traffic.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .report import print_table, save_result
+
+
+def child(args):
+    t0 = float(os.environ["BENCH_T0"])
+    import logging
+    from .fakes import FakeFirebase, seed_users
+
+    fake = FakeFirebase(seed_users(5), rtdb_latency=args.rtdb_latency_ms / 1000,
+                        http_latency=args.http_latency_ms / 1000, cold_latency=args.cold_latency_ms / 1000)
+    with fake.installed():
+        from app import create_app
+        from app.utils.logger import logger
+        from app.warmup import startup_timer
+
+        logger.setLevel(logging.WARNING)
+        start = time.perf_counter()
+        app = create_app("testing")
+        ready = time.time()
+        startup_s = time.perf_counter() - start
+        client = app.test_client()
+
+        first = {}
+        for name, method, path, kwargs in (
+            ("profile", "GET", "/auth/profile", {"headers": {"Authorization": "Bearer uid:bench-user-0"}}),
+            ("login", "POST", "/auth/login", {"json": {"email": "bench-user-0@example.com", "password": "x"}}),
+        ):
+            s = time.perf_counter()
+            client.open(path, method=method, **kwargs)
+            first[name] = round((time.perf_counter() - s) * 1000, 2)
+        done = time.time()
+
+    print(json.dumps({
+        "spawn_to_ready_ms": round((ready - t0) * 1000, 1),
+        "create_app_ms": round(startup_s * 1000, 1),
+        "first_profile_ms": first["profile"],
+        "first_login_ms": first["login"],
+        "spawn_to_first_response_ms": round((done - t0) * 1000, 1),
+        "phases": startup_timer.report()["phases"],
+    }))
+
+
+def spawn(warmup, args):
+    env = dict(os.environ, WARMUP="1" if warmup else "0", BENCH_T0=repr(time.time()))
+    env.pop("GUNICORN_PRELOAD", None)
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", "--child",
+         "--cold-latency-ms", str(args.cold_latency_ms), "--rtdb-latency-ms", str(args.rtdb_latency_ms),
+         "--http-latency-ms", str(args.http_latency_ms)],
+        env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--cold-latency-ms", type=float, default=300.0)
+    parser.add_argument("--rtdb-latency-ms", type=float, default=20.0)
+    parser.add_argument("--http-latency-ms", type=float, default=80.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args)
+        return 0
+
+    rows = []
+    for warmup in (False, True):
+        runs = [spawn(warmup, args) for _ in range(args.runs)]
+        row = {"mode": "warmup" if warmup else "cold"}
+        for key in ("spawn_to_ready_ms", "create_app_ms", "first_profile_ms", "first_login_ms",
+                    "spawn_to_first_response_ms"):
+            row[key] = round(sorted(r[key] for r in runs)[len(runs) // 2], 1)
+        row["phases"] = runs[-1]["phases"]
+        rows.append(row)
+
+    print_table(rows, ["mode", "spawn_to_ready_ms", "create_app_ms", "first_profile_ms", "first_login_ms",
+                       "spawn_to_first_response_ms"])
+    if not args.no_save:
+        config = {k: v for k, v in vars(args).items() if k not in ("child", "no_save")}
+        print(f"\nSaved {save_result('cold_start', {'config': config, 'modes': rows})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""/auth/voice_command against a slow or failing Gemini, with and without a deadline budget.
+
+    python -m benchmarks.deadline_bench --budget 4 --slow-ms 6000
+
+Scenarios (each run with the route's budget disabled, then set to --budget):
+  slow     Gemini answers after --slow-ms, longer than the budget
+  failing  every Gemini call fails with a connection error after --fail-ms,
+           so _post_with_retries retries with backoff
+
+Reports status codes and worst-case latency. Without a budget the worst case
+is the sum of every attempt's timeout plus backoff; with one it is the budget.
+"""
+import argparse
+import logging
+import sys
+import time
+from collections import Counter
+
+from .fakes import FakeFirebase, seed_users
+from .report import latency_summary, print_table, save_result
+
+ROUTE = "/auth/voice_command"
+UID = "bench-user-0"
+
+
+def run_scenario(name, budget, args):
+    from app.utils import deadline
+
+    if name == "slow":
+        fake = FakeFirebase(seed_users(1), http_latency=args.slow_ms / 1000)
+    else:
+        fake = FakeFirebase(seed_users(1), http_latency=args.fail_ms / 1000, http_fail_rate=1.0)
+    fake.db.root["users"][UID]["secure"] = {"gemini_key": f"key-{UID}"}
+
+    with fake.installed():
+        from app import create_app
+        from app.utils.logger import logger
+
+        logger.setLevel(logging.CRITICAL)
+        client = create_app("testing").test_client()
+        deadline.BUDGETS[ROUTE] = budget
+        samples, codes = [], Counter()
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            r = client.post(ROUTE, json={"text": "turn on device0 in venue0"},
+                            headers={"Authorization": f"Bearer uid:{UID}"})
+            samples.append(time.perf_counter() - start)
+            codes[r.status_code] += 1
+        http = fake.counters()["http"]
+
+    summary = latency_summary(samples)
+    return {
+        "scenario": name,
+        "budget_s": budget or "off",
+        "statuses": " ".join(f"{k}x{v}" for k, v in sorted(codes.items())),
+        "gemini_attempts": sum(http.values()) / args.requests,
+        "p50_ms": summary["p50_ms"],
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=4.0, help="voice_command budget in seconds")
+    parser.add_argument("--slow-ms", type=float, default=6000.0)
+    parser.add_argument("--fail-ms", type=float, default=500.0)
+    parser.add_argument("--requests", type=int, default=2)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = [run_scenario(name, budget, args) for name in ("slow", "failing") for budget in (0, args.budget)]
+    print_table(rows, list(rows[0]))
+    if not args.no_save:
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        print(f"\nSaved {save_result('deadline', {'config': config, 'scenarios': rows})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
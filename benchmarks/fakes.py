@@ -0,0 +1,563 @@
+"""In-process stand-ins for firebase_admin (auth, db, messaging) and the Google REST APIs.
+
+Every fake call sleeps for a configurable latency and is counted, so benchmarks
+can report upstream round trips per request without touching the network.
+Arguments are validated the way the SDK or the server would, so code that only
+works against the fakes fails here too.
+"""
+import copy
+import heapq
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from firebase_admin import _auth_utils, auth, messaging
+
+# Characters RTDB rejects in paths and keys ("/" is a separator, so not in keys)
+INVALID_PATH_CHARS = ".#$[]"
+# Keys with a leading "." RTDB gives a meaning to
+SPECIAL_KEYS = {".sv", ".priority", ".value"}
+
+
+class Latency:
+    """Per-call delay; ``first`` is paid once more on the first call (cold connection)."""
+
+    def __init__(self, seconds=0.0, jitter=0.0, first=0.0):
+        self.seconds = seconds
+        self.jitter = jitter
+        self.first = first
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def sleep(self, limit=None):
+        """Wait out the delay; False when it was cut short at ``limit`` (a client timeout)."""
+        delay = self.seconds + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.first and not self._warm:
+            with self._lock:
+                if not self._warm:
+                    delay += self.first
+                    self._warm = True
+        if limit is not None and delay > limit:
+            time.sleep(max(0.0, limit))
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+def _split(path):
+    if not isinstance(path, str):
+        raise ValueError(f'Invalid path: "{path}". Path must be a string.')
+    if any(ch in path for ch in INVALID_PATH_CHARS):
+        raise ValueError(f'Invalid path: "{path}". Path contains illegal characters.')
+    return [p for p in path.split("/") if p]
+
+
+def _check_value(value):
+    # The server rejects the whole write (400) for a key it cannot store
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key in SPECIAL_KEYS:
+                continue
+            if not isinstance(key, str) or not key or any(ch in key for ch in INVALID_PATH_CHARS + "/"):
+                raise ValueError(f"Invalid key: {key!r}")
+            _check_value(child)
+    elif isinstance(value, list):
+        for child in value:
+            _check_value(child)
+
+
+class FakeDatabase:
+    """Dict-backed Realtime Database with RTDB's "empty nodes don't exist" semantics."""
+
+    def __init__(self, data=None, latency=None):
+        self.root = data if data is not None else {}
+        self.latency = latency or Latency()
+        self.lock = threading.RLock()
+        self.calls = Counter()
+        self.bytes_read = 0
+
+    def reference(self, path="/", app=None, url=None):
+        return FakeReference(self, _split(path))
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls.clear()
+            self.bytes_read = 0
+
+    def _count(self, op, value=None):
+        with self.lock:
+            self.calls[op] += 1
+            if value is not None:
+                self.bytes_read += len(json.dumps(value, separators=(",", ":")))
+
+    def _node(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _read(self, parts):
+        with self.lock:
+            return copy.deepcopy(self._node(parts))
+
+    @staticmethod
+    def _check_server_value(value):
+        # RTDB rejects the whole write (400) for an unknown server value or a non-numeric increment
+        if not isinstance(value, dict) or ".sv" not in value:
+            return
+        sv = value[".sv"]
+        if sv == "timestamp":
+            return
+        n = sv.get("increment") if isinstance(sv, dict) else None
+        if isinstance(n, bool) or not isinstance(n, (int, float)):
+            raise ValueError(f"Invalid server value: {json.dumps(sv)}")
+
+    def _server_value(self, parts, value):
+        # {".sv": {"increment": n}} / {".sv": "timestamp"}, resolved against the stored value
+        self._check_server_value(value)
+        sv = value[".sv"]
+        if sv == "timestamp":
+            return int(time.time() * 1000)
+        current = self._node(parts)
+        return (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + sv["increment"]
+
+    def _set(self, parts, value):
+        with self.lock:
+            _check_value(value)
+            if isinstance(value, dict) and ".sv" in value:
+                value = self._server_value(parts, value)
+            if not parts:
+                self.root = copy.deepcopy(value) if isinstance(value, dict) else {}
+                return
+            node = self.root
+            trail = []
+            for part in parts[:-1]:
+                child = node.get(part)
+                if not isinstance(child, dict):
+                    if value is None or value == {}:
+                        return
+                    child = node[part] = {}
+                trail.append((node, part))
+                node = child
+            if value is None or value == {}:
+                node.pop(parts[-1], None)
+            else:
+                node[parts[-1]] = copy.deepcopy(value)
+            # Prune parents left empty by a delete
+            for parent, key in reversed(trail):
+                if parent.get(key) == {}:
+                    del parent[key]
+
+    def _update(self, parts, value):
+        if not value or not isinstance(value, dict):
+            raise ValueError("Value argument must be a non-empty dictionary.")
+        with self.lock:
+            # Multi-path updates are atomic: validate every value before applying any
+            paths = sorted(tuple(_split(key)) for key in value)
+            for a, b in zip(paths, paths[1:]):
+                if b[:len(a)] == a:
+                    raise ValueError(f"Update paths overlap: {'/'.join(a)} and {'/'.join(b)}")
+            for child in value.values():
+                self._check_server_value(child)
+                _check_value(child)
+            for key, child in value.items():
+                self._set(parts + _split(key), child)
+
+
+class FakeQuery:
+    def __init__(self, ref):
+        self._ref = ref
+        self._start = None
+        self._end = None
+        self._limit_first = None
+        self._limit_last = None
+
+    def start_at(self, key):
+        self._start = key
+        return self
+
+    def end_at(self, key):
+        self._end = key
+        return self
+
+    def limit_to_first(self, n):
+        self._limit_first = n
+        return self
+
+    def limit_to_last(self, n):
+        self._limit_last = n
+        return self
+
+    def get(self):
+        db = self._ref._db
+        db.latency.sleep()
+        with db.lock:
+            node = db._node(self._ref._parts)
+            if not isinstance(node, dict):
+                db._count("query")
+                return {}
+            keys = (k for k in node if (self._start is None or k >= self._start)
+                    and (self._end is None or k <= self._end))
+            # Only the requested page is sorted and copied, like a server-side query
+            if self._limit_first is not None and self._limit_last is None:
+                keys = heapq.nsmallest(self._limit_first, keys)
+            else:
+                keys = sorted(keys)
+                if self._limit_first is not None:
+                    keys = keys[:self._limit_first]
+                if self._limit_last is not None:
+                    keys = keys[-self._limit_last:]
+            result = {k: copy.deepcopy(node[k]) for k in keys}
+        db._count("query", result)
+        return result
+
+
+class FakeReference:
+    def __init__(self, db, parts):
+        self._db = db
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    def child(self, path):
+        return FakeReference(self._db, self._parts + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        self._db.latency.sleep()
+        value = self._db._read(self._parts)
+        if shallow and isinstance(value, dict):
+            value = {k: True for k in value}
+        self._db._count("get", value)
+        return value
+
+    def set(self, value):
+        self._db.latency.sleep()
+        self._db._count("set")
+        self._db._set(self._parts, value)
+
+    def update(self, value):
+        self._db.latency.sleep()
+        self._db._count("update")
+        self._db._update(self._parts, value)
+
+    def delete(self):
+        self._db.latency.sleep()
+        self._db._count("delete")
+        self._db._set(self._parts, None)
+
+    def order_by_key(self):
+        return FakeQuery(self)
+
+
+class FakeAuth:
+    """ID tokens are ``"uid:<uid>"``; anything else is rejected as invalid.
+
+    The first verification downloads the signing certs (``cert_latency``)
+    unless fetch_certs() already ran, as app.warmup.prefetch_certs does.
+    """
+
+    def __init__(self, latency=None, cert_latency=0.0):
+        self.latency = latency or Latency()
+        self.cert_latency = cert_latency
+        self.certs_cached = False
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self._next_uid = 0
+        self.users = {}  # email -> uid
+
+    def fetch_certs(self):
+        with self.lock:
+            if self.certs_cached:
+                return
+            self.calls["fetch_certs"] += 1
+            if self.cert_latency:
+                time.sleep(self.cert_latency)
+            self.certs_cached = True
+
+    def _count(self, op):
+        with self.lock:
+            self.calls[op] += 1
+
+    def verify_id_token(self, id_token, app=None, check_revoked=False, clock_skew_seconds=0):
+        self.fetch_certs()
+        self.latency.sleep()
+        self._count("verify_id_token")
+        if not isinstance(id_token, str) or not id_token.startswith("uid:"):
+            raise ValueError("Invalid ID token")
+        return {"uid": id_token[4:]}
+
+    def create_user(self, **kwargs):
+        self.latency.sleep()
+        self._count("create_user")
+        _auth_utils.validate_uid(kwargs.get("uid"))
+        _auth_utils.validate_email(kwargs.get("email"))
+        _auth_utils.validate_password(kwargs.get("password"))
+        _auth_utils.validate_display_name(kwargs.get("display_name"))
+        with self.lock:
+            if kwargs.get("email") and kwargs["email"].lower() in self.users:
+                raise auth.EmailAlreadyExistsError("The user with the provided email already exists", None, None)
+            self._next_uid += 1
+            uid = kwargs.get("uid") or f"fake-uid-{self._next_uid}"
+            if kwargs.get("email"):
+                self.users[kwargs["email"].lower()] = uid
+        return SimpleNamespace(uid=uid, email=kwargs.get("email"), display_name=kwargs.get("display_name"))
+
+    def import_users(self, users, hash_alg=None, app=None):
+        self.latency.sleep()
+        self._count("import_users")
+        if not users or len(users) > 1000:
+            raise ValueError("Users must be a non-empty list with no more than 1000 elements.")
+        if any(not isinstance(user, auth.ImportUserRecord) for user in users):
+            raise ValueError("One or more user objects are invalid.")
+        errors = []
+        with self.lock:
+            for i, user in enumerate(users):
+                if user.email.lower() in self.users:
+                    errors.append(SimpleNamespace(index=i, reason="Email already exists"))
+                else:
+                    self.users[user.email.lower()] = user.uid
+        return SimpleNamespace(success_count=len(users) - len(errors), failure_count=len(errors), errors=errors)
+
+    def get_users(self, identifiers, app=None):
+        self.latency.sleep()
+        self._count("get_users")
+        if len(identifiers) > 100:
+            raise ValueError("`identifiers` parameter must have <= 100 entries.")
+        if any(not isinstance(i, auth.UserIdentifier) for i in identifiers):
+            raise ValueError("Invalid entry in `identifiers` list.")
+        with self.lock:
+            found = [SimpleNamespace(uid=self.users[i.email.lower()], email=i.email)
+                     for i in identifiers if i.email.lower() in self.users]
+        return SimpleNamespace(users=found, not_found=[])
+
+    def delete_users(self, uids, app=None):
+        self.latency.sleep()
+        self._count("delete_users")
+        if len(uids) > 1000:
+            raise ValueError("`uids` parameter must have <= 1000 entries.")
+        with self.lock:
+            for email in [e for e, uid in self.users.items() if uid in set(uids)]:
+                del self.users[email]
+
+
+class FakeMessaging:
+    def __init__(self, latency=None):
+        self.latency = latency or Latency()
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.sent = deque(maxlen=1000)
+
+    def send(self, message, dry_run=False, app=None):
+        if not isinstance(message, messaging.Message):
+            raise ValueError("Message must be an instance of messaging.Message class.")
+        self.latency.sleep()
+        with self.lock:
+            self.calls["send"] += 1
+            self.sent.append(message)
+            return f"projects/fake/messages/{self.calls['send']}"
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self.text = json.dumps(data)
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeGoogleAPIs:
+    """Answers identitytoolkit, securetoken and Gemini generateContent POSTs.
+
+    Gemini keys are ``"key-<uid>"``; the fake replies with the first venue and
+    device of that uid named in the user command, else the first device it
+    finds. ``gemini_per_kb`` adds prompt-size-proportional latency. Calls
+    slower than the caller's ``timeout`` raise ReadTimeout at the timeout, and
+    ``fail_rate`` of them fail with a connection error after the latency.
+    """
+
+    def __init__(self, db, latency=None, handshake_latency=0.0, gemini_per_kb=0.0, fail_rate=0.0):
+        self.db = db
+        self.latency = latency or Latency()
+        self.handshake_latency = handshake_latency
+        self.gemini_per_kb = gemini_per_kb
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self._connected = set()
+
+    def _connect(self, url):
+        """Pay the TLS handshake once per host, like a pooled keep-alive session."""
+        host = url.split("/")[2] if "://" in url else url
+        with self.lock:
+            if host in self._connected:
+                return
+            self._connected.add(host)
+        if self.handshake_latency:
+            time.sleep(self.handshake_latency)
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        self._connect(url)
+        if not self.latency.sleep(timeout):
+            self._count("timeout")
+            raise requests.exceptions.ReadTimeout(f"Read timed out. (read timeout={timeout})")
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._count("failed")
+            raise requests.exceptions.ConnectionError("Connection aborted.")
+        payload = json or {}
+        if "identitytoolkit" in url:
+            self._count("login")
+            uid = str(payload.get("email", "")).split("@")[0]
+            return FakeResponse({"idToken": f"uid:{uid}", "refreshToken": f"refresh:{uid}",
+                                 "expiresIn": "3600", "localId": uid})
+        if "securetoken" in url:
+            self._count("refresh")
+            uid = str(payload.get("refresh_token", "")).replace("refresh:", "")
+            return FakeResponse({"id_token": f"uid:{uid}", "refresh_token": f"refresh:{uid}",
+                                 "expires_in": "3600"})
+        if "generativelanguage" in url:
+            self._count("gemini")
+            return FakeResponse(self._gemini(url, payload))
+        self._count("other")
+        return FakeResponse({"error": {"message": f"Unknown fake endpoint {url}"}}, 404)
+
+    def head(self, url, timeout=None, **kwargs):
+        self._connect(url)
+        self.latency.sleep()
+        self._count("head")
+        return FakeResponse({}, 404)
+
+    def _count(self, op):
+        with self.lock:
+            self.calls[op] += 1
+
+    def _gemini(self, url, payload):
+        key = url.split("key=")[-1]
+        uid = key[4:] if key.startswith("key-") else ""
+        venues = self.db._read(["users", uid, "venues"]) or {}
+        prompt = payload["contents"][0]["parts"][0]["text"]
+        if self.gemini_per_kb:
+            time.sleep(len(prompt) / 1024 * self.gemini_per_kb)
+        said = prompt.rsplit("User command:", 1)[-1].lower()
+        command = {"venue": None, "device": None, "value": None}
+        candidates = []
+        for venue, devices in sorted(venues.items()):
+            names = [d for d in sorted(devices or {}) if d not in ("__created", "faults")]
+            for name in names:
+                score = (venue.lower() in said) + (name.lower() in said)
+                candidates.append((-score, venue, name))
+        if candidates:
+            _, venue, name = min(candidates)
+            command = {"venue": venue, "device": name, "value": "off" if " off" in said else "on"}
+            # "all devices" / "all venues", as the prompt's ALL handling allows
+            if "all devices" in said:
+                command["device"] = "ALL"
+            if "all venues" in said or "everywhere" in said:
+                command["venue"] = "ALL"
+        text = "```json\n" + json.dumps(command) + "\n```"
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4,
+                              "candidatesTokenCount": len(text) // 4},
+        }
+
+
+class FakeFirebase:
+    """Bundle of fakes plus the patches that route the app through them."""
+
+    def __init__(self, data=None, rtdb_latency=0.0, auth_latency=0.0, http_latency=0.0,
+                 fcm_latency=0.0, jitter=0.0, cold_latency=0.0, gemini_per_kb=0.0, http_fail_rate=0.0):
+        # cold_latency: one-off cost of the first RTDB call, cert download and per-host handshake
+        self.db = FakeDatabase(data, Latency(rtdb_latency, jitter, first=cold_latency))
+        self.auth = FakeAuth(Latency(auth_latency, jitter), cert_latency=cold_latency)
+        for uid, user in ((data or {}).get("users") or {}).items():
+            if isinstance(user, dict) and user.get("email"):
+                self.auth.users[user["email"].lower()] = uid
+        self.messaging = FakeMessaging(Latency(fcm_latency, jitter))
+        self.http = FakeGoogleAPIs(self.db, Latency(http_latency, jitter), handshake_latency=cold_latency,
+                                   gemini_per_kb=gemini_per_kb, fail_rate=http_fail_rate)
+
+    def reset_counters(self):
+        self.db.reset_counters()
+        for fake in (self.auth, self.messaging, self.http):
+            with fake.lock:
+                fake.calls.clear()
+
+    def counters(self):
+        return {
+            "rtdb": dict(self.db.calls),
+            "rtdb_bytes_read": self.db.bytes_read,
+            "auth": dict(self.auth.calls),
+            "fcm": dict(self.messaging.calls),
+            "http": dict(self.http.calls),
+        }
+
+    @contextmanager
+    def installed(self):
+        import firebase_admin
+        import requests
+        from firebase_admin import auth, db, messaging
+        import app as app_pkg
+        import app.firebase as firebase_mod
+        import app.warmup as warmup
+
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch.object(db, "reference", self.db.reference))
+            stack.enter_context(mock.patch.object(auth, "verify_id_token", self.auth.verify_id_token))
+            stack.enter_context(mock.patch.object(auth, "create_user", self.auth.create_user))
+            stack.enter_context(mock.patch.object(auth, "import_users", self.auth.import_users))
+            stack.enter_context(mock.patch.object(auth, "get_users", self.auth.get_users))
+            stack.enter_context(mock.patch.object(auth, "delete_users", self.auth.delete_users))
+            stack.enter_context(mock.patch.object(messaging, "send", self.messaging.send))
+            stack.enter_context(mock.patch.object(requests, "post", self.http.post))
+            stack.enter_context(mock.patch.object(requests.Session, "post", self.http.post))
+            stack.enter_context(mock.patch.object(requests.Session, "head", self.http.head))
+            stack.enter_context(mock.patch.object(app_pkg, "initialize_firebase", lambda: None))
+            stack.enter_context(mock.patch.object(firebase_mod, "initialize_firebase", lambda: None))
+            stack.enter_context(mock.patch.object(warmup, "prefetch_certs", self.auth.fetch_certs))
+            stack.enter_context(mock.patch.dict(firebase_admin._apps, {}))
+            yield self
+
+
+def seed_users(n, venues=2, devices=3, schedules=1, prefix="bench-user"):
+    """Build a ``users`` tree whose ID tokens are ``uid:<uid>`` and Gemini keys ``key-<uid>``."""
+    users = {}
+    for i in range(n):
+        uid = f"{prefix}-{i}"
+        venue_tree = {}
+        schedule_tree = {}
+        for v in range(venues):
+            vname = f"venue{v}"
+            venue_tree[vname] = {"__created": True, **{f"device{d}": "off" for d in range(devices)}}
+            for d in range(min(schedules, devices)):
+                schedule_tree.setdefault(vname, {})[f"device{d}"] = {
+                    "time": "07:30 AM", "action": "on", "status": "enable"
+                }
+        users[uid] = {
+            "email": f"{uid}@example.com",
+            "name": uid,
+            "verifiedAccess": True,
+            "accessKey": "NRM-002-INX",
+            "fcmToken": f"fcm-{uid}",
+            "venues": venue_tree,
+            "schedules": schedule_tree,
+            "secure": {"gemini_key": f"key-{uid}"},
+            "monitoring_venues": {"lab": {"temp": "21", "humidity": "40"}},
+        }
+    return {"users": users}
@@ -0,0 +1,71 @@
+"""Admin dashboard cost: fleet counters read from ``stats/fleet`` vs a full ``users`` scan.
+
+    python -m benchmarks.fleet_stats_bench --sizes 1000,10000,50000
+
+For each fleet size, times fleet_stats.read() (one small node) against
+computing the same counters by walking every user, and reports the RTDB
+reads and bytes each needs. The counters are seeded by reconcile().
+"""
+import argparse
+import logging
+import sys
+import time
+
+from .fakes import FakeFirebase, seed_users
+from .report import print_table, save_result
+
+
+def run_size(n_users, args):
+    fake = FakeFirebase(seed_users(n_users), rtdb_latency=args.rtdb_latency_ms / 1000)
+    with fake.installed():
+        from app import create_app
+        from app.services import fleet_stats, rtdb
+        from app.utils.logger import logger
+
+        logger.setLevel(logging.WARNING)
+        create_app("testing")
+        fleet_stats.reconcile()
+
+        fake.db.reset_counters()
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            fleet_stats.read()
+        read_ms = (time.perf_counter() - start) / args.reads * 1000
+        read_ops, read_bytes = sum(fake.db.calls.values()) / args.reads, fake.db.bytes_read / args.reads
+
+        fake.db.reset_counters()
+        start = time.perf_counter()
+        for _, user in rtdb.iter_children("users"):
+            fleet_stats.user_counts(user)
+        scan_ms = (time.perf_counter() - start) * 1000
+        scan_ops, scan_bytes = sum(fake.db.calls.values()), fake.db.bytes_read
+
+    return {
+        "users": n_users,
+        "stats_read_ms": round(read_ms, 2),
+        "stats_reads": read_ops,
+        "stats_bytes": int(read_bytes),
+        "scan_ms": round(scan_ms, 1),
+        "scan_reads": scan_ops,
+        "scan_bytes": scan_bytes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma-separated user counts")
+    parser.add_argument("--reads", type=int, default=20, help="dashboard loads to average")
+    parser.add_argument("--rtdb-latency-ms", type=float, default=20.0)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = [run_size(int(n), args) for n in args.sizes.split(",")]
+    print_table(rows, list(rows[0]))
+    if not args.no_save:
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        print(f"\nSaved {save_result('fleet_stats', {'config': config, 'sizes': rows})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
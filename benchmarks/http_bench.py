@@ -0,0 +1,165 @@
+"""Drive every /auth/* endpoint of create_app("testing") against faked Firebase.
+
+    python -m benchmarks.http_bench --concurrency 16 --requests 400 --rtdb-latency-ms 30
+    python -m benchmarks.http_bench --compare <previous result file or git revision>
+
+Reports p50/p95/p99 latency, throughput and upstream calls per request for each
+endpoint, and stores the run under benchmarks/results/.
+"""
+import argparse
+import copy
+import itertools
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .fakes import FakeFirebase, seed_users
+from .report import compare_rows, latency_summary, load_result, print_table, save_result
+
+
+def _auth(uid):
+    return {"Authorization": f"Bearer uid:{uid}"}
+
+
+# name -> (method, path, body(i, uid) or None, needs auth)
+SCENARIOS = {
+    "signup": ("POST", "/auth/signup", lambda i, uid: {
+        "email": f"new-{i}@example.com", "password": "secret123", "name": f"New {i}",
+        "accessToken": "NRM-002-INX"}, False),
+    "login": ("POST", "/auth/login", lambda i, uid: {"email": f"{uid}@example.com", "password": "x"}, False),
+    "refresh": ("POST", "/auth/refresh", lambda i, uid: {"refreshToken": f"refresh:{uid}"}, False),
+    "profile": ("GET", "/auth/profile", None, True),
+    "save_fcm_token": ("POST", "/auth/save_fcm_token", lambda i, uid: {"token": f"fcm-{i}"}, True),
+    "add_venue": ("POST", "/auth/add_venue", lambda i, uid: {"venue": f"room{i % 50}"}, True),
+    "add_device": ("POST", "/auth/add_device", lambda i, uid: {
+        "venue": "venue0", "device": f"lamp{i % 50}", "state": "on"}, True),
+    "device_state": ("POST", "/auth/device_state", lambda i, uid: {
+        "venue": "venue0", "device": "device0", "value": "on" if i % 2 else "off"}, True),
+    "delete_venue": ("DELETE", "/auth/delete_venue", lambda i, uid: {"venue": "venue1"}, True),
+    "delete_device": ("DELETE", "/auth/delete_device", lambda i, uid: {"venue": "venue0", "device": "device2"}, True),
+    "set_schedule": ("POST", "/auth/set_schedule", lambda i, uid: {
+        "venue": "venue0", "device": "device1", "time": "06:00 PM", "action": "on"}, True),
+    "get_schedules": ("GET", "/auth/get_schedules", None, True),
+    "delete_schedule": ("DELETE", "/auth/delete_schedule", lambda i, uid: {"venue": "venue0", "device": "device0"}, True),
+    "set_voice_key": ("POST", "/auth/set_voice_key", lambda i, uid: {"apiKey": f"key-{uid}"}, True),
+    "voice_key_exists": ("GET", "/auth/voice_key_exists", None, True),
+    "voice_command": ("POST", "/auth/voice_command", lambda i, uid: {"text": "turn on the light"}, True),
+    "add_monitoring_venue": ("POST", "/auth/add_monitoring_venue", lambda i, uid: {
+        "venue": "garage", "sensors": ["temp", "co2"]}, True),
+    "get_monitoring_data": ("GET", "/auth/get_monitoring_data", None, True),
+    "delete_monitoring_venue": ("DELETE", "/auth/delete_monitoring_venue", lambda i, uid: {"venue": "lab"}, True),
+    "update_schedule_status": ("POST", "/auth/update_schedule_status", lambda i, uid: {
+        "venue": "venue0", "device": "device0", "status": "disable" if i % 2 else "enable"}, True),
+}
+
+
+def run_scenario(app, fake, seed, name, n_requests, concurrency, users):
+    from app.utils.cache import rtdb_cache
+
+    method, path, body, needs_auth = SCENARIOS[name]
+    fake.db.root = copy.deepcopy(seed)
+    rtdb_cache.clear()
+    fake.reset_counters()
+
+    local = threading.local()
+    counter = itertools.count()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(_):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        i = next(counter)
+        uid = users[i % len(users)]
+        kwargs = {"headers": _auth(uid) if needs_auth else {}}
+        if body is not None:
+            kwargs["json"] = body(i, uid)
+        start = time.perf_counter()
+        res = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - wall
+
+    counters = fake.counters()
+    rtdb_calls = sum(counters["rtdb"].values())
+    return {
+        **latency_summary(latencies),
+        "throughput_rps": round(n_requests / wall, 2) if wall else 0.0,
+        "rtdb_calls_per_req": round(rtdb_calls / n_requests, 3),
+        "rtdb_reads_per_req": round((counters["rtdb"].get("get", 0) + counters["rtdb"].get("query", 0)) / n_requests, 3),
+        "auth_calls_per_req": round(sum(counters["auth"].values()) / n_requests, 3),
+        "http_calls_per_req": round(sum(counters["http"].values()) / n_requests, 3),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=50, help="distinct users in the fake tree")
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--rtdb-latency-ms", type=float, default=20.0)
+    parser.add_argument("--auth-latency-ms", type=float, default=5.0)
+    parser.add_argument("--http-latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--compare", help="baseline result file or git revision")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (fraction)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    seed = seed_users(args.users)
+    users = sorted(seed["users"])
+    fake = FakeFirebase(
+        rtdb_latency=args.rtdb_latency_ms / 1000, auth_latency=args.auth_latency_ms / 1000,
+        http_latency=args.http_latency_ms / 1000, jitter=args.jitter_ms / 1000,
+    )
+
+    with fake.installed():
+        from app import create_app
+        from app.utils.logger import logger
+
+        logger.setLevel(logging.WARNING)
+        app = create_app("testing")
+
+        results = {}
+        for name in [n.strip() for n in args.endpoints.split(",") if n.strip()]:
+            if name not in SCENARIOS:
+                parser.error(f"unknown endpoint scenario: {name}")
+            results[name] = run_scenario(app, fake, seed, name, args.requests, args.concurrency, users)
+
+    rows = [{"endpoint": name, **{k: v for k, v in row.items() if k != "statuses"},
+             "statuses": ",".join(f"{k}:{v}" for k, v in row["statuses"].items())}
+            for name, row in results.items()]
+    print_table(rows, ["endpoint", "p50_ms", "p95_ms", "p99_ms", "throughput_rps",
+                       "rtdb_calls_per_req", "rtdb_reads_per_req", "auth_calls_per_req", "statuses"])
+
+    config = {k: v for k, v in vars(args).items() if k not in ("compare", "no_save")}
+    if not args.no_save:
+        print(f"\nSaved {save_result('http', {'config': config, 'endpoints': results})}")
+
+    if args.compare:
+        baseline = load_result(args.compare, "http")["endpoints"]
+        regressions = 0
+        print(f"\nCompared with {args.compare}:")
+        for name, metric, before, after, change, regressed in compare_rows(
+                baseline, results, ["p50_ms", "p95_ms", "p99_ms", "rtdb_calls_per_req"], args.threshold):
+            regressions += regressed
+            flag = "REGRESSION" if regressed else ""
+            print(f"  {name:24} {metric:20} {before:>10} -> {after:<10} {change:+.1%} {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
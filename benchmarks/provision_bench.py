@@ -0,0 +1,68 @@
+"""Onboarding N accounts: one /auth/signup per user vs one /admin/bulk_provision call.
+
+    python -m benchmarks.provision_bench --users 300 --auth-latency-ms 150 --rtdb-latency-ms 40
+
+Reports wall time and upstream calls for each path against faked Firebase.
+Bulk time is dominated by local pbkdf2 hashing (BULK_HASH_ROUNDS).
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from .fakes import FakeFirebase, seed_users
+from .report import print_table, save_result
+
+
+def run(args, mode):
+    fake = FakeFirebase(seed_users(1), rtdb_latency=args.rtdb_latency_ms / 1000,
+                        auth_latency=args.auth_latency_ms / 1000)
+    with fake.installed():
+        from app import create_app
+        from app.services.auth_service import AuthService
+        from app.utils.logger import logger
+
+        logger.setLevel(logging.WARNING)
+        app = create_app("testing")
+        client = app.test_client()
+        key = sorted(AuthService.valid_key_set())[0]
+        users = [{"email": f"{mode}-{i}@example.com", "password": "secret123", "name": f"User {i}",
+                  "accessToken": key} for i in range(args.users)]
+        fake.reset_counters()
+
+        start = time.perf_counter()
+        if mode == "signup":
+            created = sum(client.post("/auth/signup", json=u).status_code == 200 for u in users)
+        else:
+            with client.session_transaction() as session:
+                session["admin_authenticated"] = True
+            response = client.post("/admin/bulk_provision", json={"users": users})
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+            created = lines[-1]["summary"]["created"]
+        elapsed = time.perf_counter() - start
+        counters = fake.counters()
+
+    return {"mode": mode, "users": args.users, "created": created, "wall_s": round(elapsed, 3),
+            "per_user_ms": round(elapsed / args.users * 1000, 2),
+            "auth_calls": sum(counters["auth"].values()), "rtdb_calls": sum(counters["rtdb"].values())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--auth-latency-ms", type=float, default=150.0)
+    parser.add_argument("--rtdb-latency-ms", type=float, default=40.0)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = [run(args, "signup"), run(args, "bulk")]
+    print_table(rows, ["mode", "users", "created", "wall_s", "per_user_ms", "auth_calls", "rtdb_calls"])
+    if not args.no_save:
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        print(f"\nSaved {save_result('provision', {'config': config, 'modes': rows})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Replay captured /auth traffic against create_app("testing") on faked Firebase.
+
+    TRAFFIC_CAPTURE=1 gunicorn -c gunicorn.conf.py wsgi:app   # writes logs/capture/capture-<pid>.ndjson
+    python -m benchmarks.replay logs/capture --speed 1
+    python -m benchmarks.replay logs/capture --speed 0 --compare <previous replay result or git revision>
+
+Requests are re-sent with their captured spacing divided by --speed (1 = real
+time, 10 = ten times faster, 0 = as fast as --concurrency allows). The fake
+users tree is rebuilt from the capture: one user per hashed uid, owning the
+venues and devices its requests name, padded to the captured read sizes.
+Hashed names become stable placeholders, free text a string of the captured
+length, and dropped secrets values the fakes accept.
+
+Reports per-route latency next to what was captured in production and, with
+--compare, flags routes whose replay latency regressed against a previous run.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .fakes import FakeFirebase
+from .report import compare_rows, latency_summary, load_result, print_table, save_result
+
+# Values for fields the capture drops, per route
+SECRETS = {
+    "/auth/signup": lambda uid: {"password": "replay-secret", "accessToken": "NRM-002-INX"},
+    "/auth/login": lambda uid: {"password": "replay-secret"},
+    "/auth/refresh": lambda uid: {"refreshToken": f"refresh:{uid or 'replay'}"},
+    "/auth/set_voice_key": lambda uid: {"apiKey": f"key-{uid}"},
+    "/auth/save_fcm_token": lambda uid: {"token": f"fcm-{uid}"},
+}
+
+PREFIXES = {"venue": "v", "device": "d", "name": "n", "sensors": "s"}
+
+
+def load_capture(paths, limit=None):
+    """Captured entries from files or directories (rotated files included), oldest first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "capture-*.ndjson*"))))
+        else:
+            files.append(path)
+    entries = []
+    for name in files:
+        with open(name) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("route") and entry.get("method"):
+                    entries.append(entry)
+    entries.sort(key=lambda e: e.get("ts", 0))
+    return entries[:limit] if limit else entries
+
+
+def replay_uid(hashed):
+    return f"r-{hashed}" if hashed else None
+
+
+def placeholder(value, field):
+    """A concrete value for a sanitized one (``{"$id": h}`` / ``{"$str": n}``)."""
+    if isinstance(value, dict) and "$id" in value:
+        h = value["$id"][:8]
+        return f"{h}@replay.test" if field == "email" else f"{PREFIXES.get(field, 'x')}-{h}"
+    if isinstance(value, dict) and "$str" in value:
+        return "x" * value["$str"]
+    if isinstance(value, dict):
+        return {k: placeholder(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [placeholder(v, field) for v in value]
+    return value
+
+
+def voice_text(catalog, length):
+    """An utterance naming one of the user's devices, padded to the captured length."""
+    venue = next(iter(catalog), "venue0")
+    device = next((d for d in catalog.get(venue, {}) if d != "__created"), "device0")
+    text = f"turn on {device} in {venue}"
+    return (text + " please" * max(0, (length - len(text)) // 7))[:max(length, len(text))]
+
+
+def build_tree(entries):
+    """Fake ``users`` tree owning every venue/device the captured requests touch."""
+    users = {}
+    read_bytes = defaultdict(int)
+    for entry in entries:
+        uid = replay_uid(entry.get("uid"))
+        if not uid:
+            continue
+        user = users.setdefault(uid, {
+            "email": f"{uid}@replay.test", "name": uid, "verifiedAccess": True, "accessKey": "NRM-002-INX",
+            "fcmToken": f"fcm-{uid}", "secure": {"gemini_key": f"key-{uid}"}, "venues": {},
+        })
+        body = placeholder(entry.get("body") or {}, None)
+        venue, device = body.get("venue"), body.get("device")
+        if isinstance(venue, str):
+            devices = user["venues"].setdefault(venue, {"__created": True})
+            if isinstance(device, str):
+                devices.setdefault(device, "off")
+        for op in entry.get("rtdb") or ():
+            if op["op"] == "get" and op["shape"] in ("users/{uid}", "users/{uid}/venues"):
+                read_bytes[uid] = max(read_bytes[uid], op["bytes"])
+
+    for uid, user in users.items():
+        venues = user["venues"]
+        if not venues:
+            venues["venue0"] = {"__created": True, "device0": "off", "device1": "off", "device2": "off"}
+        # Pad with filler devices up to the largest venues read seen for this user
+        first = next(iter(venues.values()))
+        size = len(json.dumps(venues, separators=(",", ":")))
+        n = 0
+        while size < read_bytes[uid]:
+            first[f"f-{n}"] = "off"
+            size += len(f'"f-{n}":"off",')
+            n += 1
+    return {"users": users}
+
+
+def request_for(entry, tree):
+    uid = replay_uid(entry.get("uid"))
+    body = entry.get("body")
+    if body is not None:
+        raw_text = body.get("text") if isinstance(body, dict) else None
+        body = placeholder(body, None)
+        if isinstance(raw_text, dict) and "$str" in raw_text:
+            catalog = (tree["users"].get(uid) or {}).get("venues", {})
+            body["text"] = voice_text(catalog, raw_text["$str"])
+    if entry["route"] in SECRETS:
+        body = {**(body or {}), **SECRETS[entry["route"]](uid)}
+    headers = {"Authorization": f"Bearer uid:{uid}"} if uid else {}
+    return entry["method"], entry["route"], body, headers
+
+
+def replay(app, entries, tree, speed, concurrency):
+    """Send every entry; returns ``{route: [(latency, status), ...]}`` and the dispatch lag."""
+    local = threading.local()
+    results = defaultdict(list)
+    lock = threading.Lock()
+    lags = []
+
+    def one(entry):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        method, path, body, headers = request_for(entry, tree)
+        start = time.perf_counter()
+        res = client.open(path, method=method, json=body, headers=headers)
+        elapsed = time.perf_counter() - start
+        with lock:
+            results[entry["route"]].append((elapsed, res.status_code))
+
+    t0 = entries[0].get("ts", 0) if entries else 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            if speed > 0:
+                due = started + (entry.get("ts", t0) - t0) / speed
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                lags.append(max(0.0, -wait))
+            pool.submit(one, entry)
+    return results, time.perf_counter() - started, lags
+
+
+def summarize(entries, results):
+    captured = defaultdict(list)
+    for entry in entries:
+        captured[entry["route"]].append(entry)
+    rows = {}
+    for route in sorted(results):
+        replayed = results[route]
+        before = captured[route]
+        ours = latency_summary([lat for lat, _ in replayed])
+        theirs = latency_summary([e["ms"] / 1000 for e in before])
+        expected = sorted(e["status"] for e in before)
+        got = sorted(status for _, status in replayed)
+        rows[route] = {
+            "requests": len(replayed),
+            "captured_p50_ms": theirs["p50_ms"],
+            "captured_p95_ms": theirs["p95_ms"],
+            "p50_ms": ours["p50_ms"],
+            "p95_ms": ours["p95_ms"],
+            "p99_ms": ours["p99_ms"],
+            "status_diffs": sum(a != b for a, b in zip(expected, got)),
+        }
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="capture files or directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 10 = 10x faster, 0 = unbounded")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--rtdb-latency-ms", type=float,
+                        help="fake RTDB latency (default: median of the captured uncached RTDB ops)")
+    parser.add_argument("--auth-latency-ms", type=float, default=5.0)
+    parser.add_argument("--http-latency-ms", type=float, default=150.0)
+    parser.add_argument("--compare", help="baseline replay result file or git revision")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (fraction)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    entries = load_capture(args.paths, args.limit)
+    if not entries:
+        parser.error("no captured requests found")
+    if args.rtdb_latency_ms is None:
+        op_ms = [op["ms"] for e in entries for op in e.get("rtdb") or () if not op["cached"]]
+        args.rtdb_latency_ms = round(statistics.median(op_ms), 3) if op_ms else 20.0
+
+    tree = build_tree(entries)
+    fake = FakeFirebase(tree, rtdb_latency=args.rtdb_latency_ms / 1000, auth_latency=args.auth_latency_ms / 1000,
+                        http_latency=args.http_latency_ms / 1000)
+    with fake.installed():
+        from app import create_app
+        from app.utils.logger import logger
+
+        logger.setLevel(logging.WARNING)
+        app = create_app("testing")
+        results, wall, lags = replay(app, entries, tree, args.speed, args.concurrency)
+
+    routes = summarize(entries, results)
+    print(f"Replayed {len(entries)} requests from {len(tree['users'])} users in {wall:.1f}s "
+          f"(speed {args.speed or 'unbounded'}, RTDB {args.rtdb_latency_ms} ms"
+          + (f", max dispatch lag {max(lags) * 1000:.0f} ms)" if lags else ")"))
+    print_table([{"route": r, **row} for r, row in routes.items()],
+                ["route", "requests", "captured_p50_ms", "captured_p95_ms", "p50_ms", "p95_ms", "status_diffs"])
+
+    config = {k: v for k, v in vars(args).items() if k not in ("compare", "no_save")}
+    if not args.no_save:
+        print(f"\nSaved {save_result('replay', {'config': config, 'routes': routes})}")
+
+    if args.compare:
+        baseline = load_result(args.compare, "replay")["routes"]
+        regressions = 0
+        print(f"\nCompared with {args.compare}:")
+        for name, metric, before, after, change, regressed in compare_rows(
+                baseline, routes, ["p50_ms", "p95_ms", "p99_ms"], args.threshold):
+            regressions += regressed
+            flag = "REGRESSION" if regressed else ""
+            print(f"  {name:32} {metric:8} {before:>10} -> {after:<10} {change:+.1%} {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Result storage and comparison shared by the benchmark scripts.
+
+Each run is written to ``benchmarks/results/<kind>-<timestamp>.json`` and a
+one-line summary is appended to ``benchmarks/results/history.jsonl`` tagged with
+the git revision, so runs can be compared across commits.
+"""
+import json
+import math
+import os
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(samples):
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, timeout=10,
+        )
+        rev = out.stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip()
+        return f"{rev}-dirty" if rev and dirty else (rev or "unknown")
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def save_result(kind, result, results_dir=RESULTS_DIR):
+    """Persist a run and return the path it was written to."""
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    result = {"kind": kind, "revision": git_revision(), "timestamp": stamp, **result}
+    path = os.path.join(results_dir, f"{kind}-{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    with open(os.path.join(results_dir, "history.jsonl"), "a") as f:
+        f.write(json.dumps({"kind": kind, "revision": result["revision"],
+                            "timestamp": stamp, "file": os.path.basename(path)}) + "\n")
+    return path
+
+
+def load_result(path_or_revision, kind, results_dir=RESULTS_DIR):
+    """Load a saved run by file path, or the latest run of ``kind`` for a git revision."""
+    if os.path.exists(path_or_revision):
+        with open(path_or_revision) as f:
+            return json.load(f)
+    history = os.path.join(results_dir, "history.jsonl")
+    match = None
+    if os.path.exists(history):
+        with open(history) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["kind"] == kind and entry["revision"].startswith(path_or_revision):
+                    match = entry
+    if not match:
+        raise FileNotFoundError(f"No {kind} result for {path_or_revision}")
+    with open(os.path.join(results_dir, match["file"])) as f:
+        return json.load(f)
+
+
+def compare_rows(baseline, current, metrics, threshold=0.10):
+    """Yield (name, metric, before, after, change, regressed) for rows present in both runs."""
+    for name, row in current.items():
+        before_row = baseline.get(name)
+        if not before_row:
+            continue
+        for metric in metrics:
+            before, after = before_row.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            yield name, metric, before, after, change, change > threshold
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
@@ -0,0 +1,111 @@
+"""Time one scheduler tick over synthetic user trees.
+
+    python -m benchmarks.scheduler_bench --sizes 1000,10000,100000 --fault-ratio 0.05
+
+For each size reports tick wall time, peak traced allocations and RTDB/FCM call
+counts, and whether the tick still fits the scheduler's 5 s cadence.
+"""
+import argparse
+import logging
+import sys
+import time
+import tracemalloc
+
+from .fakes import FakeFirebase
+from .report import load_result, print_table, save_result
+from .synthetic import synthetic_users
+
+NOW = "07:30 AM"
+
+
+def run_size(n_users, args):
+    from app.utils.cache import rtdb_cache
+    from app.services.faults import fault_aggregator
+    import scheduler
+
+    def fresh_fake():
+        tree = synthetic_users(n_users, venues=args.venues, devices=args.devices, schedules=args.schedules,
+                               fault_ratio=args.fault_ratio, due_ratio=args.due_ratio, now=NOW)
+        return FakeFirebase(tree, rtdb_latency=args.rtdb_latency_ms / 1000, fcm_latency=args.fcm_latency_ms / 1000)
+
+    # Timed run and traced run use separate identical trees: tracemalloc slows the tick severalfold
+    fake = fresh_fake()
+    with fake.installed():
+        rtdb_cache.clear()
+        fault_aggregator.reset()
+        start = time.perf_counter()
+        stats = scheduler.run_tick(now=NOW)
+        wall = time.perf_counter() - start
+        counters = fake.counters()
+        # Steady state: same tree one tick later, faults already notified
+        fake.reset_counters()
+        start = time.perf_counter()
+        scheduler.run_tick(now="11:59 PM")
+        steady_wall = time.perf_counter() - start
+        steady_counters = fake.counters()
+
+    peak = 0
+    if not args.no_alloc:
+        with fresh_fake().installed():
+            rtdb_cache.clear()
+            fault_aggregator.reset()
+            tracemalloc.start()
+            scheduler.run_tick(now=NOW)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return {
+        "users": n_users,
+        "tick_s": round(wall, 4),
+        "peak_alloc_mb": round(peak / 1024 / 1024, 2),
+        "rtdb_reads": counters["rtdb"].get("get", 0) + counters["rtdb"].get("query", 0),
+        "rtdb_writes": sum(v for k, v in counters["rtdb"].items() if k not in ("get", "query")),
+        "rtdb_mb_read": round(counters["rtdb_bytes_read"] / 1024 / 1024, 2),
+        "fcm_sends": counters["fcm"].get("send", 0),
+        "schedules_fired": stats["schedules_fired"],
+        "fault_notifications": stats["fault_notifications"],
+        "steady_tick_s": round(steady_wall, 4),
+        "steady_rtdb_ops": sum(steady_counters["rtdb"].values()),
+        "steady_fcm_sends": steady_counters["fcm"].get("send", 0),
+        "fits_cadence": wall < args.cadence,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--venues", type=int, default=2)
+    parser.add_argument("--devices", type=int, default=3)
+    parser.add_argument("--schedules", type=int, default=2)
+    parser.add_argument("--fault-ratio", type=float, default=0.05)
+    parser.add_argument("--due-ratio", type=float, default=0.01)
+    parser.add_argument("--rtdb-latency-ms", type=float, default=0.0)
+    parser.add_argument("--fcm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--cadence", type=float, default=5.0)
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--compare", help="baseline result file or git revision")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    from app.utils.logger import logger
+    logger.setLevel(logging.WARNING)
+
+    rows = [run_size(int(n), args) for n in args.sizes.split(",") if n.strip()]
+    print_table(rows, list(rows[0]))
+
+    config = {k: v for k, v in vars(args).items() if k not in ("compare", "no_save")}
+    if not args.no_save:
+        print(f"\nSaved {save_result('scheduler', {'config': config, 'sizes': rows})}")
+
+    if args.compare:
+        baseline = {row["users"]: row for row in load_result(args.compare, "scheduler")["sizes"]}
+        print(f"\nCompared with {args.compare}:")
+        for row in rows:
+            before = baseline.get(row["users"])
+            if before:
+                print(f"  {row['users']:>8} users: tick {before['tick_s']}s -> {row['tick_s']}s, "
+                      f"peak {before['peak_alloc_mb']}MB -> {row['peak_alloc_mb']}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""WSGI and ASGI entry points backed by faked Firebase, for server benchmarks.
+
+    gunicorn -w 2 benchmarks.serve_fake:wsgi_app
+    uvicorn benchmarks.serve_fake:asgi_app
+
+Latencies come from BENCH_RTDB_MS, BENCH_AUTH_MS, BENCH_HTTP_MS and
+BENCH_USERS (seeded users, tokens ``uid:bench-user-<n>``). The fakes stay
+installed for the life of the process.
+"""
+import logging
+import os
+
+from .fakes import FakeFirebase, seed_users
+
+fake = FakeFirebase(
+    seed_users(int(os.getenv("BENCH_USERS", "50"))),
+    rtdb_latency=float(os.getenv("BENCH_RTDB_MS", "20")) / 1000,
+    auth_latency=float(os.getenv("BENCH_AUTH_MS", "5")) / 1000,
+    http_latency=float(os.getenv("BENCH_HTTP_MS", "80")) / 1000,
+)
+_installed = fake.installed()
+_installed.__enter__()
+
+from app.utils.logger import logger  # noqa: E402
+
+logger.setLevel(logging.WARNING)
+
+if os.getenv("BENCH_SERVER", "wsgi") == "asgi":
+    from app.asgi import create_asgi_app
+
+    asgi_app = create_asgi_app("testing")
+else:
+    from app import create_app
+
+    wsgi_app = create_app("testing")
@@ -0,0 +1,41 @@
+"""Synthetic ``users`` trees shaped like production data, for scheduler benchmarks."""
+import random
+
+
+def synthetic_users(n_users, venues=2, devices=3, schedules=2, fault_ratio=0.05,
+                    due_ratio=0.1, now="07:30 AM", seed=1234):
+    """Return ``{"users": {...}}`` with ``n_users`` users.
+
+    Each user has ``venues`` venues of ``devices`` devices and up to
+    ``schedules`` schedules per venue. ``fault_ratio`` of users carry a
+    ``faults`` entry on one venue, and ``due_ratio`` of schedules are enabled
+    for ``now`` so a tick at that time fires them.
+    """
+    rng = random.Random(seed)
+    users = {}
+    for i in range(n_users):
+        uid = f"user{i:07d}"
+        venue_tree = {}
+        schedule_tree = {}
+        for v in range(venues):
+            vname = f"venue{v}"
+            venue_tree[vname] = {"__created": True,
+                                 **{f"device{d}": rng.choice(("on", "off", "3")) for d in range(devices)}}
+            for d in range(min(schedules, devices)):
+                due = rng.random() < due_ratio
+                schedule_tree.setdefault(vname, {})[f"device{d}"] = {
+                    "time": now if due else "11:45 PM",
+                    "action": rng.choice(("on", "off")),
+                    "status": "enable" if due or rng.random() < 0.5 else "disable",
+                }
+        if rng.random() < fault_ratio:
+            venue_tree[f"venue{rng.randrange(venues)}"]["faults"] = "Overcurrent detected on device0"
+        users[uid] = {
+            "email": f"{uid}@example.com",
+            "name": uid,
+            "verifiedAccess": True,
+            "fcmToken": f"fcm-{uid}",
+            "venues": venue_tree,
+            "schedules": schedule_tree,
+        }
+    return {"users": users}
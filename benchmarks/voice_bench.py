@@ -0,0 +1,109 @@
+"""Gemini prompt size and /auth/voice_command latency as the device catalog grows.
+
+    python -m benchmarks.voice_bench --sizes 2x3,10x10,40x25 --gemini-ms-per-kb 40
+
+For each ``venues x devices`` catalog, one user issues commands naming a
+single device against faked Firebase whose Gemini latency grows with prompt
+size (``--gemini-ms-per-kb``). Reports the prompt the app sends next to the
+legacy ``json.dumps`` encoding of the same catalog.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+
+from .fakes import FakeFirebase
+from .report import latency_summary, print_table, save_result
+
+UID = "voice-user"
+
+
+def legacy_prompt_bytes(venues, text):
+    """Size of the pre-compaction prompt: full venue list plus json.dumps of every device list."""
+    names = list(venues)
+    devices_map = {v: [d for d in venues[v] if d not in ("__created", "faults")] for v in names}
+    return len(f"""
+Allowed Venues: {json.dumps(names)}
+Allowed Devices: {json.dumps(devices_map)}
+
+Convert this command into JSON:
+{{"venue":"...", "device":"...", "value":"..."}}
+
+Rules:
+- Only use existing venue and device names
+- Value must be "on", "off", or 1-5
+- Support Tamil/English natural language
+- Support ALL venue and ALL device handling
+- If unknown, return null JSON
+User command: "{text}"
+Return STRICT JSON only.
+""".encode("utf-8"))
+
+
+def catalog_tree(n_venues, n_devices):
+    return {f"Room {v}": {"__created": True, **{f"Device {v}-{d}": "off" for d in range(n_devices)}}
+            for v in range(n_venues)}
+
+
+def run_size(n_venues, n_devices, args):
+    from app.services.voice_prompt import build_prompt, device_catalog, select_relevant
+
+    venues = catalog_tree(n_venues, n_devices)
+    tree = {"users": {UID: {"email": f"{UID}@example.com", "verifiedAccess": True,
+                            "secure": {"gemini_key": f"key-{UID}"}, "venues": venues}}}
+    fake = FakeFirebase(tree, rtdb_latency=args.rtdb_latency_ms / 1000, http_latency=args.http_latency_ms / 1000,
+                        gemini_per_kb=args.gemini_ms_per_kb / 1000)
+    texts = [f"turn on device {v}-{v % n_devices} in room {v}" for v in range(min(n_venues, args.requests))]
+    with fake.installed():
+        from app import create_app
+        from app.utils.logger import logger
+
+        logger.setLevel(logging.WARNING)
+        client = create_app("testing").test_client()
+        samples, ok = [], 0
+        for i in range(args.requests):
+            text = texts[i % len(texts)]
+            start = time.perf_counter()
+            r = client.post("/auth/voice_command", json={"text": text}, headers={"Authorization": f"Bearer uid:{UID}"})
+            samples.append(time.perf_counter() - start)
+            ok += r.status_code == 200
+
+    catalog = device_catalog(venues)
+    selected, trimmed = select_relevant(catalog, texts[0])
+    summary = latency_summary(samples)
+    return {
+        "catalog": f"{n_venues}x{n_devices}",
+        "devices": n_venues * n_devices,
+        "legacy_prompt_bytes": legacy_prompt_bytes(venues, texts[0]),
+        "prompt_bytes": len(build_prompt(selected, texts[0]).encode("utf-8")),
+        "selected": trimmed,
+        "ok": ok,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="2x3,10x10,40x25", help="comma-separated VENUESxDEVICES")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--rtdb-latency-ms", type=float, default=20.0)
+    parser.add_argument("--http-latency-ms", type=float, default=150.0)
+    parser.add_argument("--gemini-ms-per-kb", type=float, default=40.0)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes.split(","):
+        n_venues, n_devices = (int(x) for x in size.lower().split("x"))
+        rows.append(run_size(n_venues, n_devices, args))
+    print_table(rows, list(rows[0]))
+    if not args.no_save:
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        print(f"\nSaved {save_result('voice', {'config': config, 'catalogs': rows})}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
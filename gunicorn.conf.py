@@ -0,0 +1,34 @@
+import os
+
+# Load the app (imports, Firebase init, token-cert prefetch) once in the master
+# before forking, so workers are ready as soon as they accept traffic.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+if preload_app:
+    os.environ["GUNICORN_PRELOAD"] = "1"
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# One worker unless WEB_CONCURRENCY is set; more workers also want METRICS_DIR
+# and RTDB_CACHE_CHANNEL so metrics and cache invalidations are shared
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Threaded workers: requests blocked on RTDB/Google APIs don't hold the whole
+# worker, and concurrent identical reads can share one upstream call
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+
+def post_fork(server, worker):
+    from app.warmup import reset_connections_after_fork, startup_timer, open_upstream_connections
+    from app.utils.logger import logger
+
+    # Without preload the worker loads the app (and warms up) itself after this hook
+    if not server.cfg.preload_app:
+        return
+    # Pooled sockets opened in the master must not be shared between workers
+    reset_connections_after_fork()
+    if os.getenv("WARMUP", "1") == "1":
+        try:
+            with startup_timer.phase("worker_connections"):
+                open_upstream_connections()
+        except Exception as e:
+            logger.warning("Worker %s warmup failed: %s", worker.pid, e)
+    logger.info("Worker %s ready: %s", worker.pid, startup_timer.report())
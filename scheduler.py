@@ -1,67 +1,147 @@
 import os
 import time
 from datetime import datetime
-from firebase_admin import db
+from app.services import rtdb, fleet_stats
+from app.services.faults import fault_aggregator
 from app.services.msg import send_notification
+from app.utils.logger import logger
+from app.utils.metrics import metrics
 
-def run_scheduler():
+TICK_INTERVAL = 5
+
+
+def run_tick(users=None, now=None):
+    """Run one scheduler pass over every user and return what it did.
+
+    ``users`` defaults to walking the ``users`` node page by page (memory
+    stays bounded by the page size) and ``now`` to the current "HH:MM AM"
+    time, so a tick can be replayed against fixed data.
+    """
+    now = now or datetime.now().strftime("%I:%M %p")
+    user_items = users.items() if users is not None else rtdb.iter_children("users")
+
+    stats = {"users": 0, "schedules_fired": 0, "fault_notifications": 0, "faults": 0}
+    tracked = fault_aggregator.known_users()
+    still_present = set()
+
+    for uid, user_data in user_items:
+        stats["users"] += 1
+        if uid in tracked:
+            still_present.add(uid)
+        schedules = user_data.get("schedules", {})
+
+        # ---- Schedule trigger (modified with one-time logic) ----
+        for venue, schedule_devices in schedules.items():
+            for device, sch in schedule_devices.items():
+
+                if sch.get("status") == "enable" and sch.get("time") == now:
+                    action = sch.get("action")
+
+                    last_sent = sch.get("lastNotified")
+                    current_ts = int(time.time())
+
+                    # send only once per hour
+                    if not last_sent or current_ts - int(last_sent) >= 3600:
+
+                        # Perform device state update
+                        rtdb.set(f"users/{uid}/venues/{venue}/{device}", action)
+
+                        # Send schedule completed notification
+                        send_notification(uid, "Schedule Completed ⏱️",
+                                          f"{device} in {venue} set to {action}")
+
+                        # Save timestamp to schedule entry
+                        rtdb.update(f"users/{uid}/schedules/{venue}/{device}", {
+                            "lastNotified": current_ts
+                        })
+                        stats["schedules_fired"] += 1
+                    # else:
+                    #     pass # Cooldown active
+
+        # ---- Fault tracking: diffed against what the user was already told ----
+        stats["faults"] += fault_aggregator.observe(uid, user_data)
+
+    fault_aggregator.forget(tracked - still_present)
+    if users is None:
+        # A full pass saw every fault: keep the fleet counter in step (written only on change)
+        fleet_stats.record_faults(stats["faults"])
+
+    # ---- Fault digests: at most one per user per cooldown, covering every venue ----
+    for uid, title, body, updates in fault_aggregator.digests(int(time.time())):
+        if title:
+            send_notification(uid, title, body)
+            stats["fault_notifications"] += 1
+        rtdb.update(f"users/{uid}", updates)
+
+    return stats
+
+
+def _profiled(tick, tick_no):
+    """Run ``tick`` under cProfile or tracemalloc when SCHEDULER_PROFILE asks for it.
+
+    SCHEDULER_PROFILE=cprofile|tracemalloc enables the hook and
+    SCHEDULER_PROFILE_EVERY=N (default 1) limits it to every Nth tick.
+    cProfile stats are dumped to logs/scheduler-tick-<n>.prof.
+    """
+    mode = os.getenv("SCHEDULER_PROFILE", "").lower()
+    every = max(1, int(os.getenv("SCHEDULER_PROFILE_EVERY", "1")))
+    if mode not in ("cprofile", "tracemalloc") or tick_no % every:
+        return tick()
+
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        result = profiler.runcall(tick)
+        os.makedirs("logs", exist_ok=True)
+        out = os.path.join("logs", f"scheduler-tick-{tick_no}.prof")
+        profiler.dump_stats(out)
+        logger.info("Scheduler tick %s profile written to %s", tick_no, out)
+        return result
+
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        result = tick()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    top = "; ".join(str(s) for s in snapshot.statistics("lineno")[:5])
+    logger.info("Scheduler tick %s peak memory %.0f KiB; top: %s", tick_no, peak / 1024, top)
+    return result
+
+
+def run_scheduler(interval=TICK_INTERVAL):
+    fleet_stats.start_reconciler()
+    tick_no = 0
+    due = time.monotonic()
     while True:
-        now = datetime.now().strftime("%I:%M %p")
-        users_ref = db.reference("users")
-        users = users_ref.get() or {}
-
-        for uid, user_data in users.items():
-            schedules = user_data.get("schedules", {})
-            venues = user_data.get("venues", {})
-
-            # ---- Schedule trigger (modified with one-time logic) ----
-            for venue, schedule_devices in schedules.items():
-                for device, sch in schedule_devices.items():
-
-                    if sch.get("status") == "enable" and sch.get("time") == now:
-                        action = sch.get("action")
-
-                        last_sent = sch.get("lastNotified")
-                        current_ts = int(time.time())
-
-                        # send only once per hour
-                        if not last_sent or current_ts - int(last_sent) >= 3600:
-
-                            # Perform device state update
-                            db.reference(f"users/{uid}/venues/{venue}/{device}").set(action)
-
-                            # Send schedule completed notification
-                            send_notification(uid, "Schedule Completed ⏱️",
-                                              f"{device} in {venue} set to {action}")
-
-                            # Save timestamp to schedule entry
-                            db.reference(f"users/{uid}/schedules/{venue}/{device}").update({
-                                "lastNotified": current_ts
-                            })
-                        # else:
-                        #     pass # Cooldown active
-
-            # ---- Fault Notification (once per hour only) ----
-            faults = ""
-            fault_venue = None
-
-            for vname, vdata in venues.items():
-                if isinstance(vdata, dict) and "faults" in vdata:
-                    faults = vdata["faults"]
-                    fault_venue = vname
-                    break
-
-            if faults:
-                user_ref = db.reference(f"users/{uid}")
-                last_sent = user_ref.child("lastFaultNotification").get()
-                current_ts = int(time.time())
-
-                # Send only once per hour
-                if not last_sent or current_ts - last_sent >= 3600:
-                    send_notification(uid, "Fault Detected ⚠️", faults)
-                    # Save timestamp
-                    user_ref.update({"lastFaultNotification": current_ts})
-                # else:
-                #     pass # Cooldown active
-
-        time.sleep(5)
+        tick_no += 1
+        started = time.monotonic()
+        # Lag: how far behind the intended cadence this tick starts
+        metrics.set_gauge("scheduler_tick_lag_seconds", max(0.0, started - due))
+        try:
+            stats = _profiled(run_tick, tick_no)
+        except Exception as e:
+            logger.error("Scheduler tick failed: %s", e)
+            metrics.inc("scheduler_ticks_total", {"result": "error"})
+        else:
+            elapsed = time.monotonic() - started
+            metrics.observe("scheduler_tick_duration_seconds", elapsed)
+            metrics.inc("scheduler_ticks_total", {"result": "ok"})
+            if elapsed > interval:
+                logger.warning("Scheduler tick took %.2fs (> %ss cadence): %s", elapsed, interval, stats)
+        metrics.flush()
+
+        due = started + interval
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from app.firebase import initialize_firebase
+    initialize_firebase()
+    metrics.role = "scheduler"
+    run_scheduler()
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+
+from benchmarks.fakes import FakeFirebase, seed_users
+
+# ID token of the first seeded user (the fake accepts "uid:<uid>")
+HEADERS = {"Authorization": "Bearer uid:bench-user-0"}
+
+
+@pytest.fixture(scope="session")
+def fake():
+    fake = FakeFirebase()
+    with fake.installed():
+        yield fake
+
+
+@pytest.fixture(scope="session")
+def app(fake):
+    from app import create_app
+    from app.utils.logger import logger
+
+    logger.setLevel(logging.CRITICAL)
+    return create_app("testing")
+
+
+def reset(fake):
+    """Reset the fake to two seeded users and empty every shared cache and store."""
+    from app.utils.cache import rtdb_cache
+    from app.utils.idempotency import idempotency_store
+    from app.utils.ratelimit import rate_limiter
+
+    fake.db.root = seed_users(2)
+    fake.auth.users = {u["email"]: uid for uid, u in fake.db.root["users"].items()}
+    fake.auth._next_uid = 0
+    fake.reset_counters()
+    rtdb_cache.clear()
+    idempotency_store.clear()
+    rate_limiter.store.clear()
+
+
+@pytest.fixture
+def firebase(fake, app):
+    from app.utils import deadline
+
+    reset(fake)
+    budgets = dict(deadline.BUDGETS)
+    yield fake
+    deadline.BUDGETS.clear()
+    deadline.BUDGETS.update(budgets)
+
+
+@pytest.fixture
+def client(app, firebase):
+    return app.test_client()
+
+
+
+@pytest.fixture(scope="session")
+def asgi_app(fake):
+    from app.asgi import create_asgi_app
+
+    return create_asgi_app("testing")
+
+
+@pytest.fixture
+def asgi_client(asgi_app, firebase):
+    from starlette.testclient import TestClient
+
+    with TestClient(asgi_app) as client:
+        yield client
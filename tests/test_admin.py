@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def admin(client):
+    with client.session_transaction() as session:
+        session["admin_authenticated"] = True
+    return client
+
+
+def export(client, query=""):
+    res = client.get(f"/admin/export_users{query}")
+    return res, [json.loads(line) for line in res.data.splitlines()] if res.status_code == 200 else None
+
+
+def test_export_requires_a_session(client):
+    assert client.get("/admin/export_users").status_code == 401
+
+
+def test_export_streams_every_user_without_secrets(admin, firebase):
+    firebase.db.root["users"].update({f"extra-{i}": {"email": f"e{i}@example.com"} for i in range(5)})
+    res, lines = export(admin, "?page_size=2")
+    assert res.mimetype == "application/x-ndjson"
+    assert len(lines) == 7
+    assert all("secure" not in json.dumps(line) for line in lines)
+
+
+def test_export_limits_fields(admin):
+    _, lines = export(admin, "?fields=email,secure")
+    assert all(set(line) <= {"uid", "email"} for line in lines)
+
+
+@pytest.mark.parametrize("page_size", ["0", "-1", "abc", "1001"])
+def test_export_rejects_bad_page_sizes(admin, page_size):
+    assert export(admin, f"?page_size={page_size}")[0].status_code == 400
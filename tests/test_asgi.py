@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import HEADERS, reset
+
+OTHER = {"Authorization": "Bearer uid:bench-user-1"}
+UNVERIFIED = {"Authorization": "Bearer uid:unverified"}
+
+# (method, path, json body, headers): every /auth route, plus its common failures
+CASES = [
+    ("POST", "/auth/signup", {"email": "new@example.com", "password": "secret123", "name": "N",
+                              "accessToken": "PRO-001-INX"}, {}),
+    ("POST", "/auth/signup", {"email": "new@example.com", "password": "secret123", "accessToken": "NOPE"}, {}),
+    ("POST", "/auth/login", {"email": "bench-user-0@example.com", "password": "secret123"}, {}),
+    ("POST", "/auth/refresh", {"refreshToken": "refresh:bench-user-0"}, {}),
+    ("GET", "/auth/profile", None, HEADERS),
+    ("GET", "/auth/profile", None, {}),
+    ("GET", "/auth/profile", None, {"Authorization": "Bearer nonsense"}),
+    ("GET", "/auth/profile", None, UNVERIFIED),
+    ("POST", "/auth/save_fcm_token", {"token": "fcm-new"}, HEADERS),
+    ("POST", "/auth/save_fcm_token", {}, HEADERS),
+    ("POST", "/auth/add_venue", {"venue": "garage"}, HEADERS),
+    ("POST", "/auth/add_venue", {}, HEADERS),
+    ("POST", "/auth/add_device", {"venue": "venue0", "device": "lamp"}, HEADERS),
+    ("POST", "/auth/add_device", {"venue": "nowhere", "device": "lamp"}, HEADERS),
+    ("POST", "/auth/device_state", {"venue": "venue0", "device": "device1", "value": "on"}, HEADERS),
+    ("POST", "/auth/device_state", {"venue": "venue0", "device": "device1", "value": "on"},
+     {**OTHER, "Idempotency-Key": "k1"}),
+    ("DELETE", "/auth/delete_venue", {"venue": "venue1"}, HEADERS),
+    ("DELETE", "/auth/delete_device", {"venue": "venue0", "device": "device2"}, HEADERS),
+    ("POST", "/auth/set_schedule", {"venue": "venue0", "device": "device1", "time": "09:00 PM",
+                                    "action": "off"}, HEADERS),
+    ("GET", "/auth/get_schedules", None, HEADERS),
+    ("DELETE", "/auth/delete_schedule", {"venue": "venue0", "device": "device0"}, HEADERS),
+    ("POST", "/auth/set_voice_key", {"apiKey": "key-bench-user-0"}, HEADERS),
+    ("GET", "/auth/voice_key_exists", None, HEADERS),
+    ("POST", "/auth/voice_command", {"text": "turn off device1 in venue0"}, HEADERS),
+    ("POST", "/auth/voice_command", {}, HEADERS),
+    ("POST", "/auth/add_monitoring_venue", {"venue": "lab2", "sensors": ["temp"]}, HEADERS),
+    ("POST", "/auth/add_monitoring_venue", {"venue": "lab2", "sensors": []}, HEADERS),
+    ("GET", "/auth/get_monitoring_data", None, HEADERS),
+    ("DELETE", "/auth/delete_monitoring_venue", {"venue": "lab"}, HEADERS),
+    ("POST", "/auth/update_schedule_status", {"venue": "venue0", "device": "device0", "status": "disable"}, HEADERS),
+    ("POST", "/auth/update_schedule_status", {"venue": "venue0", "device": "device0", "status": "maybe"}, HEADERS),
+    ("GET", "/auth/no_such_route", None, HEADERS),
+]
+
+
+@pytest.mark.parametrize("method, path, body, headers", CASES, ids=[f"{m} {p}" for m, p, *_ in CASES])
+def test_asgi_matches_flask(client, asgi_client, fake, method, path, body, headers):
+    """Same status, body and resulting RTDB tree from both servers, each starting from fresh data."""
+    reset(fake)
+    flask = client.open(path, method=method, json=body, headers=headers)
+    flask_tree = fake.db.root
+
+    reset(fake)
+    asgi = asgi_client.request(method, path, json=body, headers=headers)
+    assert (asgi.status_code, asgi.json()) == (flask.status_code, flask.get_json())
+    assert fake.db.root == flask_tree
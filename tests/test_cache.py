@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from app.utils.cache import SubtreeCache
+
+
+def test_cached_node_answers_descendant_reads():
+    cache = SubtreeCache()
+    cache.put("users/u1", {"venues": {"hall": {"fan": "on"}}}, cache.version)
+    assert cache.get("users/u1/venues/hall/fan") == "on"
+    assert cache.get("users/u1/venues/kitchen") is None
+    assert cache.get("users/u2") is SubtreeCache.MISSING
+
+
+@pytest.mark.parametrize("written", ["users/u1", "users/u1/venues/hall", "users"])
+def test_write_invalidates_ancestors_and_descendants(written):
+    cache = SubtreeCache()
+    cache.put("users/u1/venues", {"hall": {}}, cache.version)
+    cache.invalidate(written)
+    assert cache.get("users/u1/venues") is SubtreeCache.MISSING
+
+
+def test_unrelated_write_keeps_entry():
+    cache = SubtreeCache()
+    cache.put("users/u1/venues", {"hall": {}}, cache.version)
+    cache.invalidate("users/u2")
+    assert cache.get("users/u1/venues") == {"hall": {}}
+
+
+def test_read_racing_a_write_is_not_stored():
+    cache = SubtreeCache()
+    version = cache.version
+    cache.invalidate("users/u1/venues/hall")
+    cache.put("users/u1", {"stale": True}, version)
+    assert cache.get("users/u1") is SubtreeCache.MISSING
+
+
+def test_entries_expire_and_lru_evicts():
+    cache = SubtreeCache(max_entries=2, ttl=0.05)
+    for path in ("a", "b", "c"):
+        cache.put(path, 1, cache.version)
+    assert cache.get("a") is SubtreeCache.MISSING
+    assert cache.get("c") == 1
+    time.sleep(0.06)
+    assert cache.get("c") is SubtreeCache.MISSING
+
+
+def test_invalidations_reach_other_workers_through_the_channel(tmp_path):
+    channel = str(tmp_path / "channel")
+    mine, theirs = SubtreeCache(channel_file=channel), SubtreeCache(channel_file=channel)
+    theirs.put("users/u1", {"name": "a"}, theirs.version)
+    mine.invalidate("users/u1/name")
+    assert theirs.get("users/u1") is SubtreeCache.MISSING
+
@@ -0,0 +1,47 @@
+import json
+import time
+
+from app.utils import capture
+from app.utils.capture import hash_id, sanitize
+from conftest import HEADERS
+
+
+def test_sanitize_drops_secrets_and_hashes_names():
+    body = {"password": "hunter2", "apiKey": "k", "venue": " Hall ", "value": "on",
+            "text": "turn on the fan", "count": 3, "sensors": ["a", "b"]}
+    assert sanitize(body) == {
+        "venue": {"$id": hash_id("Hall")},
+        "value": "on",
+        "text": {"$str": 15},
+        "count": 3,
+        "sensors": [{"$id": hash_id("a")}, {"$id": hash_id("b")}],
+    }
+
+
+def test_sanitize_keeps_only_short_enum_values():
+    assert sanitize({"status": "x" * 17}) == {"status": {"$str": 17}}
+
+
+def test_sampled_requests_are_written_without_secrets(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(capture, "CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setattr(capture, "_writer", None)
+    capture.set_sample_rate(1)
+    try:
+        client.post("/auth/set_voice_key", json={"apiKey": "secret-key"}, headers=HEADERS)
+        client.get("/auth/get_schedules", headers=HEADERS)
+    finally:
+        capture.set_sample_rate(0)
+
+    # The file is written by a background listener
+    for _ in range(100):
+        files = list(tmp_path.glob("capture-*.ndjson"))
+        lines = files[0].read_text().splitlines() if files else []
+        if len(lines) == 2:
+            break
+        time.sleep(0.02)
+    entries = [json.loads(line) for line in lines]
+    assert [e["route"] for e in entries] == ["/auth/set_voice_key", "/auth/get_schedules"]
+    assert entries[0]["uid"] == hash_id("bench-user-0")
+    assert entries[0]["body"] == {}
+    assert "secret-key" not in files[0].read_text()
+    assert entries[1]["rtdb"] and {"op", "shape", "bytes", "ms", "cached"} <= set(entries[1]["rtdb"][0])
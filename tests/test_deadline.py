@@ -0,0 +1,63 @@
+import pytest
+
+from app.utils import deadline
+from app.utils.error_handler import AppError, DeadlineExceeded, deadline_cause
+from benchmarks.fakes import Latency
+from conftest import HEADERS
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    monkeypatch.setattr(deadline, "BUDGETS", {"*": 10.0, "/slow": 0.0})
+    yield
+    deadline.clear()
+
+
+def test_parse_budgets_skips_malformed_items():
+    assert deadline._parse_budgets("/auth/voice_command=20; *=8;bad=x;junk") == {"/auth/voice_command": 20.0, "*": 8.0}
+
+
+def test_no_deadline_outside_requests():
+    deadline.clear()
+    assert deadline.remaining() is None
+    assert deadline.timeout("call", 5) == 5
+    deadline.check("call")
+
+
+def test_timeout_shrinks_to_the_time_left(budgets):
+    deadline.start("/auth/profile")
+    assert 9 < deadline.timeout("call", 30) <= 10
+    assert deadline.timeout("call", 1) == 1
+
+
+def test_zero_budget_disables_the_deadline(budgets):
+    deadline.start("/slow")
+    assert deadline.remaining() is None
+
+
+def test_spent_budget_raises_504_and_skips_best_effort_calls(budgets):
+    deadline.BUDGETS["*"] = 0.01
+    deadline.start("/auth/profile")
+    assert deadline.skip("fcm_send")
+    assert not deadline.allows_retry("verify_id_token", 1)
+    with pytest.raises(DeadlineExceeded) as info:
+        deadline.check("rtdb_read")
+    assert info.value.status_code == 504
+
+
+def test_deadline_cause_unwraps_rewrapped_errors():
+    try:
+        try:
+            raise DeadlineExceeded("gemini")
+        except Exception as e:
+            raise AppError("Voice command failed", 500) from e
+    except AppError as wrapped:
+        assert isinstance(deadline_cause(wrapped), DeadlineExceeded)
+    assert deadline_cause(AppError("x", 400)) is None
+
+
+def test_slow_upstream_ends_in_504_within_the_budget(client, firebase, monkeypatch):
+    monkeypatch.setattr(firebase.http, "latency", Latency(2.0))
+    deadline.BUDGETS["/auth/voice_command"] = 0.2
+    res = client.post("/auth/voice_command", json={"text": "turn on device0 in venue0"}, headers=HEADERS)
+    assert res.status_code == 504
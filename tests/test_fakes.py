@@ -0,0 +1,87 @@
+import pytest
+from firebase_admin import auth, messaging
+
+from benchmarks.fakes import FakeAuth, FakeDatabase, FakeMessaging
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase({"users": {"u1": {"venues": {"hall": {"fan": "off"}}, "count": 1}}})
+
+
+def test_empty_nodes_do_not_exist(db):
+    db.reference("users/u1/venues/hall/fan").delete()
+    assert db.reference("users/u1/venues").get() is None
+    db.reference("users/u1").update({"venues": {}})
+    assert "venues" not in db.reference("users/u1").get()
+
+
+def test_query_pages_by_key(db):
+    db.reference("users").update({f"u{i}": {"n": i} for i in range(2, 6)})
+    page = db.reference("users").order_by_key().start_at("u2").limit_to_first(2).get()
+    assert list(page) == ["u2", "u3"]
+
+
+def test_server_increment(db):
+    db.reference("users/u1").update({"count": {".sv": {"increment": 2}}, "new": {".sv": {"increment": 1}}})
+    assert db.reference("users/u1/count").get() == 3
+    assert db.reference("users/u1/new").get() == 1
+
+
+@pytest.mark.parametrize("sv", [{"increment": True}, {"increment": "1"}, "bogus"])
+def test_invalid_server_value_rejects_the_whole_update(db, sv):
+    with pytest.raises(ValueError):
+        db.reference("users/u1").update({"other": 1, "count": {".sv": sv}})
+    assert "other" not in db.reference("users/u1").get()
+
+
+@pytest.mark.parametrize("path", ["users/a.b", "users/a#", "users/$x", "users/[0]"])
+def test_illegal_path_characters_are_rejected(db, path):
+    with pytest.raises(ValueError):
+        db.reference(path)
+
+
+@pytest.mark.parametrize("value", [{"a.b": 1}, {"ok": {"a/b": 1}}, {"": 1}])
+def test_illegal_keys_are_rejected(db, value):
+    with pytest.raises(ValueError):
+        db.reference("users/u1").set(value)
+
+
+@pytest.mark.parametrize("value", [{}, None, {"venues": 1, "venues/hall": 2}, {"a": 1, "a//b": 2}])
+def test_empty_or_overlapping_updates_are_rejected(db, value):
+    with pytest.raises(ValueError):
+        db.reference("users/u1").update(value)
+
+
+def test_auth_validates_like_the_sdk():
+    fake = FakeAuth()
+    with pytest.raises(ValueError):
+        fake.create_user(email="bad@", password="secret123")
+    with pytest.raises(ValueError):
+        fake.create_user(email="a@example.com", password="123")
+    fake.create_user(email="a@example.com", password="secret123")
+    with pytest.raises(auth.EmailAlreadyExistsError):
+        fake.create_user(email="A@example.com", password="secret123")
+    with pytest.raises(ValueError):
+        fake.import_users([])
+    with pytest.raises(ValueError):
+        fake.import_users([{"uid": "x", "email": "x@example.com"}])
+    with pytest.raises(ValueError):
+        fake.get_users([auth.EmailIdentifier(f"u{i}@example.com") for i in range(101)])
+    with pytest.raises(ValueError):
+        fake.get_users(["a@example.com"])
+
+
+def test_import_reports_existing_emails_per_row():
+    fake = FakeAuth()
+    fake.users["a@example.com"] = "a"
+    result = fake.import_users([auth.ImportUserRecord(uid="x", email="a@example.com"),
+                                auth.ImportUserRecord(uid="y", email="b@example.com")])
+    assert (result.success_count, result.failure_count, result.errors[0].index) == (1, 1, 0)
+
+
+def test_messaging_takes_only_messages():
+    fake = FakeMessaging()
+    with pytest.raises(ValueError):
+        fake.send({"token": "t"})
+    assert fake.send(messaging.Message(token="t"))
@@ -0,0 +1,112 @@
+from app.services.faults import VENUE_FAULT, FaultAggregator, venue_faults
+
+
+def user(**venues):
+    return {"venues": {name: {"device0": "on", "faults": faults} for name, faults in venues.items()}}
+
+
+def digests(agg, now):
+    return list(agg.digests(now))
+
+
+def test_string_and_per_device_faults():
+    assert venue_faults({"hall": {"faults": "power lost"}, "lab": {"faults": {"fan": "stuck", "ac": ""}},
+                         "bad": "not a venue"}) == {("hall", VENUE_FAULT): "power lost", ("lab", "fan"): "stuck"}
+
+
+def test_new_faults_go_out_in_one_digest():
+    agg = FaultAggregator(cooldown=100)
+    assert agg.observe("u", user(hall="power lost", lab={"fan": "stuck"})) == 2
+    [(uid, title, body, updates)] = digests(agg, 1000)
+    assert (uid, title) == ("u", "2 Faults Detected ⚠️")
+    assert body == "hall: power lost; lab/fan: stuck"
+    assert updates == {"lastFaultNotification": 1000,
+                       "notifiedFaults": {"hall": {VENUE_FAULT: "power lost"}, "lab": {"fan": "stuck"}}}
+    # Already notified: nothing more while the fault persists
+    agg.observe("u", user(hall="power lost", lab={"fan": "stuck"}))
+    assert digests(agg, 5000) == []
+
+
+def test_fault_raised_and_cleared_before_its_digest_is_suppressed():
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", user(hall="power lost"))
+    agg.observe("u", user(hall=None))
+    assert digests(agg, 1000) == []
+    assert agg.stats() == {"tracked_users": 1, "pending_digests": 0, "active_faults": 0}
+
+
+def test_cooldown_holds_new_faults_until_it_passes():
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", user(hall="power lost"))
+    assert len(digests(agg, 1000)) == 1
+    agg.observe("u", user(hall="power lost", lab="flooded"))
+    assert digests(agg, 1050) == []
+    [(_, title, body, _)] = digests(agg, 1100)
+    assert (title, body) == ("Fault Detected ⚠️", "lab: flooded")
+
+
+def test_clearance_only_update_writes_notified_faults_none():
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", user(hall="power lost"))
+    digests(agg, 1000)
+    agg.observe("u", user(hall=None))
+    assert digests(agg, 1010) == [("u", None, None, {"notifiedFaults": None})]
+    assert digests(agg, 1020) == []
+
+
+def test_clearances_are_listed_in_the_next_digest():
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", user(hall="power lost"))
+    digests(agg, 1000)
+    agg.observe("u", user(lab={"fan": "stuck"}))
+    [(_, _, body, updates)] = digests(agg, 1100)
+    assert body == "lab/fan: stuck | Cleared: hall"
+    assert updates["notifiedFaults"] == {"lab": {"fan": "stuck"}}
+
+
+def test_restart_seeds_from_persisted_state():
+    persisted = {**user(hall="power lost"), "notifiedFaults": {"hall": {VENUE_FAULT: "power lost"}},
+                 "lastFaultNotification": 1000}
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", persisted)
+    assert digests(agg, 1010) == []
+
+    # A new fault right after the restart still waits out the persisted cooldown
+    agg.observe("u", {**persisted, "venues": user(hall="power lost", lab="flooded")["venues"]})
+    assert digests(agg, 1050) == []
+    assert [d[2] for d in digests(agg, 1100)] == ["lab: flooded"]
+
+
+def test_restart_after_a_fault_cleared_clears_persisted_state():
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", {**user(hall=None), "notifiedFaults": {"hall": {VENUE_FAULT: "power lost"}}})
+    assert digests(agg, 1000) == [("u", None, None, {"notifiedFaults": None})]
+
+
+def test_users_without_faults_keep_no_state():
+    agg = FaultAggregator()
+    assert agg.observe("u", user(hall=None)) == 0
+    assert agg.known_users() == set()
+
+
+def test_forget_drops_removed_users():
+    agg = FaultAggregator(cooldown=100)
+    agg.observe("u", user(hall="power lost"))
+    agg.forget({"u"})
+    assert agg.known_users() == set() and digests(agg, 1000) == []
+
+
+def test_scheduler_sends_one_digest_and_persists_it(firebase, monkeypatch):
+    import scheduler
+
+    agg = FaultAggregator(cooldown=100)
+    monkeypatch.setattr(scheduler, "fault_aggregator", agg)
+    venues = firebase.db.root["users"]["bench-user-0"]["venues"]
+    venues["venue0"]["faults"] = {"device0": "overheat"}
+    venues["venue1"]["faults"] = "offline"
+
+    assert scheduler.run_tick(now="never")["fault_notifications"] == 1
+    assert scheduler.run_tick(now="never")["fault_notifications"] == 0
+    stored = firebase.db.root["users"]["bench-user-0"]
+    assert stored["notifiedFaults"] == {"venue0": {"device0": "overheat"}, "venue1": {VENUE_FAULT: "offline"}}
+    assert firebase.counters()["fcm"]["send"] == 1
@@ -0,0 +1,57 @@
+import pytest
+
+from app.services import fleet_stats
+from conftest import HEADERS
+
+
+def test_tier_is_the_license_prefix():
+    assert fleet_stats.tier("PRO-001-INX") == "PRO"
+    assert fleet_stats.tier(None) == "other"
+    assert fleet_stats.tier("a.b-1") == "other"
+
+
+@pytest.mark.parametrize("bad", [True, "1", None])
+def test_increment_rejects_non_numbers(bad):
+    with pytest.raises(TypeError):
+        fleet_stats.increment(bad)
+
+
+def test_reconcile_counts_the_users_tree(firebase):
+    # seed_users(2): 2 venues x 3 devices and 2 enabled schedules per user
+    totals = fleet_stats.reconcile()
+    assert totals == {"users": 2, "venues": 4, "devices": 12, "activeSchedules": 4, "faults": 0,
+                      "tiers": {"NRM": 2}}
+    assert fleet_stats.read()["reconciledAt"]
+
+
+def test_write_paths_keep_counters_current(client, firebase):
+    fleet_stats.reconcile()
+    client.post("/auth/add_venue", json={"venue": "garage"}, headers=HEADERS)
+    client.post("/auth/add_device", json={"venue": "garage", "device": "door"}, headers=HEADERS)
+    client.post("/auth/add_device", json={"venue": "garage", "device": "light"}, headers=HEADERS)
+    client.delete("/auth/delete_device", json={"venue": "garage", "device": "light"}, headers=HEADERS)
+    client.delete("/auth/delete_venue", json={"venue": "venue0"}, headers=HEADERS)
+    client.post("/auth/set_schedule", json={"venue": "garage", "device": "door", "time": "08:00 AM",
+                                            "action": "on"}, headers=HEADERS)
+
+    counted = fleet_stats.read()
+    recounted = fleet_stats.reconcile()
+    for name in fleet_stats.COUNTERS:
+        assert counted[name] == recounted[name], name
+    assert counted["venues"] == 4 and counted["devices"] == 10
+
+
+def test_adding_an_existing_venue_again_is_not_counted(client, firebase):
+    fleet_stats.reconcile()
+    client.post("/auth/add_venue", json={"venue": "venue0"}, headers=HEADERS)
+    assert fleet_stats.read()["venues"] == 4
+
+
+def test_record_faults_sets_the_counter(firebase):
+    fleet_stats.record_faults(3)
+    assert fleet_stats.read()["faults"] == 3
+
+
+def test_admin_endpoints_require_a_session(client):
+    assert client.get("/admin/fleet_stats").status_code == 401
+    assert client.post("/admin/fleet_stats/reconcile").status_code == 401
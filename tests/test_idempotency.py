@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from app.utils import deadline, idempotency
+from app.utils.idempotency import EXECUTE, MISMATCH, REPLAY, WAIT, IdempotencyStore, fingerprint
+from conftest import HEADERS
+BODY = {"venue": "venue0", "device": "device0", "value": "on"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+
+
+def test_fingerprint_ignores_key_order_and_whitespace():
+    assert fingerprint(b'{"a": 1, "b": 2}') == fingerprint(b'{"b":2,"a":1}')
+    assert fingerprint(b'{"a": 1}') != fingerprint(b'{"a": 2}')
+
+
+def test_store_claims_waits_and_replays(store):
+    assert store.begin("k", "fp") == (EXECUTE, None)
+    assert store.begin("k", "fp") == (WAIT, None)
+    assert store.begin("k", "other") == (MISMATCH, None)
+    store.complete("k", 200, "application/json", b"{}")
+    assert store.begin("k", "fp") == (REPLAY, (200, "application/json", b"{}"))
+
+
+def test_released_claim_executes_again(store):
+    store.begin("k", "fp")
+    store.release("k")
+    assert store.begin("k", "fp") == (EXECUTE, None)
+
+
+def test_expired_response_executes_again(store):
+    store.ttl = -1
+    store.begin("k", "fp")
+    store.complete("k", 200, "application/json", b"{}")
+    assert store.begin("k", "fp") == (EXECUTE, None)
+
+
+def post(client, body=BODY, key="key-1"):
+    return client.post("/auth/device_state", json=body, headers={**HEADERS, idempotency.HEADER: key})
+
+
+def test_repeated_key_replays_without_writing_again(client, firebase):
+    first = post(client)
+    writes = firebase.counters()["rtdb"].get("update", 0)
+    second = post(client)
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert firebase.counters()["rtdb"].get("update", 0) == writes
+
+
+def test_keys_are_scoped_per_user(client, firebase):
+    post(client)
+    other = client.post("/auth/device_state", json=BODY,
+                        headers={"Authorization": "Bearer uid:bench-user-1", idempotency.HEADER: "key-1"})
+    assert other.status_code == 200
+    assert "Idempotent-Replayed" not in other.headers
+
+
+def test_same_key_with_another_body_is_rejected(client):
+    post(client)
+    assert post(client, {**BODY, "value": "off"}).status_code == 422
+
+
+def test_overlong_key_is_rejected(client):
+    assert post(client, key="k" * (idempotency.MAX_KEY_LENGTH + 1)).status_code == 400
+
+
+def test_duplicate_of_in_flight_request_gives_up_with_409(client, monkeypatch):
+    monkeypatch.setattr(idempotency, "WAIT_TIMEOUT", 0.1)
+    deadline.BUDGETS["*"] = 0
+    key = idempotency.scoped_key("bench-user-0", "/auth/device_state", "key-1")
+    idempotency.idempotency_store.begin(key, fingerprint(json.dumps(BODY).encode()))
+    res = post(client)
+    assert res.status_code == 409
+    assert res.headers["Retry-After"] == "1"
+
+
+def test_duplicate_wait_stops_at_the_request_deadline(client):
+    deadline.BUDGETS["*"] = 0.2
+    key = idempotency.scoped_key("bench-user-0", "/auth/device_state", "key-1")
+    idempotency.idempotency_store.begin(key, fingerprint(json.dumps(BODY).encode()))
+    start = time.monotonic()
+    res = post(client)
+    assert res.status_code == 504
+    assert time.monotonic() - start < 1
+
+
+def broken_store(monkeypatch):
+    def begin(key, fp):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(idempotency.idempotency_store, "begin", begin)
+
+
+def test_store_failure_executes_the_request(client, firebase, monkeypatch):
+    broken_store(monkeypatch)
+    res = post(client)
+    assert res.status_code == 200
+    assert firebase.db.root["users"]["bench-user-0"]["venues"]["venue0"]["device0"] == "on"
+
+
+def test_asgi_store_failure_executes_the_request(asgi_client, firebase, monkeypatch):
+    broken_store(monkeypatch)
+    res = post(asgi_client)
+    assert res.status_code == 200
+    assert res.json()["message"] == "Updated"
+    assert firebase.db.root["users"]["bench-user-0"]["venues"]["venue0"]["device0"] == "on"
+
+
+def test_asgi_replays_and_waits_like_flask(asgi_client, firebase):
+    first, second = post(asgi_client), post(asgi_client)
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert post(asgi_client, {**BODY, "value": "off"}).status_code == 422
+
+    deadline.BUDGETS["*"] = 0.2
+    key = idempotency.scoped_key("bench-user-0", "/auth/device_state", "key-2")
+    idempotency.idempotency_store.begin(key, fingerprint(json.dumps(BODY).encode()))
+    assert post(asgi_client, key="key-2").status_code == 504
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import time
+
+import pytest
+
+from app.utils import metrics as metrics_mod
+from app.utils.metrics import MetricsRegistry, scrape_allowed
+
+
+def write_snapshot(directory, name, value, age=0):
+    path = directory / name
+    path.write_text(json.dumps({"counters": [["requests_total", [], value]]}))
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+
+def test_merge_sums_live_snapshots_and_deletes_stale_ones(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path), stale_after=60)
+    registry.inc("requests_total")
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+    live = write_snapshot(tmp_path, f"scheduler-{os.getppid()}.json", 10)
+    gone = write_snapshot(tmp_path, f"web-{dead.pid}.json", 100)
+    old = write_snapshot(tmp_path, f"web-{os.getppid()}.json", 1000, age=120)
+
+    counters, _, _ = registry._merged()
+    assert counters[("requests_total", ())] == 11
+    assert live.exists() and not gone.exists() and not old.exists()
+
+
+def test_discard_removes_own_snapshot(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry.flush()
+    assert list(tmp_path.iterdir())
+    registry.discard()
+    assert not list(tmp_path.iterdir())
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.describe("hits_total", "Hits.")
+    registry.inc("hits_total", {"route": "/a"}, 2)
+    registry.observe("latency_seconds", 0.2)
+    text = registry.render()
+    assert 'hits_total{route="/a"} 2' in text
+    assert 'latency_seconds_bucket{le="0.25"} 1' in text
+
+
+def test_scrape_allowed_without_token_only_from_localhost(monkeypatch):
+    monkeypatch.setattr(metrics_mod, "METRICS_TOKEN", None)
+    assert scrape_allowed(None, "127.0.0.1")
+    assert not scrape_allowed(None, "127.0.0.1", "8.8.8.8")
+    assert not scrape_allowed(None, "10.0.0.5")
+
+
+@pytest.mark.parametrize("authorization, allowed", [
+    ("Bearer s3cret", True), ("bearer s3cret", True), ("Bearer wrong", False), (None, False),
+])
+def test_scrape_allowed_with_token(monkeypatch, authorization, allowed):
+    monkeypatch.setattr(metrics_mod, "METRICS_TOKEN", "s3cret")
+    assert scrape_allowed(authorization, "8.8.8.8") is allowed
+
+
+def test_metrics_endpoint_rejects_remote_scrapers(client):
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "8.8.8.8"}).status_code == 401
@@ -0,0 +1,48 @@
+from app.services.provisioning import bulk_provision
+
+
+def row(email, **extra):
+    return {"email": email, "password": "secret123", "name": "N", "accessToken": "PRO-001-INX", **extra}
+
+
+def run(rows):
+    *results, summary = list(bulk_provision(rows))
+    return {r["row"]: r for r in results}, summary["summary"]
+
+
+def test_creates_accounts_and_user_records(firebase):
+    results, summary = run([row("a@example.com"), row("B@Example.com")])
+    assert summary == {"rows": 2, "created": 2, "error": 0}
+    users = firebase.db.root["users"]
+    for result in results.values():
+        assert result["status"] == "created"
+        assert users[result["uid"]]["accessKey"] == "PRO-001-INX"
+    assert "b@example.com" in firebase.auth.users
+
+
+def test_invalid_rows_are_reported_without_failing_the_batch(firebase):
+    results, summary = run([
+        row("ok@example.com"),
+        row("bad@"),
+        row("name@example.com", name=5),
+        row("ok@example.com"),
+        row("short@example.com", password="123"),
+        row("token@example.com", accessToken="NOPE"),
+        "not an object",
+        row("bench-user-0@example.com"),
+    ])
+    assert summary == {"rows": 8, "created": 1, "error": 7}
+    assert results[0]["status"] == "created"
+    assert all(results[i]["status"] == "error" for i in range(1, 8))
+    assert results[3]["error"] == "Duplicate email in request"
+
+
+def test_counts_new_users_in_fleet_stats(firebase):
+    run([row("a@example.com"), row("b@example.com", accessToken="NRM-002-INX")])
+    stats = firebase.db.root["stats"]["fleet"]
+    assert stats["users"] == 2
+    assert stats["tiers"] == {"PRO": 1, "NRM": 1}
+
+
+def test_admin_endpoint_requires_a_session(client):
+    assert client.post("/admin/bulk_provision", json={"users": [row("a@example.com")]}).status_code == 401
@@ -0,0 +1,78 @@
+import pytest
+
+from app.utils.ratelimit import RateLimiter, SharedStore, _parse_limits, client_ip, rejection
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "ratelimit.sqlite3"))
+
+
+def test_bucket_refills_at_its_rate(store):
+    bucket = [("ip:1.2.3.4:/auth/login", 2, 10)]
+    assert store.take(bucket, now=100) == 0
+    assert store.take(bucket, now=100) == 0
+    assert store.take(bucket, now=100) == pytest.approx(5)
+    assert store.take(bucket, now=105) == 0
+
+
+def test_rejected_request_takes_from_no_bucket(store):
+    roomy, full = ("a", 10, 10), ("b", 1, 10)
+    store.take([full], now=0)
+    assert store.take([roomy, full], now=0) > 0
+    for _ in range(10):
+        assert store.take([roomy], now=0) == 0
+
+
+def test_limits_apply_per_ip_and_per_uid(store):
+    limiter = RateLimiter(store, limits={"/auth/login": [("ip", 1, 60)], "*": [("uid", 1, 60)]})
+    assert limiter.check("/auth/login", ip="a") == 0
+    assert limiter.check("/auth/login", ip="a") > 0
+    assert limiter.check("/auth/login", ip="b") == 0
+    assert limiter.check("/auth/profile", uid="u1") == 0
+    assert limiter.check("/auth/login", uid="u1") > 0
+
+
+def test_concurrency_slots_shed_and_release(store):
+    limiter = RateLimiter(store, limits={}, concurrency={"/auth/voice_command": 1})
+    slot, shed = limiter.acquire("/auth/voice_command")
+    assert slot is not None and not shed
+    assert limiter.acquire("/auth/voice_command") == (None, True)
+    limiter.release(slot)
+    assert limiter.acquire("/auth/voice_command")[1] is False
+
+
+def test_disabled_limiter_allows_everything(store):
+    limiter = RateLimiter(store, limits={"*": [("ip", 0, 60)]}, enabled=False)
+    assert limiter.check("/auth/login", ip="a") == 0
+
+
+def test_parse_limits_skips_malformed_rules():
+    assert _parse_limits("/auth/login=ip:10/60,bogus;/auth/x=uid:5/1") == {
+        "/auth/login": [("ip", 10, 60.0)],
+        "/auth/x": [("uid", 5, 1.0)],
+    }
+
+
+@pytest.mark.parametrize("forwarded, hops, expected", [
+    (None, 1, "10.0.0.1"),
+    ("6.6.6.6, 1.1.1.1", 0, "10.0.0.1"),
+    ("6.6.6.6, 1.1.1.1", 1, "1.1.1.1"),
+    ("6.6.6.6, 1.1.1.1, 2.2.2.2", 2, "1.1.1.1"),
+    ("1.1.1.1", 2, "10.0.0.1"),
+])
+def test_client_ip_trusts_only_proxy_appended_entries(forwarded, hops, expected):
+    assert client_ip("10.0.0.1", forwarded, hops=hops) == expected
+
+
+def test_rejection_rounds_retry_after_up():
+    assert rejection(0.2) == ({"error": "Too many requests"}, 429, {"Retry-After": "1"})
+    assert rejection(1.5, shed=True)[1:] == (503, {"Retry-After": "2"})
+
+
+def test_render_blueprint_trusts_its_load_balancer():
+    # Without PROXY_HOPS every request on Render shares the load balancer's "per-IP" bucket
+    yaml = pytest.importorskip("yaml")
+    services = yaml.safe_load(open(".render.yaml"))["services"]
+    web = next(s for s in services if s["type"] == "web")
+    assert {"key": "PROXY_HOPS", "value": "1"} in web["envVars"]
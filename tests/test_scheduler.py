@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+import scheduler
+from app.services.faults import fault_aggregator
+from benchmarks.fakes import seed_users
+
+DUE = "07:30 AM"  # seed_users schedules every user's device0 at this time
+
+
+@pytest.fixture(autouse=True)
+def fresh_faults():
+    fault_aggregator.reset()
+    yield
+    fault_aggregator.reset()
+
+
+def test_due_schedules_fire_once_and_record_last_notified(firebase):
+    stats = scheduler.run_tick(now=DUE)
+    assert stats == {"users": 2, "schedules_fired": 4, "fault_notifications": 0, "faults": 0}
+    user = firebase.db.root["users"]["bench-user-0"]
+    assert user["venues"]["venue0"]["device0"] == "on"
+    assert user["schedules"]["venue0"]["device0"]["lastNotified"] >= int(time.time()) - 5
+    assert firebase.counters()["fcm"]["send"] == 4
+
+    # Within the hour the same schedule stays quiet
+    assert scheduler.run_tick(now=DUE)["schedules_fired"] == 0
+    assert firebase.counters()["fcm"]["send"] == 4
+
+
+def test_schedules_not_due_or_disabled_do_not_fire(firebase):
+    firebase.db.root["users"]["bench-user-1"]["schedules"]["venue0"]["device0"]["status"] = "disable"
+    assert scheduler.run_tick(now="08:00 PM")["schedules_fired"] == 0
+    assert scheduler.run_tick(now=DUE)["schedules_fired"] == 3
+
+
+def test_injected_users_and_time(firebase):
+    users = seed_users(1, venues=1, prefix="injected")["users"]
+    users["injected-0"]["schedules"]["venue0"]["device0"]["lastNotified"] = int(time.time()) - 3601
+    stats = scheduler.run_tick(users=users, now=DUE)
+    assert stats["users"] == 1 and stats["schedules_fired"] == 1
+    # The walk of the users node was skipped
+    assert firebase.counters()["rtdb"].get("query", 0) == 0
+    assert firebase.db.root["users"]["injected-0"]["venues"]["venue0"]["device0"] == "on"
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+def test_singleflight_collapses_concurrent_calls():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.stats()["collapsed"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == ["value"] * 5
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_singleflight_shares_errors_and_then_runs_again():
+    flight = SingleFlight("test")
+    with pytest.raises(RuntimeError):
+        flight.do("k", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_concurrent_rtdb_misses_share_one_read(firebase, monkeypatch):
+    from app.services import rtdb
+    from benchmarks.fakes import Latency
+
+    monkeypatch.setattr(firebase.db, "latency", Latency(0.1))
+    threads = [threading.Thread(target=rtdb.get, args=("users/bench-user-0/venues",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert firebase.counters()["rtdb"]["get"] == 1
@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.voice_prompt import PROMPT, in_catalog
+from conftest import HEADERS
+
+CATALOG = {"hall": ["fan", "light"], "bedroom": ["ac"]}
+
+
+@pytest.mark.parametrize("venue, device, expected", [
+    ("hall", "fan", True),
+    ("hall", "ac", False),
+    ("garage", "fan", False),
+    ("hall", "ALL", True),
+    ("ALL", "ac", True),
+    ("all", "all", True),
+    ("ALL", "tv", False),
+    ("garage", "ALL", False),
+])
+def test_in_catalog(venue, device, expected):
+    assert in_catalog(CATALOG, venue, device) is expected
+
+
+def test_prompt_keeps_all_handling():
+    assert "ALL venue and ALL device" in PROMPT
+
+
+@pytest.mark.parametrize("text, status", [
+    ("turn on device1 in venue0", 200),
+    ("turn off all devices in venue1", 200),
+    ("turn off all devices in all venues", 200),
+])
+def test_voice_command(client, text, status):
+    res = client.post("/auth/voice_command", json={"text": text}, headers=HEADERS)
+    assert res.status_code == status, res.get_json()
+
+
+def test_voice_command_rejects_devices_not_in_the_catalog(client, firebase, monkeypatch):
+    monkeypatch.setattr(firebase.http, "_gemini", lambda url, payload: {
+        "candidates": [{"content": {"parts": [{"text": '{"venue": "venue0", "device": "tv", "value": "on"}'}]}}]
+    })
+    res = client.post("/auth/voice_command", json={"text": "turn on the tv"}, headers=HEADERS)
+    assert res.status_code == 400
+    assert "tv" not in firebase.db.root["users"]["bench-user-0"]["venues"]["venue0"]
@@ -0,0 +1,38 @@
+import runpy
+from types import SimpleNamespace
+
+import pytest
+
+import app as app_pkg
+from app.config import config
+
+
+@pytest.fixture
+def warmups(fake, monkeypatch):
+    calls = []
+    monkeypatch.setattr(config["testing"], "WARMUP", True)
+    monkeypatch.setattr(app_pkg, "warm_up", lambda **kwargs: calls.append(kwargs))
+    return calls
+
+
+@pytest.mark.parametrize("preload, opens", [(None, True), ("0", True), ("1", False)])
+def test_create_app_opens_connections_unless_preloaded(warmups, monkeypatch, preload, opens):
+    if preload is None:
+        monkeypatch.delenv("GUNICORN_PRELOAD", raising=False)
+    else:
+        monkeypatch.setenv("GUNICORN_PRELOAD", preload)
+    app_pkg.create_app("testing")
+    assert warmups == [{"open_connections": opens}]
+
+
+@pytest.mark.parametrize("preload", [True, False])
+def test_post_fork_warms_only_preloaded_workers(monkeypatch, preload):
+    import app.warmup as warmup
+
+    calls = []
+    monkeypatch.setattr(warmup, "reset_connections_after_fork", lambda: calls.append("reset"))
+    monkeypatch.setattr(warmup, "open_upstream_connections", lambda: calls.append("open"))
+    monkeypatch.setenv("GUNICORN_PRELOAD", "1" if preload else "0")
+    conf = runpy.run_path("gunicorn.conf.py")
+    conf["post_fork"](SimpleNamespace(cfg=SimpleNamespace(preload_app=preload)), SimpleNamespace(pid=1))
+    assert calls == (["reset", "open"] if preload else [])